@@ -10,6 +10,7 @@ from db.mongodb import get_database
 from db.repositories.user_repository import UserRepository
 from db.repositories.text_repository import TextRepository
 from db.repositories.audio_repository import AudioRepository
+from db.repositories.job_repository import JobRepository
 from models.user import User
 from schemas.user import TokenData
 
@@ -34,6 +35,12 @@ async def get_audio_repository():
     return AudioRepository(db)
 
 
+# Dependency để lấy JobRepository
+async def get_job_repository():
+    db = get_database()
+    return JobRepository(db)
+
+
 # Verify token và lấy thông tin user
 async def get_current_user(
         token: str = Depends(oauth2_scheme),
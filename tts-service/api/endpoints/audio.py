@@ -1,28 +1,244 @@
-from typing import Any, List, Optional
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from bisect import bisect_right
+from contextlib import aclosing
+import asyncio
 import logging
 import os
-import tempfile
+import re
+import time
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response
-from fastapi.responses import JSONResponse, StreamingResponse
-import base64
-import io
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 
-from api.dependencies import get_current_active_user, get_audio_repository, get_text_repository
+from core.config import settings
+from core.security import sign_url_path, verify_url_signature
+from api.dependencies import get_current_active_user, get_audio_repository, get_text_repository, get_job_repository
 from db.repositories.audio_repository import AudioRepository
 from db.repositories.text_repository import TextRepository
+from db.repositories.job_repository import JobRepository
 from models.user import User
 from models.audio import Audio
 from services.audio_service import AudioService
-from schemas.audio import AudioResponse, TTSRequest
-from utils.firebase_firestore import download_audio_from_firestore
+from schemas.audio import AudioResponse, AudioSummaryResponse, TTSRequest
+from utils.blob_store import LocalBlobStore, get_blob_metadata, iter_blob
+from utils.http_range import RangeNotSatisfiable, parse_range_header, etag_matches, quote_etag, http_date
+from utils.hls import HLS_PLAYLIST_MEDIA_TYPE, HLS_SEGMENT_MEDIA_TYPES
+from utils.audio_probe import PROBE_READ_SIZE, find_frame_start, make_wav_header, parse_wav_header
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[AudioResponse])
+async def _audio_file_response(request: Request, url: str, media_type: str) -> Response:
+    """Trả file audio trực tiếp từ nơi lưu, hỗ trợ Range (206), ETag/Last-Modified và If-None-Match.
+    File local được gửi bằng FileResponse (sendfile), blob từ xa chỉ tải đúng khoảng byte được yêu cầu."""
+    is_local = url.startswith("local://") or url.startswith("file://")
+
+    if not is_local and not (url.startswith("firestore://") or url.startswith("s3://")):
+        logger.error(f"Unsupported audio URL format: {url}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported audio URL format: {url}"
+        )
+
+    metadata = await get_blob_metadata(url)
+    if not metadata or not metadata.get("size"):
+        logger.error(f"Audio file is empty or not available: {url}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Audio file is empty or not available"
+        )
+
+    size = metadata["size"]
+    headers = {"Accept-Ranges": "bytes"}
+    if metadata.get("etag"):
+        headers["ETag"] = quote_etag(metadata["etag"])
+    if metadata.get("uploaded_at"):
+        headers["Last-Modified"] = http_date(metadata["uploaded_at"])
+
+    if etag_matches(request.headers.get("if-none-match"), metadata.get("etag")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # If-Range không khớp thì trả cả file
+    if_range = request.headers.get("if-range")
+    range_header = request.headers.get("range")
+    if if_range and if_range.strip() != headers.get("ETag"):
+        range_header = None
+
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    if byte_range is None:
+        if is_local:
+            file_path = LocalBlobStore.path_from_url(url)
+            logger.info(f"Serving local file {file_path} ({size} bytes)")
+            return FileResponse(file_path, media_type=media_type, headers=headers)
+
+        logger.info(f"Streaming {url} from blob store ({size} bytes)")
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_blob(url), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    logger.info(f"Streaming bytes {start}-{end}/{size} of {url}")
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_blob(url, start=start, end=end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
+    )
+
+
+# Cửa sổ đọc sau offset nội suy để tìm header frame MP3/AAC gần nhất
+SEEK_SYNC_WINDOW = 8 * 1024
+
+
+async def _read_blob_range(url: str, start: int = 0, end: Optional[int] = None) -> bytes:
+    data = bytearray()
+    async with aclosing(iter_blob(url, start=start, end=end)) as chunks:
+        async for chunk in chunks:
+            data += chunk
+    return bytes(data)
+
+
+async def _prepend(prefix: bytes, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield prefix
+    async with aclosing(chunks) as body:
+        async for chunk in body:
+            yield chunk
+
+
+def _estimate_seek_offset(audio: Audio, t: float, size: int) -> Tuple[int, int]:
+    """Tìm segment chứa t theo start_time rồi nội suy offset giữa hai mốc của seek index.
+    Audio cũ chưa có seek index thì nội suy theo tổng thời lượng (đúng với CBR)."""
+    segment_idx = max(0, bisect_right([s.start_time for s in audio.segments], t) - 1)
+
+    if audio.segments and len(audio.seek_index) == len(audio.segments):
+        segment = audio.segments[segment_idx]
+        base = audio.seek_index[segment_idx]
+        next_offset = audio.seek_index[segment_idx + 1] if segment_idx + 1 < len(audio.seek_index) else size
+        start_time, end_time = segment.start_time, segment.end_time
+    else:
+        base, next_offset, start_time, end_time = 0, size, 0.0, audio.duration
+
+    span = end_time - start_time
+    fraction = min(max((t - start_time) / span, 0.0), 1.0) if span > 0 else 0.0
+    return base + int((next_offset - base) * fraction), segment_idx
+
+
+async def _seek_audio_response(audio: Audio, t: float, media_type: str) -> Response:
+    """Stream audio bắt đầu từ giây thứ t: WAV được cắt đúng mẫu và gắn header mới,
+    MP3/AAC bắt đầu từ frame gần nhất sau offset tìm được."""
+    url = audio.url
+    metadata = await get_blob_metadata(url)
+    if not metadata or not metadata.get("size"):
+        logger.error(f"Audio file is empty or not available: {url}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Audio file is empty or not available"
+        )
+
+    size = metadata["size"]
+    offset, segment_idx = _estimate_seek_offset(audio, t, size)
+    seek_time = t
+    prefix = b""
+
+    if audio.format == "wav":
+        info = parse_wav_header(await _read_blob_range(url, 0, PROBE_READ_SIZE - 1))
+        if info is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Invalid WAV file"
+            )
+        data_size = min(info.data_size, size - info.data_offset)
+        frame = min(int(t * info.sample_rate), data_size // info.block_align)
+        offset = info.data_offset + frame * info.block_align
+        seek_time = frame / float(info.sample_rate)
+        prefix = make_wav_header(data_size - frame * info.block_align, info.channels, info.sample_rate,
+                                 info.sample_width)
+    elif audio.format in ("mp3", "aac") and offset < size:
+        window = await _read_blob_range(url, offset, min(offset + SEEK_SYNC_WINDOW, size) - 1)
+        sync = find_frame_start(window, audio.format)
+        if sync is not None:
+            offset += sync
+
+    offset = min(offset, size)
+    logger.info(f"Seeking {url} to {seek_time:.2f}s (segment {segment_idx}, byte {offset}/{size})")
+
+    headers = {
+        "Content-Length": str(len(prefix) + size - offset),
+        "X-Seek-Time": f"{seek_time:.3f}",
+        "X-Seek-Segment": str(segment_idx),
+    }
+    body = iter_blob(url, start=offset)
+    if prefix:
+        body = _prepend(prefix, body)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+async def _live_audio_stream(audio_id: str, request: Request,
+                             audio_repository: AudioRepository) -> AsyncIterator[bytes]:
+    """Stream PCM của từng segment ngay khi job ghi segment vào document, giữ kết nối tới khi
+    job hoàn tất/thất bại, client ngắt kết nối hoặc quá LIVE_STREAM_IDLE_TIMEOUT không có segment mới.
+    Header WAV để độ dài 0xFFFFFFFF vì chưa biết tổng thời lượng."""
+    sent = 0
+    wav_format = None
+    last_progress = time.monotonic()
+
+    while True:
+        state = await audio_repository.get_segments_since(audio_id, sent)
+        if state is None:
+            logger.warning(f"Audio {audio_id} disappeared during live streaming")
+            return
+
+        for segment in state["segments"]:
+            sent += 1
+            data = await _read_blob_range(segment.url)
+            info = parse_wav_header(data)
+            if info is None:
+                logger.warning(f"Segment {sent - 1} of audio {audio_id} is not a WAV file, skipping")
+                continue
+
+            segment_format = info.pcm_format
+            if wav_format is None:
+                wav_format = segment_format
+                yield make_wav_header(0xFFFFFFFF, *wav_format)
+            elif segment_format != wav_format:
+                logger.warning(f"Segment {sent - 1} of audio {audio_id} has format {segment_format}, "
+                               f"expected {wav_format}, skipping")
+                continue
+
+            yield data[info.data_offset:info.data_offset + info.data_size]
+
+        if state["segments"]:
+            last_progress = time.monotonic()
+            continue
+
+        job_status = state["status"] or ""
+        if job_status in ("completed", "failed"):
+            logger.info(f"Live stream of audio {audio_id} finished ({job_status}, {sent} segments)")
+            return
+
+        if await request.is_disconnected():
+            logger.info(f"Client disconnected from live stream of audio {audio_id}")
+            return
+
+        if time.monotonic() - last_progress > settings.LIVE_STREAM_IDLE_TIMEOUT:
+            logger.warning(f"Live stream of audio {audio_id} timed out waiting for segments")
+            return
+
+        await asyncio.sleep(settings.LIVE_STREAM_POLL_INTERVAL)
+
+
+@router.get("/", response_model=List[AudioSummaryResponse])
 async def read_audios(
         skip: int = 0,
         limit: int = 100,
@@ -34,7 +250,7 @@ async def read_audios(
 
     result = []
     for audio in audios:
-        result.append(AudioResponse(
+        result.append(AudioSummaryResponse(
             id=str(audio.id),
             text_id=str(audio.text_id),
             user_id=str(audio.user_id),
@@ -43,8 +259,8 @@ async def read_audios(
             duration=audio.duration,
             format=audio.format,
             sample_rate=audio.sample_rate,
-            segments=audio.segments,
             status=audio.status,
+            progress=audio.progress.model_dump() if audio.progress else None,
             error=audio.error,
             created_at=audio.created_at.isoformat(),
             updated_at=audio.updated_at.isoformat()
@@ -56,18 +272,18 @@ async def read_audios(
 @router.post("/synthesize", response_model=AudioResponse)
 async def synthesize_text(
         request: TTSRequest,
-        background_tasks: BackgroundTasks,
         current_user: User = Depends(get_current_active_user),
         audio_repository: AudioRepository = Depends(get_audio_repository),
-        text_repository: TextRepository = Depends(get_text_repository)
+        text_repository: TextRepository = Depends(get_text_repository),
+        job_repository: JobRepository = Depends(get_job_repository)
 ) -> Any:
 
-    audio_service = AudioService(audio_repository, text_repository)
+    audio_service = AudioService(audio_repository, text_repository, job_repository)
 
     audio = await audio_service.create_audio_request(request, current_user)
 
     if audio.status == "pending":
-        background_tasks.add_task(audio_service.generate_audio, str(audio.id), background_tasks)
+        await audio_service.generate_audio(str(audio.id), current_user.job_weight)
 
     # Chuyển đổi đối tượng segments sang dictionary để tránh lỗi model_type
     segments_data = []
@@ -150,7 +366,7 @@ async def get_audio_status(
         current_user: User = Depends(get_current_active_user),
         audio_repository: AudioRepository = Depends(get_audio_repository)
 ) -> Any:
-    audio = await audio_repository.get_by_id(audio_id)
+    audio = await audio_repository.get_summary_by_id(audio_id)
 
     if not audio:
         raise HTTPException(
@@ -168,6 +384,7 @@ async def get_audio_status(
         "id": str(audio.id),
         "status": audio.status,
         "error": audio.error,
+        "progress": audio.progress.model_dump(mode="json") if audio.progress else None,
         "url": audio.url if audio.status == "completed" else None,
         "duration": audio.duration if audio.status == "completed" else None,
         "updated_at": audio.updated_at.isoformat()
@@ -176,12 +393,12 @@ async def get_audio_status(
 @router.post("/{audio_id}/regenerate")
 async def regenerate_audio(
         audio_id: str,
-        background_tasks: BackgroundTasks,
         current_user: User = Depends(get_current_active_user),
         audio_repository: AudioRepository = Depends(get_audio_repository),
-        text_repository: TextRepository = Depends(get_text_repository)
+        text_repository: TextRepository = Depends(get_text_repository),
+        job_repository: JobRepository = Depends(get_job_repository)
 ) -> Any:
-    audio = await audio_repository.get_by_id(audio_id)
+    audio = await audio_repository.get_summary_by_id(audio_id)
 
     if not audio:
         raise HTTPException(
@@ -195,23 +412,30 @@ async def regenerate_audio(
             detail="Not enough permissions"
         )
 
-    await audio_repository.update_status(audio_id, "pending")
-
-    audio_service = AudioService(audio_repository, text_repository)
-    background_tasks.add_task(audio_service.generate_audio, audio_id, background_tasks)
+    audio_service = AudioService(audio_repository, text_repository, job_repository)
+    # Admin tạo lại audio của người khác thì dùng weight mặc định
+    weight = current_user.job_weight if str(audio.user_id) == str(current_user.id) else 1.0
+    result = await audio_service.generate_audio(audio_id, weight)
 
-    return {"status": "processing", "message": "Audio regeneration started"}
+    return {"status": result["status"], "message": "Audio regeneration queued", "job_id": result["job_id"]}
 
 
 @router.get("/{audio_id}/stream")
 async def stream_audio(
         audio_id: str,
+        request: Request,
+        t: Optional[float] = Query(None, ge=0, description="Bắt đầu phát từ giây thứ t"),
+        live: bool = Query(False, description="Stream WAV các segment đã xong khi job còn đang chạy"),
         current_user: User = Depends(get_current_active_user),
         audio_repository: AudioRepository = Depends(get_audio_repository)
 ) -> Any:
     logger.info(f"Streaming audio request for audio_id: {audio_id}")
 
-    audio = await audio_repository.get_by_id(audio_id)
+    # Segments và seek index chỉ cần khi seek theo thời gian
+    if t:
+        audio = await audio_repository.get_by_id(audio_id)
+    else:
+        audio = await audio_repository.get_summary_by_id(audio_id)
 
     if not audio:
         logger.error(f"Audio not found: {audio_id}")
@@ -227,6 +451,14 @@ async def stream_audio(
             detail="Not enough permissions"
         )
 
+    if live and (audio.status == "pending" or audio.status.startswith("processing")):
+        logger.info(f"Live streaming audio {audio_id} (status: {audio.status})")
+        return StreamingResponse(
+            _live_audio_stream(audio_id, request, audio_repository),
+            media_type="audio/wav",
+            headers={"Cache-Control": "no-store"}
+        )
+
     if audio.status != "completed":
         logger.error(f"Audio {audio_id} not ready for streaming (status: {audio.status})")
         raise HTTPException(
@@ -243,101 +475,130 @@ async def stream_audio(
             detail="Audio URL not available"
         )
 
-    # Create a temp file for streaming
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio.format}") as temp_file:
-        temp_path = temp_file.name
-
-    logger.info(f"Temporary file created at: {temp_path}")
-
-    try:
-        # Handle different URL types
-        if audio.url.startswith("firestore://"):
-            logger.info(f"Downloading from Firestore: {audio.url}")
-            success = await download_audio_from_firestore(audio.url, temp_path)
-        elif audio.url.startswith("local://"):
-            logger.info(f"Copying from local storage: {audio.url}")
-            # For local files, just copy the file
-            local_path = audio.url.replace("local://", "")
-            if os.path.exists(local_path):
-                with open(local_path, "rb") as src, open(temp_path, "wb") as dst:
-                    dst.write(src.read())
-                success = True
-                logger.info(f"File successfully copied from {local_path} to {temp_path}")
-            else:
-                logger.error(f"Local file not found: {local_path}")
-                success = False
-        elif audio.url.startswith("file://"):
-            logger.info(f"Copying from file: {audio.url}")
-            # For file:// URLs, just copy the file
-            file_path = audio.url.replace("file://", "")
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as src, open(temp_path, "wb") as dst:
-                    dst.write(src.read())
-                success = True
-                logger.info(f"File successfully copied from {file_path} to {temp_path}")
-            else:
-                logger.error(f"File not found: {file_path}")
-                success = False
-        else:
-            logger.error(f"Unsupported audio URL format: {audio.url}")
+    if t is not None and t > 0:
+        if t >= audio.duration:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported audio URL format: {audio.url}"
+                detail=f"Seek time {t} is beyond the end of the audio ({audio.duration:.2f}s)"
             )
+        return await _seek_audio_response(audio, t, f"audio/{audio.format}")
 
-        if not success:
-            logger.error(f"Failed to download/copy audio from {audio.url}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to download audio"
-            )
+    return await _audio_file_response(request, audio.url, f"audio/{audio.format}")
 
-        # Check if the temp file exists and has content
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            logger.error(f"Temp file is empty or doesn't exist: {temp_path}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Audio file is empty or not available"
-            )
 
-        logger.info(f"Streaming file {temp_path} with size {os.path.getsize(temp_path)} bytes")
-
-        def iterfile():
-            try:
-                with open(temp_path, "rb") as f:
-                    while chunk := f.read(8192):
-                        yield chunk
-            except Exception as e:
-                logger.error(f"Error reading file during streaming: {str(e)}")
-            finally:
-                try:
-                    logger.info(f"Removing temp file: {temp_path}")
-                    os.unlink(temp_path)
-                except Exception as e:
-                    logger.error(f"Error removing temp file: {str(e)}")
-
-        content_type = f"audio/{audio.format}"
-        logger.info(f"Returning StreamingResponse with content type: {content_type}")
-        return StreamingResponse(iterfile(), media_type=content_type)
-
-    except Exception as e:
-        logger.exception(f"Error streaming audio: {str(e)}")
-        try:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except Exception as cleanup_error:
-            logger.error(f"Error during cleanup: {str(cleanup_error)}")
+def _hls_playlist_path(audio_id: str) -> str:
+    return f"audio/{audio_id}/playlist.m3u8"
+
+
+def _hls_segment_path(audio_id: str, segment_name: str) -> str:
+    return f"audio/{audio_id}/hls/{segment_name}"
+
 
+async def _get_hls_audio(audio_id: str, audio_repository: AudioRepository) -> Audio:
+    audio = await audio_repository.get_by_id(audio_id)
+    if not audio:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error streaming audio: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audio not found"
+        )
+    return audio
+
+
+@router.get("/{audio_id}/hls")
+async def get_hls_url(
+        audio_id: str,
+        request: Request,
+        current_user: User = Depends(get_current_active_user),
+        audio_repository: AudioRepository = Depends(get_audio_repository)
+) -> Any:
+    """URL playlist đã ký cho trình phát HLS (không gửi được bearer token). Thời điểm hết hạn được làm
+    tròn theo khung HLS_URL_TTL nên mọi người xem trong cùng khung nhận cùng một URL."""
+    audio_service = AudioService(audio_repository, None)
+    await audio_service.get_audio(audio_id, current_user)
+
+    ttl = max(1, settings.HLS_URL_TTL)
+    expires = (int(time.time()) // ttl + 2) * ttl
+    signature = sign_url_path(_hls_playlist_path(audio_id), expires)
+    playlist_url = request.url_for("get_hls_playlist", audio_id=audio_id)
+
+    return {"playlist_url": f"{playlist_url}?expires={expires}&sig={signature}", "expires": expires}
+
+
+@router.get("/{audio_id}/playlist.m3u8")
+async def get_hls_playlist(
+        audio_id: str,
+        expires: int = Query(..., description="Thời điểm hết hạn (unix time) của URL đã ký"),
+        sig: str = Query(..., description="Chữ ký URL"),
+        audio_repository: AudioRepository = Depends(get_audio_repository)
+) -> Any:
+    if not verify_url_signature(_hls_playlist_path(audio_id), sig, expires):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired playlist URL"
+        )
+
+    audio = await _get_hls_audio(audio_id, audio_repository)
+
+    if audio.status == "failed":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Audio generation failed"
         )
 
+    # Segment ký theo đường dẫn (không hết hạn): tên chứa khóa nội dung nên URL ổn định và cache được
+    def segment_uri(segment_name: str) -> str:
+        return f"hls/{segment_name}?sig={sign_url_path(_hls_segment_path(audio_id, segment_name))}"
+
+    # Playlist của job đang chạy thay đổi theo segment mới nên không được cache
+    cache_control = "public, max-age=60" if audio.status == "completed" else "no-cache"
+    audio_service = AudioService(audio_repository, None)
+    return Response(
+        content=audio_service.get_hls_playlist(audio, segment_uri),
+        media_type=HLS_PLAYLIST_MEDIA_TYPE,
+        headers={"Cache-Control": cache_control}
+    )
+
+
+@router.get("/{audio_id}/hls/{segment_name}")
+async def get_hls_segment(
+        audio_id: str,
+        segment_name: str,
+        sig: str = Query(..., description="Chữ ký URL"),
+        audio_repository: AudioRepository = Depends(get_audio_repository)
+) -> Any:
+    if not verify_url_signature(_hls_segment_path(audio_id, segment_name), sig):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid segment URL"
+        )
+
+    audio = await _get_hls_audio(audio_id, audio_repository)
+    audio_service = AudioService(audio_repository, None)
+
+    match = re.fullmatch(r"(\d+)_([0-9a-f]+)\.(mp3|aac)", segment_name)
+    data = None
+    if match:
+        data = await audio_service.get_hls_segment(audio, int(match.group(1)), match.group(2), match.group(3))
+
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"HLS segment {segment_name} not found"
+        )
+
+    # Tên segment chứa khóa nội dung nên CDN và trình phát có thể cache lâu dài
+    return Response(
+        content=data,
+        media_type=HLS_SEGMENT_MEDIA_TYPES[match.group(3)],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
 
 @router.get("/{audio_id}/segments/{segment_id}/stream")
 async def stream_audio_segment(
         audio_id: str,
         segment_id: str,
+        request: Request,
         current_user: User = Depends(get_current_active_user),
         audio_repository: AudioRepository = Depends(get_audio_repository)
 ) -> Any:
@@ -384,92 +645,4 @@ async def stream_audio_segment(
             detail="Segment URL not available"
         )
 
-    # Create a temp file for streaming
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio.format}") as temp_file:
-        temp_path = temp_file.name
-
-    logger.info(f"Temporary file created at: {temp_path}")
-
-    try:
-        # Handle different URL types
-        if segment.url.startswith("firestore://"):
-            logger.info(f"Downloading from Firestore: {segment.url}")
-            success = await download_audio_from_firestore(segment.url, temp_path)
-        elif segment.url.startswith("local://"):
-            logger.info(f"Copying from local storage: {segment.url}")
-            # For local files, just copy the file
-            local_path = segment.url.replace("local://", "")
-            if os.path.exists(local_path):
-                with open(local_path, "rb") as src, open(temp_path, "wb") as dst:
-                    dst.write(src.read())
-                success = True
-                logger.info(f"File successfully copied from {local_path} to {temp_path}")
-            else:
-                logger.error(f"Local file not found: {local_path}")
-                success = False
-        elif segment.url.startswith("file://"):
-            logger.info(f"Copying from file: {segment.url}")
-            # For file:// URLs, just copy the file
-            file_path = segment.url.replace("file://", "")
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as src, open(temp_path, "wb") as dst:
-                    dst.write(src.read())
-                success = True
-                logger.info(f"File successfully copied from {file_path} to {temp_path}")
-            else:
-                logger.error(f"File not found: {file_path}")
-                success = False
-        else:
-            logger.error(f"Unsupported segment URL format: {segment.url}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported segment URL format: {segment.url}"
-            )
-
-        if not success:
-            logger.error(f"Failed to download/copy segment from {segment.url}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to download segment"
-            )
-
-        # Check if the temp file exists and has content
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            logger.error(f"Temp file is empty or doesn't exist: {temp_path}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Segment file is empty or not available"
-            )
-
-        logger.info(f"Streaming file {temp_path} with size {os.path.getsize(temp_path)} bytes")
-
-        def iterfile():
-            try:
-                with open(temp_path, "rb") as f:
-                    while chunk := f.read(8192):
-                        yield chunk
-            except Exception as e:
-                logger.error(f"Error reading file during streaming: {str(e)}")
-            finally:
-                try:
-                    logger.info(f"Removing temp file: {temp_path}")
-                    os.unlink(temp_path)
-                except Exception as e:
-                    logger.error(f"Error removing temp file: {str(e)}")
-
-        content_type = f"audio/{audio.format}"
-        logger.info(f"Returning StreamingResponse with content type: {content_type}")
-        return StreamingResponse(iterfile(), media_type=content_type)
-
-    except Exception as e:
-        logger.exception(f"Error streaming segment: {str(e)}")
-        try:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except Exception as cleanup_error:
-            logger.error(f"Error during cleanup: {str(cleanup_error)}")
-
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error streaming segment: {str(e)}"
-        )
\ No newline at end of file
+    return await _audio_file_response(request, segment.url, f"audio/{audio.format}")
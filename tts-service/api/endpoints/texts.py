@@ -8,13 +8,13 @@ from db.repositories.text_repository import TextRepository
 from models.user import User
 from models.text import Text
 from services.text_service import TextService
-from schemas.text import TextCreate, TextUpdate, TextResponse
+from schemas.text import TextCreate, TextUpdate, TextResponse, TextSummaryResponse
 from utils.file_processor import process_uploaded_file, detect_text_language
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[TextResponse])
+@router.get("/", response_model=List[TextSummaryResponse])
 async def read_texts(
         skip: int = 0,
         limit: int = 100,
@@ -27,11 +27,10 @@ async def read_texts(
 
     result = []
     for text in texts:
-        result.append(TextResponse(
+        result.append(TextSummaryResponse(
             id=str(text.id),
             user_id=str(text.user_id),
             title=text.title,
-            content=text.content,
             language=text.language,
             tags=text.tags,
             status=text.status,
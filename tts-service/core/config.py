@@ -27,14 +27,76 @@ class Settings(BaseModel):
     FIREBASE_PRIVATE_KEY: str = os.getenv("FIREBASE_PRIVATE_KEY", "dummy-private-key")
     FIREBASE_CLIENT_EMAIL: str = os.getenv("FIREBASE_CLIENT_EMAIL", "dummy@example.com")
     FIREBASE_STORAGE_BUCKET: str = os.getenv("FIREBASE_STORAGE_BUCKET", "dev-bucket")
+    # Kích thước mỗi chunk audio lưu trong Firestore (document bị giới hạn 1 MiB)
+    FIRESTORE_CHUNK_SIZE: int = min(int(os.getenv("FIRESTORE_CHUNK_SIZE", str(512 * 1024))), 900 * 1024)
+
+    # Blob Store Settings (nơi lưu file audio: local, s3 hoặc firestore)
+    BLOB_STORE_BACKEND: str = os.getenv("BLOB_STORE_BACKEND", "local")
+    BLOB_STORE_LOCAL_DIR: str = os.getenv(
+        "BLOB_STORE_LOCAL_DIR",
+        os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'local_storage'))
+    )
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "audiobooks")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")
+    S3_REGION: str = os.getenv("S3_REGION", "")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
 
     # TTS Settings
     DEFAULT_VOICE_MODEL: str = os.getenv("DEFAULT_VOICE_MODEL", "female")
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "5000"))
     TTS_TEMP_DIR: str = os.getenv("TTS_TEMP_DIR", "/tmp/tts_temp")
+    # Số request (batch) được gửi đồng thời tới TTS engine trong một job
+    TTS_MAX_CONCURRENT_SEGMENTS: int = int(os.getenv("TTS_MAX_CONCURRENT_SEGMENTS", "4"))
+    # Số câu gửi trong một request /synthesize/batch
+    TTS_BATCH_SIZE: int = int(os.getenv("TTS_BATCH_SIZE", "8"))
+    # Cache WAV theo nội dung câu
+    TTS_CACHE_ENABLED: bool = os.getenv("TTS_CACHE_ENABLED", "True").lower() == "true"
+    TTS_CACHE_DIR: str = os.getenv("TTS_CACHE_DIR", "/tmp/tts_cache")
+    TTS_CACHE_MAX_BYTES: int = int(os.getenv("TTS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    # Mã hóa MP3/AAC/OGG bằng một tiến trình ffmpeg chạy song song với tổng hợp, thay vì ghép cuối job
+    TTS_STREAMING_ENCODE: bool = os.getenv("TTS_STREAMING_ENCODE", "True").lower() == "true"
+    # Chu kỳ ghi gộp tiến độ và segment mới của job xuống MongoDB
+    PROGRESS_FLUSH_INTERVAL: float = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "2.0"))
+    # Hàng đợi job tạo audio (MongoDB) và worker
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_HEARTBEAT_INTERVAL: float = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF: float = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+    JOB_RETRY_BACKOFF_MAX: float = float(os.getenv("JOB_RETRY_BACKOFF_MAX", "600"))
+    JOB_SHUTDOWN_TIMEOUT: float = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "30"))
+    # Lập lịch công bằng giữa người dùng: số job chạy đồng thời tối đa mỗi người (0 là không giới hạn),
+    # văn bản ngắn hơn JOB_PREVIEW_MAX_WORDS từ được xếp vào lane ưu tiên
+    JOB_MAX_RUNNING_PER_USER: int = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "1"))
+    JOB_PREVIEW_MAX_WORDS: int = int(os.getenv("JOB_PREVIEW_MAX_WORDS", "300"))
+    # Số request tổng hợp đang chạy tối đa trong một tiến trình worker (mọi job / mỗi người dùng)
+    TTS_GLOBAL_MAX_SEGMENTS: int = int(os.getenv("TTS_GLOBAL_MAX_SEGMENTS", "8"))
+    TTS_USER_MAX_SEGMENTS: int = int(os.getenv("TTS_USER_MAX_SEGMENTS", "4"))
+    # Stream trực tiếp khi job đang chạy: chu kỳ kiểm tra segment mới và thời gian chờ tối đa
+    LIVE_STREAM_POLL_INTERVAL: float = float(os.getenv("LIVE_STREAM_POLL_INTERVAL", "1.0"))
+    LIVE_STREAM_IDLE_TIMEOUT: float = float(os.getenv("LIVE_STREAM_IDLE_TIMEOUT", "300"))
+    # HLS: thời lượng mục tiêu của mỗi media segment và cache các segment đã đóng gói
+    HLS_TARGET_DURATION: float = float(os.getenv("HLS_TARGET_DURATION", "10"))
+    HLS_CACHE_DIR: str = os.getenv("HLS_CACHE_DIR", "/tmp/tts_cache/hls")
+    HLS_CACHE_MAX_BYTES: int = int(os.getenv("HLS_CACHE_MAX_BYTES", str(1024 ** 3)))
+    # Thời hạn của URL playlist đã ký (làm tròn theo khung HLS_URL_TTL để CDN cache được)
+    HLS_URL_TTL: int = int(os.getenv("HLS_URL_TTL", "3600"))
 
     # VietTTS API URL
     VIETTTS_API_URL: str = os.getenv("VIETTTS_API_URL", "http://viet-tts:6000")
+    # Connection pool dùng chung cho các request tới VietTTS
+    VIETTTS_POOL_LIMIT: int = int(os.getenv("VIETTTS_POOL_LIMIT", "100"))
+    VIETTTS_POOL_LIMIT_PER_HOST: int = int(os.getenv("VIETTTS_POOL_LIMIT_PER_HOST", "32"))
+    VIETTTS_KEEPALIVE_TIMEOUT: float = float(os.getenv("VIETTTS_KEEPALIVE_TIMEOUT", "60"))
+    VIETTTS_DNS_CACHE_TTL: int = int(os.getenv("VIETTTS_DNS_CACHE_TTL", "300"))
+
+    # Health check chạy nền và circuit breaker cho TTS engine
+    TTS_HEALTH_CHECK_INTERVAL: float = float(os.getenv("TTS_HEALTH_CHECK_INTERVAL", "15"))
+    TTS_HEALTH_TTL: float = float(os.getenv("TTS_HEALTH_TTL", "60"))
+    TTS_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("TTS_BREAKER_FAILURE_THRESHOLD", "3"))
+    TTS_BREAKER_RESET_TIMEOUT: float = float(os.getenv("TTS_BREAKER_RESET_TIMEOUT", "30"))
 
     model_config: ClassVar[dict] = {
         "populate_by_name": True
@@ -1,3 +1,6 @@
+import hmac
+import time
+import hashlib
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import jwt
@@ -26,4 +29,17 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+def sign_url_path(path: str, expires: Optional[int] = None) -> str:
+    """Chữ ký HMAC của đường dẫn (kèm thời điểm hết hạn nếu có), cho các URL mà trình phát tải trực tiếp
+    và không gửi được header Authorization"""
+    payload = path if expires is None else f"{path}:{expires}"
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_url_signature(path: str, signature: str, expires: Optional[int] = None) -> bool:
+    if expires is not None and expires < time.time():
+        return False
+    return hmac.compare_digest(sign_url_path(path, expires), signature)
@@ -1,6 +1,8 @@
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 from core.config import settings
+from db.repositories.audio_repository import AudioRepository
+from db.repositories.job_repository import JobRepository
 
 logger = logging.getLogger(__name__)
 
@@ -22,5 +24,10 @@ async def close_mongo_connection():
         db.client.close()
     logger.info("MongoDB connection closed!")
 
+async def ensure_indexes():
+    logger.info("Ensuring MongoDB indexes...")
+    await AudioRepository(db.db).ensure_indexes()
+    await JobRepository(db.db).ensure_indexes()
+
 def get_database():
     return db.db
\ No newline at end of file
@@ -1,21 +1,50 @@
+import logging
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-from models.audio import Audio
+from models.audio import Audio, AudioSegment, AudioSummary
+
+logger = logging.getLogger(__name__)
+
+# Một audio cho mỗi tổ hợp văn bản + giọng + định dạng + sample rate (single-flight)
+AUDIO_REQUEST_KEY = ("text_id", "voice_model", "format", "sample_rate")
 
 class AudioRepository:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
         self.collection = database.audios
 
+    async def ensure_indexes(self) -> None:
+        try:
+            await self.collection.create_index(
+                [(field, ASCENDING) for field in AUDIO_REQUEST_KEY],
+                unique=True,
+                name="audio_request_unique"
+            )
+        except (DuplicateKeyError, OperationFailure) as e:
+            # Dữ liệu cũ đã có bản trùng: get_or_create vẫn chạy được nhưng không còn đảm bảo tuyệt đối
+            logger.warning(f"Could not create unique index on audios {AUDIO_REQUEST_KEY}: {str(e)}")
+
     async def get_by_id(self, id: str) -> Optional[Audio]:
         audio = await self.collection.find_one({"_id": ObjectId(id)})
         if audio:
             return Audio.model_validate(audio)
         return None
 
+    async def find_by_id(self, id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """Chỉ đọc các field được yêu cầu (projection), trả về document thô"""
+        return await self.collection.find_one({"_id": ObjectId(id)}, {field: 1 for field in fields})
+
+    async def get_summary_by_id(self, id: str) -> Optional[AudioSummary]:
+        audio = await self.collection.find_one({"_id": ObjectId(id)}, AudioSummary.projection())
+        if audio:
+            return AudioSummary.model_validate(audio)
+        return None
+
     async def get_by_text_id(self, text_id: str) -> Optional[Audio]:
         audio = await self.collection.find_one({"text_id": ObjectId(text_id)})
         if audio:
@@ -29,6 +58,15 @@ class AudioRepository:
             audios.append(Audio.model_validate(document))
         return audios
 
+    async def get_summaries_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[AudioSummary]:
+        audios = []
+        cursor = self.collection.find(
+            {"user_id": ObjectId(user_id)}, AudioSummary.projection()
+        ).sort("created_at", -1).skip(skip).limit(limit)
+        async for document in cursor:
+            audios.append(AudioSummary.model_validate(document))
+        return audios
+
     async def create(self, audio_data: Dict[str, Any]) -> Audio:
         if "text_id" in audio_data and isinstance(audio_data["text_id"], str):
             audio_data["text_id"] = ObjectId(audio_data["text_id"])
@@ -45,7 +83,72 @@ class AudioRepository:
         audio = await self.collection.find_one({"_id": result.inserted_id})
         return Audio.model_validate(audio)
 
-    async def update_status(self, id: str, status: str, error: str = None) -> Optional[Audio]:
+    async def get_or_create(self, audio_data: Dict[str, Any]) -> Tuple[Audio, bool]:
+        """Lấy audio cùng khóa (text, giọng, định dạng, sample rate) hoặc tạo mới trong một lệnh upsert
+        nguyên tử; trả về (audio, True nếu vừa được tạo)"""
+        for field in ("text_id", "user_id"):
+            if isinstance(audio_data.get(field), str):
+                audio_data[field] = ObjectId(audio_data[field])
+
+        now = datetime.utcnow()
+        audio_id = ObjectId()
+        document = {
+            "segments": [],
+            **audio_data,
+            "_id": audio_id,
+            "created_at": now,
+            "updated_at": now
+        }
+        key = {field: document[field] for field in AUDIO_REQUEST_KEY}
+        insert = {k: v for k, v in document.items() if k not in AUDIO_REQUEST_KEY}
+
+        audio = None
+        while audio is None:
+            try:
+                audio = await self.collection.find_one_and_update(
+                    key,
+                    {"$setOnInsert": insert},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # Hai upsert cùng lúc: request kia đã tạo xong, dùng bản của nó;
+                # nếu bản đó vừa bị xóa thì upsert lại
+                audio = await self.collection.find_one(key)
+
+        return Audio.model_validate(audio), audio["_id"] == audio_id
+
+    async def restart_if_failed(self, id: str) -> bool:
+        """Chuyển audio failed về pending để chạy lại; False nếu audio không còn ở trạng thái failed"""
+        result = await self.collection.update_one(
+            {"_id": ObjectId(id), "status": "failed"},
+            {"$set": {"status": "pending", "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+    async def mark_pending(self, id: str) -> bool:
+        """Chuyển audio về pending khi job tạo lại được đưa vào hàng đợi; không làm gì nếu worker đã
+        bắt đầu xử lý. Segment của audio đã hoàn tất được chuyển ngay sang previous_segments (vẫn dùng lại
+        được theo content hash) để live stream không phát phiên bản cũ trước khi worker nhận job.
+        Segment của lần chạy lỗi được giữ nguyên làm checkpoint."""
+        completed = {"$eq": ["$status", "completed"]}
+        result = await self.collection.update_one(
+            {"_id": ObjectId(id), "status": {"$ne": "processing"}},
+            [{"$set": {
+                "previous_segments": {"$cond": [
+                    completed,
+                    {"$concatArrays": [{"$ifNull": ["$previous_segments", []]}, {"$ifNull": ["$segments", []]}]},
+                    "$previous_segments"
+                ]},
+                "segments": {"$cond": [completed, [], "$segments"]},
+                "seek_index": {"$cond": [completed, [], "$seek_index"]},
+                "status": "pending",
+                "updated_at": datetime.utcnow()
+            }}]
+        )
+        return result.modified_count > 0
+
+    async def update_status(self, id: str, status: str, error: str = None) -> Optional[AudioSummary]:
         update_data = {
             "status": status,
             "updated_at": datetime.utcnow()
@@ -58,13 +161,16 @@ class AudioRepository:
             {"_id": ObjectId(id)}, {"$set": update_data}
         )
 
-        return await self.get_by_id(id)
+        return await self.get_summary_by_id(id)
 
-    async def update_with_segments(self, id: str, url: str, duration: float, segments: List[Dict[str, Any]]) -> Optional[Audio]:
+    async def update_with_segments(self, id: str, url: str, duration: float, segments: List[Dict[str, Any]],
+                                   seek_index: Optional[List[int]] = None) -> Optional[Audio]:
         update_data = {
             "url": url,
             "duration": duration,
             "segments": segments,
+            "seek_index": seek_index or [],
+            "previous_segments": [],
             "status": "completed",
             "updated_at": datetime.utcnow()
         }
@@ -75,6 +181,47 @@ class AudioRepository:
 
         return await self.get_by_id(id)
 
+    async def reset_segments(self, id: str, keep: int = 0,
+                             previous_segments: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Chỉ giữ lại keep segment đầu (checkpoint dùng để chạy tiếp) trước khi tạo lại,
+        segment mới được thêm dần vào sau đó. previous_segments (các segment còn dùng lại được của
+        phiên bản trước) được ghi vào field riêng trong cùng lệnh update."""
+        update_data: Dict[str, Any] = {"seek_index": [], "progress": None, "updated_at": datetime.utcnow()}
+        if previous_segments is not None:
+            update_data["previous_segments"] = previous_segments
+
+        await self.collection.update_one(
+            {"_id": ObjectId(id)},
+            {
+                "$push": {"segments": {"$each": [], "$slice": keep}},
+                "$set": update_data
+            }
+        )
+
+    async def update_progress(self, id: str, progress: Dict[str, Any],
+                              segments: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Ghi tiến độ và thêm các segment mới trong một lệnh update, không đọc lại document"""
+        update: Dict[str, Any] = {"$set": {"progress": progress, "updated_at": datetime.utcnow()}}
+        if segments:
+            update["$push"] = {"segments": {"$each": segments}}
+
+        await self.collection.update_one({"_id": ObjectId(id)}, update)
+
+    async def get_segments_since(self, id: str, start: int, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Trạng thái job và các segment từ vị trí start, không đọc lại cả document"""
+        document = await self.collection.find_one(
+            {"_id": ObjectId(id)},
+            {"status": 1, "error": 1, "segments": {"$slice": [start, limit]}}
+        )
+        if not document:
+            return None
+
+        return {
+            "status": document.get("status"),
+            "error": document.get("error"),
+            "segments": [AudioSegment.model_validate(segment) for segment in document.get("segments", [])]
+        }
+
     async def delete(self, id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
@@ -0,0 +1,266 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models.job import Job, JOB_PRIORITY_NORMAL
+
+# Số job ứng viên xét trong mỗi lần claim (bỏ qua ứng viên của người dùng đã hết slot)
+CLAIM_CANDIDATES = 20
+
+class JobRepository:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+        self.collection = database.jobs
+        # Mỗi người dùng một document {_id: user_id, slots: [{job_id, worker_id, lease_until}]},
+        # giữ giới hạn job chạy đồng thời; slot hết hạn cùng lease của job
+        self.user_slots = database.job_user_slots
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index(
+            [("status", ASCENDING), ("priority", ASCENDING), ("start_tag", ASCENDING), ("run_at", ASCENDING)]
+        )
+        await self.collection.create_index([("active", ASCENDING), ("start_tag", ASCENDING)])
+        await self.collection.create_index([("user_id", ASCENDING), ("finish_tag", DESCENDING)])
+        await self.collection.create_index([("finish_tag", DESCENDING)])
+        await self.collection.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+        # Mỗi audio chỉ có một job queued/running, enqueue lặp lại trả về job đang có
+        await self.collection.create_index(
+            [("audio_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"active": True},
+            name="audio_id_active_unique"
+        )
+
+    async def get_by_id(self, id: str) -> Optional[Job]:
+        job = await self.collection.find_one({"_id": ObjectId(id)})
+        if job:
+            return Job.model_validate(job)
+        return None
+
+    async def get_active_by_audio_id(self, audio_id: str) -> Optional[Job]:
+        job = await self.collection.find_one({"audio_id": ObjectId(audio_id), "active": True})
+        if job:
+            return Job.model_validate(job)
+        return None
+
+    async def _virtual_time(self) -> float:
+        """Thời gian ảo hiện tại: start tag nhỏ nhất của các job còn hoạt động,
+        hàng đợi rỗng thì là finish tag lớn nhất đã cấp"""
+        job = await self.collection.find_one(
+            {"active": True}, {"start_tag": 1}, sort=[("start_tag", ASCENDING)]
+        )
+        if job:
+            return job.get("start_tag", 0.0)
+
+        job = await self.collection.find_one({}, {"finish_tag": 1}, sort=[("finish_tag", DESCENDING)])
+        return job.get("finish_tag", 0.0) if job else 0.0
+
+    async def _user_finish_tag(self, user_id: str) -> float:
+        job = await self.collection.find_one(
+            {"user_id": ObjectId(user_id)}, {"finish_tag": 1}, sort=[("finish_tag", DESCENDING)]
+        )
+        return job.get("finish_tag", 0.0) if job else 0.0
+
+    async def enqueue(self, audio_id: str, user_id: str, max_attempts: int,
+                      cost: float = 1.0, priority: int = JOB_PRIORITY_NORMAL, weight: float = 1.0) -> Job:
+        """Thêm job cho audio; nếu audio đã có job queued/running thì trả về job đó.
+        Weighted fair queuing: finish tag = start tag + cost / weight, người dùng weight gấp đôi
+        được phục vụ gấp đôi khối lượng khi hàng đợi tranh chấp."""
+        now = datetime.utcnow()
+        weight = max(weight, 0.01)
+        start_tag = max(await self._virtual_time(), await self._user_finish_tag(user_id))
+        job_data = {
+            "audio_id": ObjectId(audio_id),
+            "user_id": ObjectId(user_id),
+            "status": "queued",
+            "active": True,
+            "priority": priority,
+            "cost": cost,
+            "weight": weight,
+            "start_tag": start_tag,
+            "finish_tag": start_tag + cost / weight,
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "run_at": now,
+            "worker_id": None,
+            "lease_until": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        while True:
+            try:
+                result = await self.collection.insert_one({k: v for k, v in job_data.items() if k != "_id"})
+                break
+            except DuplicateKeyError:
+                existing = await self.get_active_by_audio_id(audio_id)
+                if existing:
+                    return existing
+                # Job cũ vừa kết thúc giữa hai lệnh, thử chèn lại
+
+        job_data["_id"] = result.inserted_id
+        return Job.model_validate(job_data)
+
+    @staticmethod
+    def _live_slots(now: datetime) -> Dict[str, Any]:
+        """Biểu thức aggregation: các slot còn lease"""
+        return {"$filter": {"input": {"$ifNull": ["$slots", []]}, "cond": {"$gt": ["$$this.lease_until", now]}}}
+
+    async def _busy_user_ids(self, max_running_per_user: int, now: datetime) -> List[ObjectId]:
+        """Người dùng đã giữ đủ max_running_per_user slot. Chỉ để lọc ứng viên,
+        giới hạn thật được giữ bởi _reserve_slot."""
+        cursor = self.user_slots.find(
+            {"$expr": {"$gte": [{"$size": self._live_slots(now)}, max_running_per_user]}}, {"_id": 1}
+        )
+        return [document["_id"] async for document in cursor]
+
+    async def _reserve_slot(self, job_id: ObjectId, user_id: ObjectId, worker_id: str,
+                            lease_until: datetime, max_running_per_user: int, now: datetime) -> bool:
+        """Giữ một slot chạy của người dùng trong một lệnh update nguyên tử: chỉ khớp khi số slot còn lease
+        nhỏ hơn giới hạn, slot hết hạn được dọn cùng lúc. Người dùng đã đủ slot thì upsert đụng _id
+        (DuplicateKeyError) và trả về False."""
+        live = self._live_slots(now)
+        try:
+            await self.user_slots.update_one(
+                {"_id": user_id, "$expr": {"$lt": [{"$size": live}, max_running_per_user]}},
+                [{"$set": {"slots": {"$concatArrays": [
+                    live, [{"job_id": job_id, "worker_id": worker_id, "lease_until": lease_until}]
+                ]}}}],
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _release_slot(self, job_id: ObjectId, user_id: ObjectId, worker_id: str) -> None:
+        await self.user_slots.update_one(
+            {"_id": user_id},
+            {"$pull": {"slots": {"job_id": job_id, "worker_id": worker_id}}}
+        )
+
+    async def claim(self, worker_id: str, lease_seconds: float, max_running_per_user: int = 0) -> Optional[Job]:
+        """Nhận nguyên tử một job đến hạn, hoặc job running có lease đã hết hạn (worker cũ đã chết).
+        Lane ưu tiên cao trước, trong lane theo start tag nhỏ nhất. Với max_running_per_user > 0
+        (0 là không giới hạn), slot của người dùng được giữ trước khi nhận job nên nhiều worker
+        cùng claim cũng không vượt giới hạn."""
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        queued = {"status": "queued", "run_at": {"$lte": now}}
+        expired = {"status": "running", "lease_until": {"$lt": now}}
+
+        busy_user_ids: Set[ObjectId] = set()
+        if max_running_per_user > 0:
+            busy_user_ids.update(await self._busy_user_ids(max_running_per_user, now))
+
+        query: Dict[str, Any] = {"$or": [queued, expired]}
+        if busy_user_ids:
+            query["user_id"] = {"$nin": list(busy_user_ids)}
+        cursor = self.collection.find(
+            query, {"_id": 1, "user_id": 1},
+            sort=[("priority", ASCENDING), ("start_tag", ASCENDING), ("run_at", ASCENDING)],
+            limit=CLAIM_CANDIDATES
+        )
+
+        async for candidate in cursor:
+            user_id = candidate["user_id"]
+            if user_id in busy_user_ids:
+                continue
+            if max_running_per_user > 0 and not await self._reserve_slot(
+                    candidate["_id"], user_id, worker_id, lease_until, max_running_per_user, now):
+                busy_user_ids.add(user_id)
+                continue
+
+            job = await self.collection.find_one_and_update(
+                {"_id": candidate["_id"], "$or": [queued, expired]},
+                {
+                    "$set": {
+                        "status": "running",
+                        "worker_id": worker_id,
+                        "lease_until": lease_until,
+                        "updated_at": now
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                return_document=ReturnDocument.AFTER
+            )
+            if job:
+                return Job.model_validate(job)
+
+            # Worker khác đã nhận job này trước, trả lại slot vừa giữ
+            if max_running_per_user > 0:
+                await self._release_slot(candidate["_id"], user_id, worker_id)
+
+        return None
+
+    async def heartbeat(self, job: Job, worker_id: str, lease_seconds: float) -> bool:
+        """Gia hạn lease của job và slot người dùng; False nếu worker không còn giữ job
+        (lease đã hết hạn hoặc đã bị worker khác nhận)"""
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        result = await self.collection.update_one(
+            {"_id": ObjectId(job.id), "status": "running", "worker_id": worker_id, "lease_until": {"$gte": now}},
+            {"$set": {"lease_until": lease_until, "updated_at": now}}
+        )
+        if result.matched_count == 0:
+            return False
+
+        await self.user_slots.update_one(
+            {"_id": ObjectId(job.user_id), "slots": {"$elemMatch": {"job_id": ObjectId(job.id), "worker_id": worker_id}}},
+            {"$set": {"slots.$.lease_until": lease_until}}
+        )
+        return True
+
+    async def complete(self, job: Job, worker_id: str) -> bool:
+        result = await self.collection.update_one(
+            {"_id": ObjectId(job.id), "worker_id": worker_id},
+            {
+                "$set": {"status": "completed", "lease_until": None, "updated_at": datetime.utcnow()},
+                "$unset": {"active": ""}
+            }
+        )
+        await self._release_slot(ObjectId(job.id), ObjectId(job.user_id), worker_id)
+        return result.matched_count > 0
+
+    async def fail(self, job: Job, worker_id: str, error: str,
+                   retry_delay: float) -> bool:
+        """Trả job về hàng đợi sau retry_delay giây nếu còn lượt thử, ngược lại đánh dấu failed.
+        Trả về True nếu job sẽ được thử lại."""
+        now = datetime.utcnow()
+        if job.attempts < job.max_attempts:
+            update = {
+                "$set": {
+                    "status": "queued",
+                    "run_at": now + timedelta(seconds=retry_delay),
+                    "worker_id": None,
+                    "lease_until": None,
+                    "error": error,
+                    "updated_at": now
+                }
+            }
+            retry = True
+        else:
+            update = {
+                "$set": {"status": "failed", "lease_until": None, "error": error, "updated_at": now},
+                "$unset": {"active": ""}
+            }
+            retry = False
+
+        await self.collection.update_one({"_id": ObjectId(job.id), "worker_id": worker_id}, update)
+        await self._release_slot(ObjectId(job.id), ObjectId(job.user_id), worker_id)
+        return retry
+
+    async def release(self, job: Job, worker_id: str) -> None:
+        """Trả job đang chạy về hàng đợi ngay (worker dừng), không tính là một lần thử"""
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": ObjectId(job.id), "status": "running", "worker_id": worker_id},
+            {
+                "$set": {"status": "queued", "run_at": now, "worker_id": None, "lease_until": None, "updated_at": now},
+                "$inc": {"attempts": -1}
+            }
+        )
+        await self._release_slot(ObjectId(job.id), ObjectId(job.user_id), worker_id)
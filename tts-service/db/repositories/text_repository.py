@@ -3,7 +3,7 @@ from typing import List, Optional, Dict, Any
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from models.text import Text
+from models.text import Text, TextSummary
 
 
 class TextRepository:
@@ -17,6 +17,16 @@ class TextRepository:
             return Text.model_validate(text)
         return None
 
+    async def find_by_id(self, id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """Chỉ đọc các field được yêu cầu (projection), trả về document thô"""
+        return await self.collection.find_one({"_id": ObjectId(id)}, {field: 1 for field in fields})
+
+    async def get_summary_by_id(self, id: str) -> Optional[TextSummary]:
+        text = await self.collection.find_one({"_id": ObjectId(id)}, TextSummary.projection())
+        if text:
+            return TextSummary.model_validate(text)
+        return None
+
     async def get_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[Text]:
         texts = []
         cursor = self.collection.find({"user_id": ObjectId(user_id)}).skip(skip).limit(limit)
@@ -24,6 +34,13 @@ class TextRepository:
             texts.append(Text.model_validate(document))
         return texts
 
+    async def get_summaries_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[TextSummary]:
+        texts = []
+        cursor = self.collection.find({"user_id": ObjectId(user_id)}, TextSummary.projection()).skip(skip).limit(limit)
+        async for document in cursor:
+            texts.append(TextSummary.model_validate(document))
+        return texts
+
     async def create(self, text_data: Dict[str, Any]) -> Text:
         if "user_id" in text_data and isinstance(text_data["user_id"], str):
             text_data["user_id"] = ObjectId(text_data["user_id"])
@@ -51,7 +68,7 @@ class TextRepository:
         )
         return await self.get_by_id(id)
 
-    async def update_status(self, id: str, status: str, error: Optional[str] = None) -> Optional[Text]:
+    async def update_status(self, id: str, status: str, error: Optional[str] = None) -> Optional[TextSummary]:
         update_data = {
             "status": status,
             "updated_at": datetime.utcnow()
@@ -63,7 +80,7 @@ class TextRepository:
         await self.collection.update_one(
             {"_id": ObjectId(id)}, {"$set": update_data}
         )
-        return await self.get_by_id(id)
+        return await self.get_summary_by_id(id)
 
     async def delete(self, id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(id)})
@@ -4,7 +4,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from core.config import settings
 from core.logging import setup_logging
-from db.mongodb import connect_to_mongo, close_mongo_connection
+from db.mongodb import connect_to_mongo, close_mongo_connection, ensure_indexes
+from services.tts.http_session import open_http_session, close_http_session
+from services.tts.tts_factory import start_tts_health_checks, stop_tts_health_checks
 from api.router import api_router
 
 # Thiết lập logging
@@ -28,7 +30,12 @@ app.add_middleware(
 )
 
 app.add_event_handler("startup", connect_to_mongo)
+app.add_event_handler("startup", ensure_indexes)
+app.add_event_handler("startup", open_http_session)
+app.add_event_handler("startup", start_tts_health_checks)
+app.add_event_handler("shutdown", stop_tts_health_checks)
 app.add_event_handler("shutdown", close_mongo_connection)
+app.add_event_handler("shutdown", close_http_session)
 
 app.include_router(api_router, prefix="/api")
 
@@ -1,4 +1,4 @@
-from typing import Optional, List, Any, Annotated
+from typing import Optional, List, Any, Annotated, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field, BeforeValidator
 from bson import ObjectId
@@ -22,12 +22,20 @@ class AudioSegment(BaseModel):
     end_time: float
     text: str
     url: str
+    # Khóa nội dung (văn bản chuẩn hóa + giọng + sample rate + engine) để dùng lại khi tạo lại audio
+    content_hash: Optional[str] = None
 
     model_config = {
         "populate_by_name": True,
         "arbitrary_types_allowed": True
     }
 
+class AudioProgress(BaseModel):
+    completed: int = 0
+    total: int = 0
+    eta_seconds: Optional[float] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 class Audio(BaseModel):
     id: Optional[PyObjectId] = Field(default=None, alias="_id")
     text_id: PyObjectId
@@ -38,7 +46,14 @@ class Audio(BaseModel):
     format: str = "mp3"
     sample_rate: int = 22050
     segments: List[AudioSegment] = []
+    # Segment của phiên bản hoàn chỉnh trước đó khi đang tạo lại: file của chúng chỉ bị xóa
+    # khi phiên bản mới tạo xong, để job lỗi giữa chừng vẫn dùng lại được ở lần thử sau
+    previous_segments: List[AudioSegment] = []
+    # Offset byte trong file audio tại start_time của từng segment (cùng thứ tự với segments)
+    seek_index: List[int] = []
     status: str = "completed"
+    # Tiến độ job đang chạy (số segment đã xong / tổng, thời gian còn lại ước tính)
+    progress: Optional[AudioProgress] = None
     error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -66,4 +81,30 @@ class Audio(BaseModel):
             data["text_id"] = ObjectId(data["text_id"])
         if data.get("user_id"):
             data["user_id"] = ObjectId(data["user_id"])
-        return data
\ No newline at end of file
+        return data
+
+class AudioSummary(BaseModel):
+    """Audio không kèm segments/seek_index, dùng cho danh sách và trạng thái"""
+    id: Optional[PyObjectId] = Field(default=None, alias="_id")
+    text_id: PyObjectId
+    user_id: PyObjectId
+    voice_model: str
+    url: str = ""
+    duration: float = 0.0
+    format: str = "mp3"
+    sample_rate: int = 22050
+    status: str = "completed"
+    progress: Optional[AudioProgress] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str}
+    }
+
+    @classmethod
+    def projection(cls) -> Dict[str, int]:
+        return {field.alias or name: 1 for name, field in cls.model_fields.items()}
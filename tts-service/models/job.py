@@ -0,0 +1,50 @@
+from typing import Optional, Any, Annotated
+from datetime import datetime
+from pydantic import BaseModel, Field, BeforeValidator
+from bson import ObjectId
+
+def validate_object_id(v: Any) -> str:
+    if isinstance(v, ObjectId):
+        return str(v)
+    if isinstance(v, str):
+        try:
+            return str(ObjectId(v))
+        except Exception:
+            raise ValueError("Invalid ObjectId format")
+    raise ValueError("Invalid ObjectId type")
+
+PyObjectId = Annotated[str, BeforeValidator(validate_object_id)]
+
+# Lane ưu tiên: số nhỏ được nhận trước (bản nghe thử ngắn chạy trước cả cuốn sách)
+JOB_PRIORITY_PREVIEW = 0
+JOB_PRIORITY_NORMAL = 1
+
+class Job(BaseModel):
+    """Job tạo audio trong hàng đợi MongoDB: queued -> running (có lease) -> completed/failed"""
+    id: Optional[PyObjectId] = Field(default=None, alias="_id")
+    audio_id: PyObjectId
+    user_id: PyObjectId
+    status: str = "queued"
+    # True khi job còn queued/running, dùng cho unique index để mỗi audio chỉ có một job đang hoạt động
+    active: Optional[bool] = True
+    priority: int = JOB_PRIORITY_NORMAL
+    # Weighted fair queuing giữa người dùng: cost là khối lượng job (số từ), weight là phần chia của
+    # người dùng (finish_tag = start_tag + cost / weight), start_tag/finish_tag là thời gian ảo
+    cost: float = 1.0
+    weight: float = 1.0
+    start_tag: float = 0.0
+    finish_tag: float = 0.0
+    attempts: int = 0
+    max_attempts: int = 3
+    # Thời điểm sớm nhất job được nhận (lùi lại khi thử lại)
+    run_at: datetime = Field(default_factory=datetime.utcnow)
+    worker_id: Optional[str] = None
+    lease_until: Optional[datetime] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True
+    }
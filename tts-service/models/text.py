@@ -1,4 +1,4 @@
-from typing import Optional, List, Any, Annotated
+from typing import Optional, List, Any, Annotated, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field, BeforeValidator
 from bson import ObjectId
@@ -48,4 +48,27 @@ class Text(BaseModel):
             data["_id"] = ObjectId(data["_id"])
         if data.get("user_id"):
             data["user_id"] = ObjectId(data["user_id"])
-        return data
\ No newline at end of file
+        return data
+
+class TextSummary(BaseModel):
+    """Text không kèm content, dùng cho danh sách"""
+    id: Optional[PyObjectId] = Field(default=None, alias="_id")
+    user_id: PyObjectId
+    title: str
+    language: str = "vi"
+    tags: List[str] = []
+    status: str = "pending"
+    processing_error: Optional[str] = None
+    word_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str}
+    }
+
+    @classmethod
+    def projection(cls) -> Dict[str, int]:
+        return {field.alias or name: 1 for name, field in cls.model_fields.items()}
@@ -24,6 +24,8 @@ class User(BaseModel):
     hashed_password: str
     disabled: bool = False
     is_admin: bool = False
+    # Phần chia của người dùng trong hàng đợi tạo audio (weighted fair queuing)
+    job_weight: float = 1.0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -60,6 +60,22 @@ class AudioResponse(AudioBase):
         }
     }
 
+class AudioProgressResponse(BaseModel):
+    completed: int
+    total: int
+    eta_seconds: Optional[float] = None
+
+class AudioSummaryResponse(AudioBase):
+    id: str
+    user_id: str
+    url: str
+    duration: float
+    status: str
+    progress: Optional[AudioProgressResponse] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+
 class TTSRequest(BaseModel):
     text_id: str
     voice_model: str = "female"
@@ -40,4 +40,16 @@ class TextResponse(TextBase):
                 "updated_at": "2023-07-15T10:35:00"
             }
         }
-    }
\ No newline at end of file
+    }
+
+class TextSummaryResponse(BaseModel):
+    id: str
+    user_id: str
+    title: str
+    language: str = "vi"
+    tags: List[str]
+    status: str
+    word_count: int
+    processing_error: Optional[str] = None
+    created_at: str
+    updated_at: str
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional, Tuple
+
+from utils.audio_probe import WAVE_FORMAT_PCM, SeekIndexBuilder, read_wav_info
+from utils.audio_utils import WAV_COPY_BUFFER_SIZE, encoder_command
+from utils.blob_store import BLOB_CHUNK_SIZE, upload_blob_stream
+
+logger = logging.getLogger(__name__)
+
+# Định dạng mà muxer ffmpeg ghi được ra pipe (không cần seek lại đầu file)
+STREAMABLE_FORMATS = ("mp3", "aac", "ogg")
+
+_RAW_PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+
+class StreamingEncoder:
+    """Một tiến trình ffmpeg chạy suốt job: PCM của từng segment được ghi vào stdin ngay khi segment
+    xong, output được stream thẳng lên blob store và quét frame để dựng seek index"""
+
+    def __init__(self, output_format: str, key: str):
+        self.output_format = output_format
+        self.key = key
+        self.pcm_format: Optional[Tuple[int, int, int]] = None
+        self.size = 0
+        self._boundaries: List[float] = []
+        # Mốc thời gian được thêm trước khi ghi PCM nên luôn có trước frame tương ứng ở output
+        self._seek_builder = (
+            SeekIndexBuilder(output_format, self._boundaries) if output_format in ("mp3", "aac") else None
+        )
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._upload_task: Optional[asyncio.Task] = None
+        self._stderr_task: Optional[asyncio.Task] = None
+        self._finished = False
+
+    @staticmethod
+    def supports(output_format: str) -> bool:
+        return output_format in STREAMABLE_FORMATS
+
+    async def _start(self, pcm_format: Tuple[int, int, int]) -> None:
+        channels, sample_rate, sample_width = pcm_format
+        input_args = [
+            "-f", _RAW_PCM_FORMATS[sample_width],
+            "-ar", str(sample_rate),
+            "-ac", str(channels),
+            "-i", "pipe:0",
+        ]
+
+        self.pcm_format = pcm_format
+        self._process = await asyncio.create_subprocess_exec(
+            *encoder_command(self.output_format, input_args, "pipe:1"),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        self._stderr_task = asyncio.create_task(self._process.stderr.read())
+        self._upload_task = asyncio.create_task(
+            upload_blob_stream(self._read_output(), self.key, f".{self.output_format}")
+        )
+        logger.info(f"Started streaming {self.output_format} encoder for {self.key} "
+                    f"({sample_rate}Hz, {channels}ch, {sample_width * 8}bit)")
+
+    async def _read_output(self) -> AsyncIterator[bytes]:
+        while chunk := await self._process.stdout.read(BLOB_CHUNK_SIZE):
+            if self._seek_builder is not None:
+                self._seek_builder.feed(chunk)
+            self.size += len(chunk)
+            yield chunk
+
+        # Không hoàn tất upload nếu encoder lỗi giữa chừng (output bị cắt)
+        returncode = await self._process.wait()
+        if returncode != 0:
+            stderr = await self._stderr_task
+            raise RuntimeError(f"ffmpeg exited with code {returncode}: {stderr.decode(errors='replace')}")
+
+    async def _write(self, data: bytes) -> bool:
+        """Ghi vào stdin của ffmpeg. Chỉ upload đọc stdout: upload đã dừng (lỗi blob store...) thì ffmpeg
+        bị chặn và drain() không bao giờ trả về, nên drain() được chạy đua với upload. False nếu upload
+        đã kết thúc."""
+        if self._upload_task.done():
+            return False
+
+        self._process.stdin.write(data)
+        drain = asyncio.ensure_future(self._process.stdin.drain())
+        await asyncio.wait([drain, self._upload_task], return_when=asyncio.FIRST_COMPLETED)
+        if not drain.done():
+            drain.cancel()
+            await asyncio.gather(drain, return_exceptions=True)
+            return False
+
+        # Lỗi pipe (ffmpeg đã thoát) được xử lý như trước
+        drain.result()
+        return True
+
+    async def add_segment(self, wav_file: str, start_time: float) -> bool:
+        """Ghi dữ liệu mẫu của segment vào encoder. False nếu segment không thể nối vào luồng
+        (không phải WAV PCM, khác định dạng với segment đầu, encoder đã dừng)."""
+        info = await asyncio.to_thread(read_wav_info, wav_file)
+        if info is None or info.format_tag != WAVE_FORMAT_PCM or info.sample_width not in _RAW_PCM_FORMATS:
+            logger.warning(f"Segment {wav_file} is not a PCM WAV file")
+            return False
+
+        try:
+            if self._process is None:
+                await self._start(info.pcm_format)
+            elif info.pcm_format != self.pcm_format:
+                logger.warning(f"Segment {wav_file} has format {info.pcm_format}, expected {self.pcm_format}")
+                return False
+
+            self._boundaries.append(start_time)
+
+            with open(wav_file, "rb") as f:
+                f.seek(info.data_offset)
+                remaining = info.data_size
+                while remaining > 0:
+                    buffer = await asyncio.to_thread(f.read, min(WAV_COPY_BUFFER_SIZE, remaining))
+                    if not buffer:
+                        break
+                    if not await self._write(buffer):
+                        logger.warning(f"Streaming encoder for {self.key} stopped: upload is no longer running")
+                        return False
+                    remaining -= len(buffer)
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Streaming encoder for {self.key} stopped: {str(e)}")
+            return False
+
+        return True
+
+    async def finish(self) -> Tuple[str, List[int]]:
+        """Đóng stdin, chờ encoder và upload xong; trả về URL và seek index (rỗng với ogg)"""
+        if self._process is None:
+            raise RuntimeError("No segment was written to the encoder")
+
+        self._finished = True
+        self._process.stdin.close()
+        url = await self._upload_task
+        await self._process.wait()
+
+        seek_index = self._seek_builder.finish(self.size) if self._seek_builder is not None else []
+        logger.info(f"Streaming encoder finished: {url} ({self.size} bytes)")
+        return url, seek_index
+
+    async def abort(self) -> None:
+        if self._process is None or self._finished:
+            return
+
+        self._finished = True
+        if self._process.returncode is None:
+            self._process.kill()
+        # wait() chỉ trả về khi mọi pipe của tiến trình đã đóng
+        self._process.stdin.close()
+
+        for task in (self._upload_task, self._stderr_task):
+            task.cancel()
+        await asyncio.gather(self._upload_task, self._stderr_task, return_exceptions=True)
+        # Upload dừng giữa chừng thì stdout còn dữ liệu chưa đọc và pipe không bao giờ được đóng
+        await self._process.stdout.read()
+        await self._process.wait()
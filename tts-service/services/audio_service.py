@@ -1,31 +1,47 @@
 import os
 import asyncio
 import logging
+import shutil
 import tempfile
 import time
 import uuid
-from typing import List, Dict, Any, Optional
-from fastapi import HTTPException, status, BackgroundTasks
+from collections import deque
+from contextlib import aclosing
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Callable
+from fastapi import HTTPException, status
 from bson import ObjectId
 
 from core.config import settings
 from db.repositories.audio_repository import AudioRepository
 from db.repositories.text_repository import TextRepository
-from models.audio import Audio, AudioSegment
+from db.repositories.job_repository import JobRepository
+from models.audio import Audio, AudioSegment, AudioSummary
 from models.user import User
+from models.job import JOB_PRIORITY_PREVIEW, JOB_PRIORITY_NORMAL
 from schemas.audio import AudioCreate, TTSRequest
 from services.tts.tts_factory import TTSFactory
-from utils.firebase_firestore import upload_audio_to_firestore, upload_audio_segment_to_firestore, delete_audio_from_firestore
+from services.tts.segment_cache import SegmentCache, segment_cache
+from services.audio_encoder import StreamingEncoder
+from services.progress_reporter import ProgressReporter
+from services.segment_scheduler import segment_scheduler
+from utils.blob_store import upload_blob, download_blob, delete_blob, iter_blob
 from utils.text_processor import preprocess_text, split_text_into_chunks, analyze_vietnamese_text
-from utils.audio_utils import concatenate_audio_files, get_audio_duration
+from utils.audio_utils import concatenate_audio_files, get_audio_duration, package_hls_segment
+from utils.audio_probe import build_seek_index
+from utils.hls import HLS_SLICEABLE_FORMATS, HLSGroup, group_segments, render_playlist, id3_timestamp_tag
 
 logger = logging.getLogger(__name__)
 
+# Media segment HLS đã đóng gói, khóa theo nội dung nhóm câu và thời điểm bắt đầu
+hls_cache = SegmentCache(settings.HLS_CACHE_DIR, settings.HLS_CACHE_MAX_BYTES, extension="seg")
+
 
 class AudioService:
-    def __init__(self, audio_repository: AudioRepository, text_repository: TextRepository):
+    def __init__(self, audio_repository: AudioRepository, text_repository: TextRepository,
+                 job_repository: Optional[JobRepository] = None):
         self.audio_repository = audio_repository
         self.text_repository = text_repository
+        self.job_repository = job_repository
         self.tts_factory = TTSFactory()
 
     async def create_audio_request(self, request: TTSRequest, user: User) -> Audio:
@@ -43,10 +59,6 @@ class AudioService:
                 detail="Not enough permissions"
             )
 
-        existing_audio = await self.audio_repository.get_by_text_id(request.text_id)
-        if existing_audio and existing_audio.status == "completed":
-            return existing_audio
-
         audio_data = {
             "text_id": ObjectId(request.text_id),
             "user_id": ObjectId(str(user.id)),
@@ -59,23 +71,47 @@ class AudioService:
             "status": "pending"
         }
 
-        audio = await self.audio_repository.create(audio_data)
-        return audio
+        # Single-flight: request trùng (cùng văn bản, giọng, định dạng, sample rate) nhận lại audio đang có.
+        # Audio pending/processing được tham gia chung job, audio failed được chạy lại từ checkpoint.
+        audio, created = await self.audio_repository.get_or_create(audio_data)
+        if created:
+            logger.info(f"Created audio request {audio.id} for text {request.text_id}")
+        elif audio.status == "failed" and await self.audio_repository.restart_if_failed(str(audio.id)):
+            audio.status = "pending"
+        else:
+            logger.info(f"Joining existing audio {audio.id} ({audio.status}) for text {request.text_id}")
 
-    async def generate_audio(self, audio_id: str, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+        return audio
 
-        audio = await self.audio_repository.get_by_id(audio_id)
+    async def generate_audio(self, audio_id: str, weight: float = 1.0) -> Dict[str, Any]:
+        """Đưa audio vào hàng đợi job; worker (worker.py) sẽ nhận và xử lý.
+        weight là phần chia của chủ audio trong hàng đợi (User.job_weight)."""
+        audio = await self.audio_repository.get_summary_by_id(audio_id)
         if not audio:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Audio request not found"
             )
 
-        await self.audio_repository.update_status(str(audio.id), "processing")
+        # Khối lượng job (số từ) quyết định thứ tự fair queuing; văn bản ngắn đi lane ưu tiên
+        text = await self.text_repository.get_summary_by_id(str(audio.text_id))
+        word_count = text.word_count if text else 0
+        priority = JOB_PRIORITY_PREVIEW if word_count <= settings.JOB_PREVIEW_MAX_WORDS else JOB_PRIORITY_NORMAL
+
+        job = await self.job_repository.enqueue(
+            str(audio.id), str(audio.user_id), settings.JOB_MAX_ATTEMPTS, max(1, word_count), priority, weight
+        )
 
-        background_tasks.add_task(self._process_audio_task, str(audio.id))
+        # Audio đã có job đang chạy thì giữ nguyên trạng thái processing (và các segment đang tạo)
+        if job.status == "queued":
+            await self.audio_repository.mark_pending(str(audio.id))
 
-        return {"status": "processing", "message": "Audio generation started", "audio_id": str(audio.id)}
+        return {
+            "status": "processing" if job.status == "running" else "pending",
+            "message": "Audio generation queued",
+            "audio_id": str(audio.id),
+            "job_id": str(job.id)
+        }
 
     async def get_audio(self, audio_id: str, user: User) -> Audio:
         """Lấy thông tin audio theo ID"""
@@ -95,9 +131,9 @@ class AudioService:
 
         return audio
 
-    async def get_user_audios(self, user: User, skip: int = 0, limit: int = 100) -> List[Audio]:
-        """Lấy danh sách audio của người dùng"""
-        return await self.audio_repository.get_by_user_id(str(user.id), skip, limit)
+    async def get_user_audios(self, user: User, skip: int = 0, limit: int = 100) -> List[AudioSummary]:
+        """Lấy danh sách audio của người dùng (không kèm segments)"""
+        return await self.audio_repository.get_summaries_by_user_id(str(user.id), skip, limit)
 
     async def delete_audio(self, audio_id: str, user: User) -> bool:
         """Xóa audio"""
@@ -116,23 +152,281 @@ class AudioService:
                 detail="Not enough permissions"
             )
 
-        # Xóa file audio trên Firestore
-        if audio.url and audio.url.startswith("firestore://"):
-            try:
-                await delete_audio_from_firestore(audio.url)
-            except Exception as e:
-                logger.warning(f"Error deleting audio file from Firestore: {str(e)}")
+        # Xóa file audio trong blob store
+        if audio.url:
+            if not await delete_blob(audio.url):
+                logger.warning(f"Error deleting audio file: {audio.url}")
 
-        for segment in audio.segments:
-            if segment.url and segment.url.startswith("firestore://"):
+        for segment in self._retained_segments(audio):
+            if not await delete_blob(segment.url):
+                logger.warning(f"Error deleting segment file: {segment.url}")
+
+        return await self.audio_repository.delete(audio_id)
+
+    @staticmethod
+    def _hls_continuous(audio: Audio) -> bool:
+        """Audio MP3/AAC đã xong có seek index theo từng câu: media segment được cắt thẳng từ file đã
+        mã hóa liên tục, không mã hóa lại nên không có khoảng lặng ở ranh giới segment"""
+        return (audio.status == "completed" and audio.format in HLS_SLICEABLE_FORMATS and bool(audio.url)
+                and len(audio.seek_index) == len(audio.segments))
+
+    def _hls_groups(self, audio: Audio) -> List[HLSGroup]:
+        return group_segments(
+            audio.segments, settings.HLS_TARGET_DURATION, audio.format,
+            audio.status == "completed", self._hls_continuous(audio)
+        )
+
+    def get_hls_playlist(self, audio: Audio, segment_uri: Optional[Callable[[str], str]] = None) -> str:
+        """Playlist HLS từ các segment đã có; job chưa xong trả playlist EVENT chưa kết thúc"""
+        return render_playlist(
+            self._hls_groups(audio), settings.HLS_TARGET_DURATION, audio.status == "completed", segment_uri
+        )
+
+    async def get_hls_segment(self, audio: Audio, index: int, key: str, extension: str) -> Optional[bytes]:
+        """Media segment thứ index, None nếu không tồn tại hoặc key đã cũ. Audio MP3/AAC đã xong được cắt
+        theo seek index; còn lại các câu của nhóm được mã hóa thành MP3 (lấy từ cache nếu đã đóng gói)."""
+        groups = self._hls_groups(audio)
+        if index < 0 or index >= len(groups) or groups[index].key != key or groups[index].extension != extension:
+            return None
+
+        group = groups[index]
+        if self._hls_continuous(audio):
+            # Mốc của câu đầu nhóm là offset của frame chứa nó; timestamp ID3 lệch tối đa một frame
+            start = audio.seek_index[group.segment_indices[0]]
+            end = audio.seek_index[groups[index + 1].segment_indices[0]] - 1 if index + 1 < len(groups) else None
+            data = bytearray(id3_timestamp_tag(group.start_time))
+            async with aclosing(iter_blob(audio.url, start=start, end=end)) as chunks:
+                async for chunk in chunks:
+                    data += chunk
+            return bytes(data)
+
+        cached = await asyncio.to_thread(hls_cache.read, group.key)
+        if cached is not None:
+            return cached
+
+        temp_dir = os.path.join(settings.TTS_TEMP_DIR, f"hls_{audio.id}_{uuid.uuid4().hex}")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        try:
+            segment_files = []
+            for n, i in enumerate(group.segment_indices):
+                segment_filename = os.path.join(temp_dir, f"segment_{n}.wav")
+                if not await download_blob(audio.segments[i].url, segment_filename):
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Segment {i} is not available"
+                    )
+                segment_files.append(segment_filename)
+
+            output_filename = os.path.join(temp_dir, f"hls_{index}.{group.extension}")
+            packaged = await asyncio.to_thread(
+                package_hls_segment, segment_files, output_filename, id3_timestamp_tag(group.start_time)
+            )
+            if not packaged:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Error packaging HLS segment"
+                )
+
+            await asyncio.to_thread(hls_cache.put, group.key, output_filename)
+            with open(output_filename, "rb") as f:
+                return f.read()
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _retained_segments(audio: Audio) -> List[AudioSegment]:
+        """Các segment có file trong blob store: của phiên bản trước (previous_segments) và của
+        lần chạy hiện tại/lần chạy lỗi gần nhất (segments), mỗi URL một lần"""
+        retained = {}
+        for segment in audio.previous_segments + audio.segments:
+            if segment.url and segment.url not in retained:
+                retained[segment.url] = segment
+        return list(retained.values())
+
+    async def _delete_unused_segments(self, previous_segments: List[AudioSegment],
+                                      segments: List[Dict[str, Any]]) -> None:
+        """Xóa file của các đoạn thuộc lần tạo trước không còn được dùng"""
+        used_urls = {segment["url"] for segment in segments}
+
+        for segment in previous_segments:
+            if segment.url and segment.url not in used_urls:
+                if not await delete_blob(segment.url):
+                    logger.warning(f"Error deleting unused segment file: {segment.url}")
+
+    async def _synthesize_segments(
+            self,
+            chunks: List[Dict[str, Any]],
+            temp_dir: str,
+            document_id: str,
+            voice_model: str,
+            sample_rate: int,
+            reusable_segments: Optional[Dict[str, AudioSegment]] = None,
+            user_id: str = "",
+            priority: int = JOB_PRIORITY_NORMAL,
+            start: int = 0
+    ) -> AsyncIterator[Tuple[int, str, float, str, str]]:
+        """Tổng hợp các đoạn theo batch TTS_BATCH_SIZE câu, tối đa TTS_MAX_CONCURRENT_SEGMENTS
+        request cùng lúc, trả kết quả theo đúng thứ tự văn bản: (index, file, duration, url, content_hash).
+        Mỗi request còn phải có slot của segment_scheduler (giới hạn chung và theo người dùng của tiến trình).
+        Chỉ tổng hợp từ đoạn start trở đi (các đoạn trước đã có checkpoint).
+        Đoạn không đổi so với lần tạo trước (reusable_segments) được dùng lại nguyên audio và URL,
+        câu đã có trong segment cache được lấy từ cache thay vì gọi TTS engine.
+        Engine được chọn lại cho từng batch nên khi circuit breaker mở giữa job, các batch sau chuyển
+        ngay sang engine dự phòng (content hash theo engine thực sự tạo ra audio)."""
+        concurrency = max(1, settings.TTS_MAX_CONCURRENT_SEGMENTS)
+        batch_size = max(1, settings.TTS_BATCH_SIZE)
+        semaphore = asyncio.Semaphore(concurrency)
+        reusable_segments = reusable_segments or {}
+
+        async def reuse_segment(content_hash: str, segment_filename: str) -> Optional[Tuple[float, str]]:
+            previous = reusable_segments.get(content_hash)
+            if previous is None:
+                return None
+            if not await download_blob(previous.url, segment_filename):
+                return None
+            return previous.end_time - previous.start_time, previous.url
+
+        async def synthesize_batch(indices: List[int], failover: bool = True) -> List[Tuple[int, str, float, str, str]]:
+            tts_engine = self.tts_factory.create_tts_engine(voice_model)
+            cache = segment_cache if tts_engine.cacheable else None
+            content_hashes = [
+                SegmentCache.make_key(chunks[i]["text"], voice_model, sample_rate, tts_engine.version)
+                for i in indices
+            ]
+            segment_files = [
+                self._segment_filename(temp_dir, i, content_hash) for i, content_hash in zip(indices, content_hashes)
+            ]
+
+            reused = {}
+            for n in range(len(indices)):
+                previous = await reuse_segment(content_hashes[n], segment_files[n])
+                if previous is not None:
+                    reused[n] = previous
+
+            # Cache nằm trên đĩa (lần đầu còn quét cả thư mục cache), chạy ngoài event loop
+            misses = [
+                n for n in range(len(indices))
+                if n not in reused and (
+                    cache is None or not await asyncio.to_thread(cache.get, content_hashes[n], segment_files[n])
+                )
+            ]
+
+            if misses:
+                texts = [chunks[indices[n]]["text"] for n in misses]
                 try:
-                    await delete_audio_from_firestore(segment.url)
+                    async with semaphore, segment_scheduler.slot(user_id, priority):
+                        logger.info(
+                            f"Processing segments {indices[0] + 1}-{indices[-1] + 1}/{len(chunks)} "
+                            f"({len(misses)} to synthesize) with {tts_engine.name}: '{texts[0][:50]}...'")
+                        await tts_engine.synthesize_many(texts, [segment_files[n] for n in misses])
                 except Exception as e:
-                    logger.warning(f"Error deleting segment file from Firestore: {str(e)}")
+                    # Lỗi làm circuit breaker mở: chạy lại batch ngay với engine dự phòng
+                    if failover and self.tts_factory.create_tts_engine(voice_model) is not tts_engine:
+                        logger.warning(f"{tts_engine.name} failed for segments {indices[0] + 1}-{indices[-1] + 1}, "
+                                       f"failing over: {str(e)}")
+                        return await synthesize_batch(indices, failover=False)
+                    raise
+
+                if cache is not None:
+                    for n in misses:
+                        await asyncio.to_thread(cache.put, content_hashes[n], segment_files[n])
+
+            results = []
+            for n, (i, segment_filename) in enumerate(zip(indices, segment_files)):
+                if n in reused:
+                    duration, segment_url = reused[n]
+                else:
+                    duration = get_audio_duration(segment_filename)
 
-        return await self.audio_repository.delete(audio_id)
+                    # Đặt tên theo nội dung để segment dùng lại không bị ghi đè khi vị trí thay đổi
+                    segment_url = await upload_blob(
+                        segment_filename,
+                        f"audios/{document_id}/segments/segment_{content_hashes[n][:24]}"
+                    )
+
+                results.append((i, segment_filename, duration, segment_url, content_hashes[n]))
+
+            return results
+
+        batches = [list(range(first, min(first + batch_size, len(chunks))))
+                   for first in range(start, len(chunks), batch_size)]
+
+        # Giữ sẵn gấp đôi số request đang chạy để batch chậm ở đầu hàng không làm rảnh engine
+        window = concurrency * 2
+        pending = deque()
+        next_batch = 0
+
+        try:
+            while next_batch < len(batches) or pending:
+                while next_batch < len(batches) and len(pending) < window:
+                    pending.append(asyncio.create_task(synthesize_batch(batches[next_batch])))
+                    next_batch += 1
+
+                for result in await pending.popleft():
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    def _work_dir(audio_id: str) -> str:
+        """Thư mục tạm cố định theo audio, được giữ lại khi job lỗi để lần chạy tiếp dùng lại file segment"""
+        return os.path.join(settings.TTS_TEMP_DIR, f"tts_{audio_id}")
+
+    def discard_work_dir(self, audio_id: str) -> None:
+        """Xóa thư mục tạm của job không còn được chạy tiếp (đã hết lượt thử)"""
+        shutil.rmtree(self._work_dir(audio_id), ignore_errors=True)
+
+    @staticmethod
+    def _segment_filename(temp_dir: str, index: int, content_hash: str) -> str:
+        # Tên file kèm content hash: file còn lại từ lần chạy với nội dung khác không bị nhầm là checkpoint
+        return os.path.join(temp_dir, f"segment_{index}_{content_hash[:24]}.wav")
+
+    @staticmethod
+    def _resume_point(previous_segments: List[AudioSegment], content_hashes: List[str]) -> int:
+        """Số segment đầu của lần chạy trước trùng khớp (theo thứ tự) với nội dung hiện tại"""
+        resume_from = 0
+        for segment, content_hash in zip(previous_segments, content_hashes):
+            if not segment.url or segment.content_hash != content_hash:
+                break
+            resume_from += 1
+        return resume_from
+
+    async def _restore_checkpoints(self, checkpoints: List[AudioSegment],
+                                   temp_dir: str) -> AsyncIterator[Tuple[int, str, float, str, str]]:
+        """Trả các segment đã có checkpoint theo cùng dạng với _synthesize_segments, dùng file còn trong
+        thư mục tạm nếu job trước chạy trên cùng máy, ngược lại tải lại từ blob store"""
+        for i, checkpoint in enumerate(checkpoints):
+            segment_filename = self._segment_filename(temp_dir, i, checkpoint.content_hash)
+            if not os.path.exists(segment_filename) and not await download_blob(checkpoint.url, segment_filename):
+                raise Exception(f"Checkpoint segment {i} is not available: {checkpoint.url}")
+
+            yield (i, segment_filename, checkpoint.end_time - checkpoint.start_time,
+                   checkpoint.url, checkpoint.content_hash)
+
+    async def _concatenate_and_upload(self, audio: Audio, segment_files: List[str], segments: List[Dict[str, Any]],
+                                      temp_dir: str, document_id: str) -> Tuple[str, List[int]]:
+        logger.info(f"Concatenating {len(segment_files)} audio segments...")
+        output_filename = os.path.join(temp_dir, f"output.{audio.format}")
+        if not await asyncio.to_thread(concatenate_audio_files, segment_files, output_filename):
+            raise Exception("Error concatenating audio segments")
 
-    async def _process_audio_task(self, audio_id: str) -> None:
+        try:
+            seek_index = await asyncio.to_thread(
+                build_seek_index, output_filename, audio.format, [s["start_time"] for s in segments]
+            )
+        except Exception as e:
+            logger.warning(f"Could not build seek index for audio {audio.id}: {str(e)}")
+            seek_index = []
+
+        logger.info(f"Uploading audio file to blob store...")
+        audio_url = await upload_blob(output_filename, f"audios/{document_id}")
+        return audio_url, seek_index
+
+    async def _process_audio_task(self, audio_id: str, priority: int = JOB_PRIORITY_NORMAL) -> None:
         try:
             audio = await self.audio_repository.get_by_id(audio_id)
             if not audio:
@@ -147,106 +441,148 @@ class AudioService:
 
             await self.text_repository.update_status(str(text.id), "processing")
 
-            temp_dir = os.path.join(settings.TTS_TEMP_DIR, f"tts_{audio_id}_{uuid.uuid4().hex}")
+            temp_dir = self._work_dir(audio_id)
             os.makedirs(temp_dir, exist_ok=True)
+            encoder = None
+            progress = None
+            completed = False
 
             try:
                 processed_text = preprocess_text(text.content)
 
                 chunks = analyze_vietnamese_text(processed_text)
 
+                # Engine hiện tại quyết định content hash của checkpoint; _synthesize_segments chọn lại cho từng batch
                 tts_engine = self.tts_factory.create_tts_engine(audio.voice_model)
 
+                # Các đoạn của lần tạo trước, dùng lại nếu nội dung (và giọng, engine) không đổi.
+                # File của chúng chỉ bị xóa khi phiên bản mới tạo xong.
+                retained_segments = self._retained_segments(audio)
+                previous_segments = {
+                    segment.content_hash: segment
+                    for segment in retained_segments
+                    if segment.content_hash
+                }
+
+                # Segment đã lưu của lần chạy trước là checkpoint: phần đầu còn khớp nội dung được giữ nguyên,
+                # job chạy tiếp từ đoạn đầu tiên còn thiếu
+                content_hashes = [
+                    SegmentCache.make_key(chunk["text"], audio.voice_model, audio.sample_rate, tts_engine.version)
+                    for chunk in chunks
+                ]
+                resume_from = self._resume_point(audio.segments, content_hashes)
+                if resume_from:
+                    logger.info(f"Resuming audio {audio_id} from segment {resume_from + 1}/{len(chunks)}")
+
+                # Segment mới được thêm dần vào document để có thể stream khi job chưa xong
+                await self.audio_repository.reset_segments(
+                    audio_id, keep=resume_from,
+                    previous_segments=[segment.model_dump() for segment in retained_segments]
+                )
+
                 segments = []
                 segment_files = []
-                current_position = 0
                 total_duration = 0.0
+                progress = ProgressReporter(
+                    self.audio_repository, audio_id, len(chunks), settings.PROGRESS_FLUSH_INTERVAL, resume_from
+                )
+                document_id = f"{audio.user_id}_{audio.text_id}_{audio_id}"
+
+                # Mã hóa song song với quá trình tổng hợp (WAV và định dạng không ghi được ra pipe thì ghép cuối job)
+                if settings.TTS_STREAMING_ENCODE and StreamingEncoder.supports(audio.format):
+                    encoder = StreamingEncoder(audio.format, f"audios/{document_id}")
+
+                async def restored_then_synthesized() -> AsyncIterator[Tuple[int, str, float, str, str]]:
+                    async for result in self._restore_checkpoints(audio.segments[:resume_from], temp_dir):
+                        yield result
+                    async with aclosing(self._synthesize_segments(
+                            chunks, temp_dir, document_id, audio.voice_model, audio.sample_rate,
+                            previous_segments, str(audio.user_id), priority, start=resume_from
+                    )) as synthesized:
+                        async for result in synthesized:
+                            yield result
+
+                async with aclosing(restored_then_synthesized()) as results:
+                    async for i, segment_filename, duration, segment_url, content_hash in results:
+                        chunk = chunks[i]
+
+                        segment = {
+                            "start_index": chunk["start_index"],
+                            "end_index": chunk["end_index"],
+                            "start_time": total_duration,
+                            "end_time": total_duration + duration,
+                            "text": chunk["text"],
+                            "url": segment_url,
+                            "content_hash": content_hash
+                        }
+
+                        segments.append(segment)
+                        segment_files.append(segment_filename)
+                        total_duration += duration
+
+                        if i >= resume_from:
+                            await progress.segment_done(segment)
+
+                        if encoder is not None and not await encoder.add_segment(segment_filename, segment["start_time"]):
+                            logger.warning(f"Streaming encoder disabled for audio {audio_id}, will concatenate instead")
+                            await encoder.abort()
+                            encoder = None
+
+                await progress.flush()
+
+                audio_url = None
+                if encoder is not None:
+                    try:
+                        audio_url, seek_index = await encoder.finish()
+                    except Exception as e:
+                        logger.warning(f"Streaming encoder failed, falling back to concatenation: {str(e)}")
 
-                for i, chunk in enumerate(chunks):
-                    chunk_text = chunk["text"]
-                    start_index = chunk["start_index"]
-                    end_index = chunk["end_index"]
-
-                    logger.info(
-                        f"Processing segment {i + 1}/{len(chunks)}: [{start_index}:{end_index}] - '{chunk_text[:50]}...'")
-
-                    segment_filename = os.path.join(temp_dir, f"segment_{i}.wav")
-
-                    await tts_engine.synthesize(chunk_text, segment_filename)
-
-                    duration = get_audio_duration(segment_filename)
-
-                    # Upload individual segment
-                    document_id = f"{audio.user_id}_{audio.text_id}_{audio_id}"
-                    segment_id = f"segment_{i}"
-                    segment_url = await upload_audio_segment_to_firestore(
-                        segment_filename,
-                        "audios",
-                        document_id,
-                        segment_id
+                if audio_url is None:
+                    audio_url, seek_index = await self._concatenate_and_upload(
+                        audio, segment_files, segments, temp_dir, document_id
                     )
 
-                    segment = {
-                        "start_index": start_index,
-                        "end_index": end_index,
-                        "start_time": total_duration,
-                        "end_time": total_duration + duration,
-                        "text": chunk_text,
-                        "url": segment_url
-                    }
-
-                    segments.append(segment)
-                    segment_files.append(segment_filename)
-                    total_duration += duration
-
-                    if (i + 1) % 5 == 0 or i == len(chunks) - 1:
-                        progress_msg = f"Đã xử lý {i + 1}/{len(chunks)} đoạn văn bản"
-                        await self.audio_repository.update_status(audio_id, f"processing ({i + 1}/{len(chunks)})")
-
-                logger.info(f"Concatenating {len(segment_files)} audio segments...")
-                output_filename = os.path.join(temp_dir, f"output.{audio.format}")
-                concatenate_audio_files(segment_files, output_filename)
-
-                logger.info(f"Uploading audio file to Firestore...")
-                # Upload file audio lên Firestore
-                collection_path = "audios"
-                firebase_url = await upload_audio_to_firestore(
-                    output_filename,
-                    collection_path,
-                    f"{audio.user_id}_{audio.text_id}_{audio_id}"
-                )
-
                 logger.info(f"Updating audio record in database...")
                 await self.audio_repository.update_with_segments(
                     audio_id,
-                    firebase_url,
+                    audio_url,
                     total_duration,
-                    segments
+                    segments,
+                    seek_index
                 )
 
                 await self.text_repository.update_status(str(text.id), "completed")
 
+                await self._delete_unused_segments(retained_segments, segments)
+
+                completed = True
                 logger.info(f"Audio generation completed successfully. Total duration: {total_duration:.2f} seconds")
 
             except Exception as e:
                 logger.exception(f"Error while processing audio: {str(e)}")
+                if progress is not None:
+                    # Ghi nốt các segment đã xong để lần thử lại dùng được
+                    try:
+                        await progress.flush()
+                    except Exception as flush_error:
+                        logger.warning(f"Could not flush progress of audio {audio_id}: {str(flush_error)}")
                 await self.audio_repository.update_status(audio_id, "failed", str(e))
                 await self.text_repository.update_status(str(text.id), "failed", str(e))
+                # Không xóa file segment nào: phiên bản trước vẫn nằm trong previous_segments,
+                # lần thử lại dùng lại cả chúng lẫn các segment mới đã tạo xong
                 raise
             finally:
-                for file in os.listdir(temp_dir):
-                    try:
-                        os.remove(os.path.join(temp_dir, file))
-                    except:
-                        pass
-                try:
-                    os.rmdir(temp_dir)
-                except:
-                    pass
+                if encoder is not None:
+                    await encoder.abort()
+                # Job lỗi hoặc bị dừng giữ lại file segment để lần chạy tiếp không phải tải lại checkpoint
+                if completed:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
 
         except Exception as e:
             logger.exception(f"Error in _process_audio_task: {str(e)}")
             try:
                 await self.audio_repository.update_status(audio_id, "failed", str(e))
             except Exception:
-                pass
\ No newline at end of file
+                pass
+            # Worker quyết định thử lại hay đánh dấu job thất bại
+            raise
\ No newline at end of file
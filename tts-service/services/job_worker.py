@@ -0,0 +1,138 @@
+import os
+import asyncio
+import logging
+import socket
+from typing import Dict, Optional, Set
+
+from core.config import settings
+from db.repositories.audio_repository import AudioRepository
+from db.repositories.text_repository import TextRepository
+from db.repositories.job_repository import JobRepository
+from models.job import Job
+from services.audio_service import AudioService
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Nhận job từ hàng đợi MongoDB và chạy tối đa `concurrency` job cùng lúc. Lease của mỗi job
+    được gia hạn định kỳ; job của worker chết sẽ được worker khác nhận lại khi lease hết hạn."""
+
+    def __init__(self, database, concurrency: int, worker_id: Optional[str] = None):
+        self.job_repository = JobRepository(database)
+        self.audio_repository = AudioRepository(database)
+        self.audio_service = AudioService(self.audio_repository, TextRepository(database), self.job_repository)
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._lost_leases: Set[str] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        logger.info(f"Worker {self.worker_id} stopping...")
+        self._stopping.set()
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(settings.JOB_RETRY_BACKOFF * 2 ** max(0, attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+
+    async def _heartbeat(self, job: Job, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            try:
+                still_owned = await self.job_repository.heartbeat(job, self.worker_id, settings.JOB_LEASE_SECONDS)
+            except Exception as e:
+                # Lỗi tạm thời của MongoDB: thử lại ở nhịp sau, lease vẫn còn thời gian
+                logger.warning(f"Heartbeat of job {job.id} failed: {str(e)}")
+                continue
+
+            if not still_owned:
+                logger.warning(f"Lost lease of job {job.id}, cancelling")
+                self._lost_leases.add(job.id)
+                task.cancel()
+                return
+
+    async def _run_job(self, job: Job) -> None:
+        if job.attempts > job.max_attempts:
+            # Lease hết hạn lặp lại (worker chết giữa chừng) đã dùng hết lượt thử
+            logger.error(f"Job {job.id} exceeded {job.max_attempts} attempts")
+            await self.job_repository.fail(job, self.worker_id, "Job exceeded max attempts", 0)
+            await self.audio_repository.update_status(job.audio_id, "failed", "Job exceeded max attempts")
+            self.audio_service.discard_work_dir(job.audio_id)
+            return
+
+        logger.info(f"Worker {self.worker_id} running job {job.id} for audio {job.audio_id} "
+                    f"(attempt {job.attempts}/{job.max_attempts})")
+        await self.audio_repository.update_status(job.audio_id, "processing")
+
+        task = asyncio.create_task(self.audio_service._process_audio_task(job.audio_id, job.priority))
+        heartbeat = asyncio.create_task(self._heartbeat(job, task))
+
+        try:
+            await task
+        except asyncio.CancelledError:
+            if job.id in self._lost_leases:
+                # Mất lease: worker khác đã nhận job, không ghi gì thêm
+                self._lost_leases.discard(job.id)
+                return
+            # Worker đang dừng: hủy job và trả lại hàng đợi cho worker khác
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self.job_repository.release(job, self.worker_id)
+            await self.audio_repository.update_status(job.audio_id, "pending")
+            logger.info(f"Released job {job.id}")
+            raise
+        except Exception as e:
+            retry = await self.job_repository.fail(job, self.worker_id, str(e), self._retry_delay(job.attempts))
+            if retry:
+                await self.audio_repository.update_status(job.audio_id, "pending", str(e))
+                logger.warning(f"Job {job.id} failed, will retry: {str(e)}")
+            else:
+                # Segment đã lưu vẫn là checkpoint cho lần regenerate sau, chỉ bỏ file tạm trên máy này
+                self.audio_service.discard_work_dir(job.audio_id)
+                logger.error(f"Job {job.id} failed after {job.attempts} attempts: {str(e)}")
+            return
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+        await self.job_repository.complete(job, self.worker_id)
+        logger.info(f"Job {job.id} completed")
+
+    async def run(self) -> None:
+        logger.info(f"Worker {self.worker_id} started (concurrency {self.concurrency})")
+
+        while not self._stopping.is_set():
+            job = None
+            if len(self._running) < self.concurrency:
+                try:
+                    job = await self.job_repository.claim(
+                        self.worker_id, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_RUNNING_PER_USER
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not claim job: {str(e)}")
+
+            if job is not None:
+                task = asyncio.create_task(self._run_job(job))
+                self._running[job.id] = task
+                task.add_done_callback(lambda _, job_id=job.id: self._running.pop(job_id, None))
+                continue
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        await self._shutdown()
+
+    async def _shutdown(self) -> None:
+        if not self._running:
+            return
+
+        logger.info(f"Waiting up to {settings.JOB_SHUTDOWN_TIMEOUT}s for {len(self._running)} running jobs...")
+        tasks = list(self._running.values())
+        _, pending = await asyncio.wait(tasks, timeout=settings.JOB_SHUTDOWN_TIMEOUT)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
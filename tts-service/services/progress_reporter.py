@@ -0,0 +1,58 @@
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from db.repositories.audio_repository import AudioRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """Gom tiến độ (completed/total/ETA) và các segment mới của một job, ghi xuống MongoDB bằng một lệnh
+    update mỗi `interval` giây thay vì một lần cho mỗi segment. Segment đầu tiên được ghi ngay để
+    stream trực tiếp có audio sớm nhất."""
+
+    def __init__(self, audio_repository: AudioRepository, audio_id: str, total: int, interval: float,
+                 completed: int = 0):
+        self.audio_repository = audio_repository
+        self.audio_id = audio_id
+        self.total = total
+        self.interval = interval
+        # Job chạy tiếp từ checkpoint: các segment đã có không tính vào tốc độ để ước tính ETA
+        self.completed = completed
+        self._resumed = completed
+        self._pending_segments: List[Dict[str, Any]] = []
+        self._started_at = time.monotonic()
+        self._last_flush: Optional[float] = None
+        self._flushed_completed = completed
+
+    def progress(self) -> Dict[str, Any]:
+        eta_seconds = None
+        if self._resumed < self.completed < self.total:
+            elapsed = time.monotonic() - self._started_at
+            eta_seconds = round(elapsed / (self.completed - self._resumed) * (self.total - self.completed), 1)
+
+        return {
+            "completed": self.completed,
+            "total": self.total,
+            "eta_seconds": eta_seconds,
+            "updated_at": datetime.utcnow()
+        }
+
+    async def segment_done(self, segment: Dict[str, Any]) -> None:
+        self._pending_segments.append(segment)
+        self.completed += 1
+
+        if self._last_flush is None or time.monotonic() - self._last_flush >= self.interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending_segments and self.completed == self._flushed_completed:
+            return
+
+        segments, self._pending_segments = self._pending_segments, []
+        await self.audio_repository.update_progress(self.audio_id, self.progress(), segments)
+
+        self._last_flush = time.monotonic()
+        self._flushed_completed = self.completed
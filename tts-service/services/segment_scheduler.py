@@ -0,0 +1,79 @@
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+
+from core.config import settings
+
+
+class SegmentScheduler:
+    """Giới hạn số request tổng hợp đang chạy trong tiến trình worker: tối đa global_limit cho mọi job
+    và user_limit cho mỗi người dùng. Khi có slot trống, lane ưu tiên cao hơn được cấp trước; trong
+    cùng lane, người dùng đang giữ ít slot nhất được cấp trước, bằng nhau thì theo thứ tự chờ."""
+
+    def __init__(self, global_limit: int, user_limit: int):
+        self.global_limit = max(1, global_limit)
+        self.user_limit = max(1, user_limit)
+        self._in_flight: Dict[str, int] = {}
+        self._total = 0
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _can_grant(self, user_id: str) -> bool:
+        return self._total < self.global_limit and self._in_flight.get(user_id, 0) < self.user_limit
+
+    def _grant(self, user_id: str) -> None:
+        self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        self._total += 1
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._total < self.global_limit:
+            eligible = [
+                waiter for waiter in self._waiters
+                if not waiter[3].done() and self._in_flight.get(waiter[2], 0) < self.user_limit
+            ]
+            if not eligible:
+                break
+
+            waiter = min(eligible, key=lambda w: (w[0], self._in_flight.get(w[2], 0), w[1]))
+            self._waiters.remove(waiter)
+            self._grant(waiter[2])
+            waiter[3].set_result(None)
+
+    async def acquire(self, user_id: str, priority: int) -> None:
+        # Waiter nào cấp được đã được cấp ngay khi slot trống, nên yêu cầu mới không vượt hàng
+        if self._can_grant(user_id):
+            self._grant(user_id)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._sequence), user_id, future)
+        self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Đã được cấp slot nhưng bị hủy trước khi kịp dùng
+                self.release(user_id)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, user_id: str) -> None:
+        self._in_flight[user_id] -= 1
+        if self._in_flight[user_id] == 0:
+            del self._in_flight[user_id]
+        self._total -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, priority: int) -> AsyncIterator[None]:
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+
+# Dùng chung cho mọi job chạy trong cùng tiến trình
+segment_scheduler = SegmentScheduler(settings.TTS_GLOBAL_MAX_SEGMENTS, settings.TTS_USER_MAX_SEGMENTS)
@@ -3,7 +3,7 @@ from fastapi import HTTPException, status
 from bson import ObjectId
 
 from db.repositories.text_repository import TextRepository
-from models.text import Text
+from models.text import Text, TextSummary
 from models.user import User
 from schemas.text import TextCreate, TextUpdate
 from utils.text_processor import preprocess_text, split_text_into_chunks
@@ -83,9 +83,9 @@ class TextService:
 
         return await self.text_repository.delete(text_id)
 
-    async def get_user_texts(self, user: User, skip: int = 0, limit: int = 100) -> List[Text]:
-        """Lấy danh sách văn bản của người dùng"""
-        return await self.text_repository.get_by_user_id(str(user.id), skip, limit)
+    async def get_user_texts(self, user: User, skip: int = 0, limit: int = 100) -> List[TextSummary]:
+        """Lấy danh sách văn bản của người dùng (không kèm nội dung)"""
+        return await self.text_repository.get_summaries_by_user_id(str(user.id), skip, limit)
 
     async def get_all_texts(self, skip: int = 0, limit: int = 100) -> List[Text]:
         """Lấy tất cả văn bản (chỉ dành cho admin)"""
@@ -1,16 +1,37 @@
+import io
 import os
 import logging
 import asyncio
 import wave
-import struct
+from functools import lru_cache
 import numpy as np
 
 from services.tts.tts_base import TTSBase
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_RATE = 24000
+AMPLITUDE = 16000
+
+
+@lru_cache(maxsize=256)
+def _render_tone(frequency: int, num_samples: int) -> bytes:
+    """Nội dung file WAV của tone, tạo bằng một phép tính trên cả mảng; giữ trong bộ nhớ theo (tần số, độ dài)"""
+    t = np.arange(num_samples, dtype=np.float64)
+    samples = (AMPLITUDE * np.sin(2 * np.pi * frequency * t / SAMPLE_RATE)).astype('<i2')
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
 
 class FallbackTTSProvider(TTSBase):
+    # Âm thanh dự phòng không được cache để không thay thế giọng thật sau khi VietTTS hồi phục
+    cacheable = False
 
     def __init__(self, voice_model: str = "female"):
         logger.info(f"Initializing FallbackTTSProvider with voice model: {voice_model}")
@@ -28,21 +49,10 @@ class FallbackTTSProvider(TTSBase):
                 frequency = 140
 
             duration = min(5.0, 0.1 * len(text))
-            sample_rate = 24000
-            amplitude = 16000
-
-            samples = []
-            num_samples = int(duration * sample_rate)
-            for i in range(num_samples):
-                sample = amplitude * np.sin(2 * np.pi * frequency * i / sample_rate)
-                samples.append(int(sample))
-
-            with wave.open(output_file, 'w') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(sample_rate)
-                for sample in samples:
-                    wav_file.writeframes(struct.pack('h', sample))
+            data = _render_tone(frequency, int(duration * SAMPLE_RATE))
+
+            with open(output_file, 'wb') as f:
+                f.write(data)
 
             logger.info(f"Successfully generated fallback audio: {output_file}")
 
@@ -0,0 +1,158 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Dict, Optional
+
+from core.config import settings
+from services.tts.tts_base import TTSBase
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            # Hết thời gian chờ: cho phép thử lại để kiểm tra engine đã hồi phục chưa
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        return self.state != self.OPEN
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self) -> None:
+        if self._state != self.OPEN:
+            logger.warning("Circuit breaker chuyển sang trạng thái OPEN")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+
+
+class EngineHealth:
+    def __init__(self, engine: TTSBase, breaker: CircuitBreaker):
+        self.engine = engine
+        self.breaker = breaker
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ok = True
+
+
+class TTSHealthMonitor:
+    """Theo dõi sức khỏe các TTS engine ở background để luồng xử lý job không phải chờ health check"""
+
+    def __init__(self, probe_interval: float, ttl: float, failure_threshold: int, reset_timeout: float):
+        self.probe_interval = probe_interval
+        self.ttl = ttl
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._engines: Dict[str, EngineHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, engine: TTSBase) -> None:
+        if name not in self._engines:
+            self._engines[name] = EngineHealth(
+                engine,
+                CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            )
+
+    def is_available(self, name: str) -> bool:
+        health = self._engines.get(name)
+        if health is None:
+            return True
+
+        if not health.breaker.allow_request():
+            return False
+
+        # Kết quả probe quá TTL thì không còn đáng tin, chỉ dựa vào circuit breaker
+        probe_is_fresh = health.last_probe_at is not None and time.monotonic() - health.last_probe_at < self.ttl
+        if probe_is_fresh and not health.last_probe_ok:
+            return health.breaker.state == CircuitBreaker.HALF_OPEN
+
+        return True
+
+    def record_success(self, name: str) -> None:
+        health = self._engines.get(name)
+        if health:
+            health.breaker.record_success()
+
+    def record_failure(self, name: str) -> None:
+        health = self._engines.get(name)
+        if health:
+            health.breaker.record_failure()
+
+    def get_status(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "state": health.breaker.state,
+                "last_probe_ok": health.last_probe_ok,
+                "last_probe_age": (time.monotonic() - health.last_probe_at) if health.last_probe_at else None,
+            }
+            for name, health in self._engines.items()
+        }
+
+    async def probe(self, name: str) -> bool:
+        health = self._engines[name]
+        try:
+            result = health.engine.is_available()
+            if inspect.isawaitable(result):
+                result = await result
+            ok = bool(result)
+        except Exception as e:
+            logger.warning(f"Health check của {name} thất bại: {str(e)}")
+            ok = False
+
+        health.last_probe_at = time.monotonic()
+        health.last_probe_ok = ok
+
+        if ok:
+            health.breaker.record_success()
+        else:
+            health.breaker.trip()
+
+        return ok
+
+    async def run(self) -> None:
+        while True:
+            for name in list(self._engines):
+                await self.probe(name)
+            await asyncio.sleep(self.probe_interval)
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+tts_health = TTSHealthMonitor(
+    probe_interval=settings.TTS_HEALTH_CHECK_INTERVAL,
+    ttl=settings.TTS_HEALTH_TTL,
+    failure_threshold=settings.TTS_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.TTS_BREAKER_RESET_TIMEOUT,
+)
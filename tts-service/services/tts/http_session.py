@@ -0,0 +1,44 @@
+import logging
+import aiohttp
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPSession:
+    session: aiohttp.ClientSession = None
+
+
+http = HTTPSession()
+
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=settings.VIETTTS_POOL_LIMIT,
+        limit_per_host=settings.VIETTTS_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=settings.VIETTTS_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=settings.VIETTTS_DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def open_http_session():
+    logger.info("Opening shared HTTP session...")
+    http.session = _create_session()
+    logger.info("Shared HTTP session opened!")
+
+
+async def close_http_session():
+    logger.info("Closing shared HTTP session...")
+    if http.session and not http.session.closed:
+        await http.session.close()
+    http.session = None
+    logger.info("Shared HTTP session closed!")
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    # Tạo session khi được gọi ngoài vòng đời của app (script, worker)
+    if http.session is None or http.session.closed:
+        http.session = _create_session()
+    return http.session
@@ -0,0 +1,154 @@
+import os
+import shutil
+import threading
+import hashlib
+import logging
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_segment_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class SegmentCache:
+    """Cache WAV của từng câu trên đĩa, khóa theo nội dung (văn bản chuẩn hóa + giọng + sample rate + engine),
+    giới hạn dung lượng và loại bỏ theo LRU"""
+
+    def __init__(self, cache_dir: str, max_bytes: int, extension: str = "wav"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._index: Optional[OrderedDict] = None
+        self._total_bytes = 0
+        # Được gọi từ nhiều thread (asyncio.to_thread): khóa mọi truy cập index/_total_bytes,
+        # việc đọc ghi file nằm ngoài khóa
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, voice_model: str, sample_rate: int, engine_version: str) -> str:
+        payload = "\0".join([engine_version, voice_model, str(sample_rate), normalize_segment_text(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{self.extension}")
+
+    def _load_index(self) -> OrderedDict:
+        """Gọi khi đang giữ self._lock"""
+        if self._index is not None:
+            return self._index
+
+        entries = []
+        suffix = f".{self.extension}"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith(suffix):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, filename[:-len(suffix)], stat.st_size))
+
+        # Thứ tự cũ -> mới theo thời gian sử dụng gần nhất (mtime được cập nhật khi hit)
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        logger.info(f"Segment cache: {len(self._index)} entries, {self._total_bytes} bytes in {self.cache_dir}")
+        return self._index
+
+    def _contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._load_index()
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index.move_to_end(key)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._total_bytes -= self._load_index().pop(key, 0)
+
+    def get(self, key: str, output_file: str) -> bool:
+        if not self._contains(key):
+            return False
+
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, output_file)
+            os.utime(path)
+        except FileNotFoundError:
+            # Có thể đã bị process/thread khác loại bỏ
+            self._forget(key)
+            return False
+
+        self._touch(key)
+        return True
+
+    def read(self, key: str) -> Optional[bytes]:
+        if not self._contains(key):
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+
+        self._touch(key)
+        return data
+
+    def put(self, key: str, source_file: str) -> None:
+        with self._lock:
+            self._load_index()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(source_file, temp_path)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Không thể ghi segment cache {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            index = self._load_index()
+            self._total_bytes += size - index.get(key, 0)
+            index[key] = size
+            index.move_to_end(key)
+            evicted = self._evict()
+
+        for evicted_key in evicted:
+            try:
+                os.remove(self._path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> List[str]:
+        """Gọi khi đang giữ self._lock; trả về các khóa bị loại để xóa file sau khi nhả khóa"""
+        index = self._load_index()
+        evicted = []
+        while self._total_bytes > self.max_bytes and index:
+            key, size = index.popitem(last=False)
+            self._total_bytes -= size
+            evicted.append(key)
+        return evicted
+
+segment_cache = SegmentCache(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_BYTES) if settings.TTS_CACHE_ENABLED else None
@@ -1,12 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import List, Optional
 
 
 class TTSBase(ABC):
+    # Kết quả có được lưu vào segment cache hay không
+    cacheable: bool = True
+
     @abstractmethod
     async def synthesize(self, text: str, output_file: str) -> None:
         pass
 
+    async def synthesize_many(self, texts: List[str], output_files: List[str]) -> None:
+        for text, output_file in zip(texts, output_files):
+            await self.synthesize(text, output_file)
+
     @abstractmethod
     def is_available(self) -> bool:
         pass
@@ -24,4 +31,8 @@ class TTSBase(ABC):
     @property
     @abstractmethod
     def name(self) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}:1"
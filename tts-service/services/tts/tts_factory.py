@@ -1,56 +1,73 @@
 import logging
-from typing import Dict, Type
+from typing import Dict, Tuple, Type
 
+from core.config import settings
 from services.tts.vietTTS_provider import VietTTSProvider
 from services.tts.tts_base import TTSBase
 from services.tts.fallback_provider import FallbackTTSProvider
+from services.tts.health import tts_health
 
 logger = logging.getLogger(__name__)
 
 
 class TTSFactory:
+    # Engine được cache theo (engine, voice) cho toàn process
+    _instances: Dict[Tuple[str, str], TTSBase] = {}
+
     def __init__(self):
         self._engines: Dict[str, Type[TTSBase]] = {
             "viettts": VietTTSProvider,
             "fallback": FallbackTTSProvider,
         }
-        self._instances: Dict[str, TTSBase] = {}
+
+    def get_engine(self, engine_name: str, voice_model: str) -> TTSBase:
+        key = (engine_name, voice_model)
+        if key not in self._instances:
+            self._instances[key] = self._engines[engine_name](voice_model)
+        return self._instances[key]
 
     def create_tts_engine(self, voice_model: str = None) -> TTSBase:
         if not voice_model:
             voice_model = "female"
 
         try:
-            logger.info("Đang thử sử dụng VietTTS engine")
-            viettts_engine = VietTTSProvider(voice_model)
+            viettts_engine = self.get_engine("viettts", voice_model)
+            tts_health.register("viettts", viettts_engine)
 
-            if viettts_engine.is_available():
-                logger.info("VietTTS engine khả dụng")
+            if tts_health.is_available("viettts"):
+                logger.debug("VietTTS engine khả dụng")
                 return viettts_engine
             else:
-                logger.warning("VietTTS không khả dụng")
-                raise ImportError("VietTTS không khả dụng")
+                logger.warning("VietTTS không khả dụng (circuit breaker đang mở)")
 
-        except (ImportError, Exception) as viettts_error:
+        except Exception as viettts_error:
             logger.warning(f"Không thể sử dụng VietTTS: {str(viettts_error)}")
 
-            try:
-                logger.info("Sử dụng fallback TTS engine")
-                fallback_engine = FallbackTTSProvider(voice_model)
-                return fallback_engine
-            except Exception as fallback_error:
-                logger.error(f"Tất cả TTS engines đều thất bại: {str(fallback_error)}")
-                raise RuntimeError("Không thể sử dụng bất kỳ TTS engine nào")
+        try:
+            logger.info("Sử dụng fallback TTS engine")
+            return self.get_engine("fallback", voice_model)
+        except Exception as fallback_error:
+            logger.error(f"Tất cả TTS engines đều thất bại: {str(fallback_error)}")
+            raise RuntimeError("Không thể sử dụng bất kỳ TTS engine nào")
 
     def get_available_voices(self) -> Dict[str, list]:
         voices = {}
 
-        for engine_name, engine_class in self._engines.items():
+        for engine_name in self._engines:
             try:
-                temp_instance = engine_class()
-                voices[engine_name] = temp_instance.supported_voices
+                voices[engine_name] = self.get_engine(engine_name, settings.DEFAULT_VOICE_MODEL).supported_voices
             except Exception as e:
                 logger.error(f"Lỗi lấy voices từ {engine_name}: {str(e)}")
                 voices[engine_name] = []
 
-        return voices
\ No newline at end of file
+        return voices
+
+
+async def start_tts_health_checks():
+    factory = TTSFactory()
+    tts_health.register("viettts", factory.get_engine("viettts", settings.DEFAULT_VOICE_MODEL))
+    await tts_health.start()
+
+
+async def stop_tts_health_checks():
+    await tts_health.stop()
@@ -5,15 +5,25 @@ import asyncio
 import tempfile
 import requests
 import shutil
+import struct
 import aiohttp
 from typing import List, Optional
 import time
 
 from services.tts.tts_base import TTSBase
+from services.tts.http_session import get_http_session
+from services.tts.health import tts_health
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Tên engine trong TTSFactory / tts_health
+HEALTH_KEY = "viettts"
+
+# Định dạng frame của /synthesize/batch (xem viet-tts-service/app.py)
+BATCH_FRAME_HEADER = struct.Struct(">IBI")
+BATCH_FRAME_OK = 0
+
 
 class VietTTSProvider(TTSBase):
     def __init__(self, voice_model: str = "female"):
@@ -40,60 +50,131 @@ class VietTTSProvider(TTSBase):
             }
 
             # Gọi API bất đồng bộ
-            async with aiohttp.ClientSession() as session:
-                try:
-                    endpoint = f"{self.api_url}/synthesize"
-                    logger.info(f"Gửi request đến {endpoint}")
-
-                    # Thử kết nối với số lần thử lại
-                    max_retries = 3
-                    retry_delay = 2
-
-                    for attempt in range(max_retries):
-                        try:
-                            async with session.post(endpoint, json=data, timeout=60) as response:
-                                if response.status == 200:
-                                    # Lưu trực tiếp nội dung của response vào file
-                                    with open(output_file, 'wb') as f:
-                                        f.write(await response.read())
-
-                                    logger.info(f"Đã lưu tập tin âm thanh: {output_file}")
-                                    break
-                                else:
-                                    error_text = await response.text()
-                                    logger.error(f"API trả về lỗi (status {response.status}): {error_text}")
-
-                                    if attempt < max_retries - 1:
-                                        logger.info(
-                                            f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
-                                        await asyncio.sleep(retry_delay)
-                                        retry_delay *= 2  # Tăng thời gian chờ giữa các lần thử
-                                    else:
-                                        raise Exception(f"API trả về lỗi sau {max_retries} lần thử: {error_text}")
-                        except aiohttp.ClientConnectionError as ce:
-                            logger.warning(f"Lỗi kết nối: {str(ce)}")
-                            if attempt < max_retries - 1:
-                                logger.info(f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2
+            session = get_http_session()
+            try:
+                endpoint = f"{self.api_url}/synthesize"
+                logger.info(f"Gửi request đến {endpoint}")
+
+                # Thử kết nối với số lần thử lại
+                max_retries = 3
+                retry_delay = 2
+
+                for attempt in range(max_retries):
+                    try:
+                        async with session.post(endpoint, json=data, timeout=60) as response:
+                            if response.status == 200:
+                                # Lưu trực tiếp nội dung của response vào file
+                                with open(output_file, 'wb') as f:
+                                    f.write(await response.read())
+
+                                logger.info(f"Đã lưu tập tin âm thanh: {output_file}")
+                                break
                             else:
-                                raise Exception(f"Không thể kết nối đến API sau {max_retries} lần thử: {str(ce)}")
+                                error_text = await response.text()
+                                logger.error(f"API trả về lỗi (status {response.status}): {error_text}")
+
+                                if attempt < max_retries - 1:
+                                    logger.info(
+                                        f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
+                                    await asyncio.sleep(retry_delay)
+                                    retry_delay *= 2  # Tăng thời gian chờ giữa các lần thử
+                                else:
+                                    raise Exception(f"API trả về lỗi sau {max_retries} lần thử: {error_text}")
+                    except aiohttp.ClientConnectionError as ce:
+                        logger.warning(f"Lỗi kết nối: {str(ce)}")
+                        if attempt < max_retries - 1:
+                            logger.info(f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
+                            await asyncio.sleep(retry_delay)
+                            retry_delay *= 2
+                        else:
+                            raise Exception(f"Không thể kết nối đến API sau {max_retries} lần thử: {str(ce)}")
 
-                except Exception as api_error:
-                    logger.exception(f"Lỗi gọi API: {str(api_error)}")
-                    # Thử phương pháp thay thế - gọi API đồng bộ
-                    self._synthesize_sync(text, output_file)
+            except Exception as api_error:
+                logger.exception(f"Lỗi gọi API: {str(api_error)}")
+                # Thử phương pháp thay thế - gọi API đồng bộ
+                self._synthesize_sync(text, output_file)
 
             # Kiểm tra file đầu ra
             if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
                 logger.info(f"Tổng hợp thành công: {output_file} ({os.path.getsize(output_file)} bytes)")
+                tts_health.record_success(HEALTH_KEY)
             else:
                 raise Exception(f"File đầu ra không tồn tại hoặc rỗng: {output_file}")
 
         except Exception as e:
             logger.exception(f"Lỗi khi tổng hợp giọng nói với VietTTS: {str(e)}")
+            tts_health.record_failure(HEALTH_KEY)
             raise
 
+    async def synthesize_many(self, texts: List[str], output_files: List[str]) -> None:
+        if len(texts) != len(output_files):
+            raise ValueError("texts và output_files phải có cùng số phần tử")
+
+        if len(texts) == 1:
+            await self.synthesize(texts[0], output_files[0])
+            return
+
+        try:
+            await self._synthesize_batch(texts, output_files)
+        except Exception as batch_error:
+            tts_health.record_failure(HEALTH_KEY)
+            if not tts_health.is_available(HEALTH_KEY):
+                # Circuit breaker vừa mở: không thử lại từng câu, để job chuyển sang engine dự phòng
+                raise
+            logger.warning(f"Tổng hợp batch thất bại, chuyển sang từng câu: {str(batch_error)}")
+            await super().synthesize_many(texts, output_files)
+            return
+
+        tts_health.record_success(HEALTH_KEY)
+
+    async def _synthesize_batch(self, texts: List[str], output_files: List[str]) -> None:
+        logger.info(f"Bắt đầu tổng hợp batch {len(texts)} câu qua API")
+
+        for output_file in output_files:
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+
+        data = {
+            "texts": texts,
+            "voice": self._voice_id,
+            "output_format": "wav"
+        }
+        endpoint = f"{self.api_url}/synthesize/batch"
+
+        max_retries = 3
+        retry_delay = 2
+
+        session = get_http_session()
+        for attempt in range(max_retries):
+            try:
+                async with session.post(endpoint, json=data, timeout=60 * len(texts)) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        raise Exception(f"API trả về lỗi (status {response.status}): {error_text}")
+
+                    # Đọc lần lượt từng frame và ghi ra file tương ứng
+                    for _ in range(len(texts)):
+                        header = await response.content.readexactly(BATCH_FRAME_HEADER.size)
+                        index, frame_status, length = BATCH_FRAME_HEADER.unpack(header)
+                        payload = await response.content.readexactly(length)
+
+                        if frame_status != BATCH_FRAME_OK:
+                            raise Exception(
+                                f"Lỗi tổng hợp câu {index}: {payload.decode('utf-8', errors='replace')}")
+
+                        with open(output_files[index], 'wb') as f:
+                            f.write(payload)
+
+                logger.info(f"Đã lưu {len(texts)} tập tin âm thanh từ batch")
+                return
+            except aiohttp.ClientConnectionError as ce:
+                logger.warning(f"Lỗi kết nối: {str(ce)}")
+                if attempt < max_retries - 1:
+                    logger.info(f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
+                    await asyncio.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    raise Exception(f"Không thể kết nối đến API sau {max_retries} lần thử: {str(ce)}")
+
     def _synthesize_sync(self, text: str, output_file: str) -> None:
         """Phương thức dự phòng sử dụng requests đồng bộ nếu phương thức bất đồng bộ thất bại"""
         logger.info(f"Đang sử dụng phương thức đồng bộ để tổng hợp giọng nói")
@@ -151,40 +232,40 @@ class VietTTSProvider(TTSBase):
         try:
             logger.info(f"Kiểm tra trạng thái VietTTS API: {self.api_url}/health")
 
-            async with aiohttp.ClientSession() as session:
-                try:
-                    max_retries = 3
-                    retry_delay = 2
-
-                    for attempt in range(max_retries):
-                        try:
-                            async with session.get(f"{self.api_url}/health", timeout=10) as response:
-                                if response.status == 200:
-                                    logger.info("VietTTS API có sẵn và hoạt động")
-                                    return True
-                                else:
-                                    logger.warning(
-                                        f"VietTTS API trả về mã trạng thái không thành công: {response.status}")
-
-                                    if attempt < max_retries - 1:
-                                        logger.info(
-                                            f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
-                                        await asyncio.sleep(retry_delay)
-                                        retry_delay *= 2
-                                    else:
-                                        return False
-                        except aiohttp.ClientConnectionError:
-                            logger.warning(f"Không thể kết nối đến VietTTS API (lần thử {attempt + 1}/{max_retries})")
-
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2
+            session = get_http_session()
+            try:
+                max_retries = 3
+                retry_delay = 2
+
+                for attempt in range(max_retries):
+                    try:
+                        async with session.get(f"{self.api_url}/health", timeout=10) as response:
+                            if response.status == 200:
+                                logger.info("VietTTS API có sẵn và hoạt động")
+                                return True
                             else:
-                                return False
+                                logger.warning(
+                                    f"VietTTS API trả về mã trạng thái không thành công: {response.status}")
+
+                                if attempt < max_retries - 1:
+                                    logger.info(
+                                        f"Thử lại sau {retry_delay} giây (lần thử {attempt + 1}/{max_retries})")
+                                    await asyncio.sleep(retry_delay)
+                                    retry_delay *= 2
+                                else:
+                                    return False
+                    except aiohttp.ClientConnectionError:
+                        logger.warning(f"Không thể kết nối đến VietTTS API (lần thử {attempt + 1}/{max_retries})")
+
+                        if attempt < max_retries - 1:
+                            await asyncio.sleep(retry_delay)
+                            retry_delay *= 2
+                        else:
+                            return False
 
-                except Exception as e:
-                    logger.exception(f"Lỗi kiểm tra VietTTS API: {str(e)}")
-                    return False
+            except Exception as e:
+                logger.exception(f"Lỗi kiểm tra VietTTS API: {str(e)}")
+                return False
 
         except Exception as e:
             logger.exception(f"Lỗi kiểm tra VietTTS API: {str(e)}")
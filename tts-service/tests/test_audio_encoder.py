@@ -0,0 +1,88 @@
+import asyncio
+import wave
+
+import pytest
+
+import services.audio_encoder as audio_encoder
+from services.audio_encoder import StreamingEncoder
+
+SAMPLE_RATE = 22050
+
+
+def _write_wav(path, seconds: float) -> bytes:
+    frames = bytes(range(256)) * int(SAMPLE_RATE * 2 * seconds / 256)
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(frames)
+    return frames
+
+
+@pytest.fixture
+def passthrough_encoder(monkeypatch):
+    # `cat` thay cho ffmpeg: stdout là đúng dữ liệu PCM ghi vào stdin
+    monkeypatch.setattr(audio_encoder, "encoder_command", lambda output_format, input_args, target: ["cat"])
+
+
+async def test_stream_uploads_all_pcm(tmp_path, monkeypatch, passthrough_encoder):
+    uploaded = bytearray()
+
+    async def upload(chunks, key, suffix):
+        async for chunk in chunks:
+            uploaded.extend(chunk)
+        return f"local://{key}{suffix}"
+
+    monkeypatch.setattr(audio_encoder, "upload_blob_stream", upload)
+
+    first = _write_wav(tmp_path / "0.wav", 1)
+    second = _write_wav(tmp_path / "1.wav", 2)
+
+    encoder = StreamingEncoder("ogg", "audios/test")
+    assert await encoder.add_segment(str(tmp_path / "0.wav"), 0.0)
+    assert await encoder.add_segment(str(tmp_path / "1.wav"), 1.0)
+    url, seek_index = await encoder.finish()
+
+    assert url == "local://audios/test.ogg"
+    assert seek_index == []
+    assert bytes(uploaded) == first + second
+    assert encoder.size == len(first) + len(second)
+
+
+async def test_failed_upload_does_not_block_add_segment(tmp_path, monkeypatch, passthrough_encoder):
+    async def upload(chunks, key, suffix):
+        async for _ in chunks:
+            raise OSError("blob store unavailable")
+
+    monkeypatch.setattr(audio_encoder, "upload_blob_stream", upload)
+
+    # Lớn hơn nhiều so với bộ đệm pipe: không ai đọc stdout thì drain() sẽ bị chặn mãi
+    _write_wav(tmp_path / "long.wav", 30)
+
+    encoder = StreamingEncoder("ogg", "audios/test")
+    assert await asyncio.wait_for(encoder.add_segment(str(tmp_path / "long.wav"), 0.0), timeout=10) is False
+    # Upload đã dừng: segment sau bị từ chối ngay
+    assert await asyncio.wait_for(encoder.add_segment(str(tmp_path / "long.wav"), 30.0), timeout=10) is False
+
+    await asyncio.wait_for(encoder.abort(), timeout=10)
+
+
+async def test_rejects_segment_with_different_format(tmp_path, monkeypatch, passthrough_encoder):
+    async def upload(chunks, key, suffix):
+        async for _ in chunks:
+            pass
+        return "url"
+
+    monkeypatch.setattr(audio_encoder, "upload_blob_stream", upload)
+
+    _write_wav(tmp_path / "0.wav", 0.5)
+    with wave.open(str(tmp_path / "stereo.wav"), "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(b"\0" * 4096)
+
+    encoder = StreamingEncoder("ogg", "audios/test")
+    assert await encoder.add_segment(str(tmp_path / "0.wav"), 0.0)
+    assert await encoder.add_segment(str(tmp_path / "stereo.wav"), 0.5) is False
+    await encoder.abort()
@@ -0,0 +1,144 @@
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from db.repositories.job_repository import JobRepository
+from models.job import JOB_PRIORITY_PREVIEW
+
+LEASE_SECONDS = 60
+
+
+@pytest.fixture
+async def repository():
+    repository = JobRepository(AsyncMongoMockClient()["tts_test"])
+    await repository.ensure_indexes()
+    return repository
+
+
+def _ids(count: int):
+    return [str(ObjectId()) for _ in range(count)]
+
+
+async def test_enqueue_returns_active_job_for_same_audio(repository):
+    audio_id, user_id = _ids(2)
+
+    first = await repository.enqueue(audio_id, user_id, 3)
+    second = await repository.enqueue(audio_id, user_id, 3)
+
+    assert second.id == first.id
+    assert await repository.collection.count_documents({"audio_id": ObjectId(audio_id)}) == 1
+
+
+async def test_enqueue_after_completion_creates_new_job(repository):
+    audio_id, user_id = _ids(2)
+
+    first = await repository.enqueue(audio_id, user_id, 3)
+    job = await repository.claim("worker-1", LEASE_SECONDS)
+    assert await repository.complete(job, "worker-1")
+
+    second = await repository.enqueue(audio_id, user_id, 3)
+    assert second.id != first.id
+    assert second.status == "queued"
+
+
+async def test_enqueue_weight_scales_finish_tag(repository):
+    light_user, heavy_user = _ids(2)
+
+    light = await repository.enqueue(str(ObjectId()), light_user, 3, cost=100)
+    heavy = await repository.enqueue(str(ObjectId()), heavy_user, 3, cost=100, weight=2.0)
+
+    assert light.finish_tag - light.start_tag == pytest.approx(100)
+    assert heavy.finish_tag - heavy.start_tag == pytest.approx(50)
+
+    # Job tiếp theo của cùng người dùng bắt đầu sau finish tag của job trước
+    next_light = await repository.enqueue(str(ObjectId()), light_user, 3, cost=100)
+    assert next_light.start_tag == pytest.approx(light.finish_tag)
+
+
+async def test_claim_orders_by_priority_then_start_tag(repository):
+    busy_user, other_user, preview_user = _ids(3)
+
+    await repository.enqueue(str(ObjectId()), busy_user, 3, cost=100)
+    later = await repository.enqueue(str(ObjectId()), busy_user, 3, cost=100)
+    fair = await repository.enqueue(str(ObjectId()), other_user, 3, cost=100)
+    preview = await repository.enqueue(str(ObjectId()), preview_user, 3, cost=5, priority=JOB_PRIORITY_PREVIEW)
+
+    claimed = [await repository.claim(f"worker-{i}", LEASE_SECONDS) for i in range(4)]
+
+    assert claimed[0].id == preview.id
+    # Người dùng khác không phải chờ job thứ hai của busy_user
+    assert [job.id for job in claimed[2:]] == [fair.id, later.id]
+    assert all(job.status == "running" and job.attempts == 1 for job in claimed)
+    assert await repository.claim("worker-4", LEASE_SECONDS) is None
+
+
+async def test_claim_respects_per_user_limit(repository):
+    user_id, other_user = _ids(2)
+    first = await repository.enqueue(str(ObjectId()), user_id, 3)
+    second = await repository.enqueue(str(ObjectId()), user_id, 3)
+    other = await repository.enqueue(str(ObjectId()), other_user, 3)
+
+    job = await repository.claim("worker-1", LEASE_SECONDS, max_running_per_user=1)
+    assert job.id == first.id
+
+    # Job thứ hai của cùng người dùng bị bỏ qua, worker nhận job của người khác
+    job = await repository.claim("worker-2", LEASE_SECONDS, max_running_per_user=1)
+    assert job.id == other.id
+    assert await repository.claim("worker-3", LEASE_SECONDS, max_running_per_user=1) is None
+
+    # Job xong trả lại slot
+    assert await repository.complete(await repository.get_by_id(first.id), "worker-1")
+    job = await repository.claim("worker-3", LEASE_SECONDS, max_running_per_user=1)
+    assert job.id == second.id
+
+
+async def test_fail_requeues_until_attempts_are_used(repository):
+    user_id = str(ObjectId())
+    queued = await repository.enqueue(str(ObjectId()), user_id, 2)
+
+    job = await repository.claim("worker-1", LEASE_SECONDS, max_running_per_user=1)
+    assert await repository.fail(job, "worker-1", "boom", retry_delay=0)
+
+    stored = await repository.get_by_id(queued.id)
+    assert stored.status == "queued"
+    assert stored.worker_id is None
+    assert stored.error == "boom"
+
+    # Slot đã được trả nên lần thử lại nhận được ngay
+    job = await repository.claim("worker-2", LEASE_SECONDS, max_running_per_user=1)
+    assert job.id == queued.id
+    assert job.attempts == 2
+    assert not await repository.fail(job, "worker-2", "boom again", retry_delay=0)
+
+    stored = await repository.collection.find_one({"_id": ObjectId(queued.id)})
+    assert stored["status"] == "failed"
+    assert "active" not in stored
+    slots = await repository.user_slots.find_one({"_id": ObjectId(user_id)})
+    assert slots["slots"] == []
+    assert await repository.claim("worker-3", LEASE_SECONDS, max_running_per_user=1) is None
+
+
+async def test_fail_with_delay_postpones_retry(repository):
+    await repository.enqueue(str(ObjectId()), str(ObjectId()), 3)
+
+    job = await repository.claim("worker-1", LEASE_SECONDS)
+    assert await repository.fail(job, "worker-1", "boom", retry_delay=3600)
+    assert await repository.claim("worker-2", LEASE_SECONDS) is None
+
+
+async def test_expired_lease_is_reclaimed(repository):
+    user_id = str(ObjectId())
+    queued = await repository.enqueue(str(ObjectId()), user_id, 3)
+
+    # Worker chết: lease hết hạn ngay, slot người dùng cũng hết hạn theo
+    stale = await repository.claim("worker-1", -1, max_running_per_user=1)
+    assert stale.id == queued.id
+
+    job = await repository.claim("worker-2", LEASE_SECONDS, max_running_per_user=1)
+    assert job.id == queued.id
+    assert job.worker_id == "worker-2"
+    assert job.attempts == 2
+
+    # Worker cũ không còn giữ job
+    assert not await repository.heartbeat(stale, "worker-1", LEASE_SECONDS)
+    assert await repository.heartbeat(job, "worker-2", LEASE_SECONDS)
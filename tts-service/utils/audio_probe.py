@@ -0,0 +1,362 @@
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+# Đọc header container (WAV/MP3/ADTS AAC) mà không giải mã audio
+
+PROBE_READ_SIZE = 64 * 1024
+
+_MP3_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+_ADTS_SAMPLE_RATES = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350]
+
+
+class FrameInfo:
+    __slots__ = ("length", "samples", "sample_rate", "channels", "bitrate")
+
+    def __init__(self, length: int, samples: int, sample_rate: int, channels: int, bitrate: int = 0):
+        self.length = length
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bitrate = bitrate
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+
+class AudioInfo:
+    __slots__ = ("format", "duration", "sample_rate", "channels", "sample_width", "bitrate")
+
+    def __init__(self, format: str, duration: float, sample_rate: int, channels: int, sample_width: int = 2,
+                 bitrate: int = 0):
+        self.format = format
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.bitrate = bitrate
+
+
+WAVE_FORMAT_PCM = 1
+
+
+class WavInfo:
+    __slots__ = ("data_offset", "data_size", "channels", "sample_rate", "sample_width", "block_align", "format_tag")
+
+    def __init__(self, data_offset: int, data_size: int, channels: int, sample_rate: int, sample_width: int,
+                 block_align: int, format_tag: int = WAVE_FORMAT_PCM):
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.block_align = block_align
+        self.format_tag = format_tag
+
+    @property
+    def pcm_format(self) -> Tuple[int, int, int]:
+        return self.channels, self.sample_rate, self.sample_width
+
+    @property
+    def duration(self) -> float:
+        return self.data_size / float(self.block_align * self.sample_rate)
+
+
+def parse_mp3_frame_header(header: bytes) -> Optional[FrameInfo]:
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    channel_mode = (header[3] >> 6) & 0x03
+
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = _MP3_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 3:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version == 3:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return FrameInfo(length, samples, sample_rate, 1 if channel_mode == 3 else 2, bitrate)
+
+
+def parse_adts_frame_header(header: bytes) -> Optional[FrameInfo]:
+    if len(header) < 7 or header[0] != 0xFF or (header[1] & 0xF6) != 0xF0:
+        return None
+
+    sample_rate_index = (header[2] >> 2) & 0x0F
+    if sample_rate_index >= len(_ADTS_SAMPLE_RATES):
+        return None
+
+    channels = ((header[2] & 0x01) << 2) | (header[3] >> 6)
+    length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+    blocks = (header[6] & 0x03) + 1
+    if length < 7:
+        return None
+
+    return FrameInfo(length, 1024 * blocks, _ADTS_SAMPLE_RATES[sample_rate_index], channels)
+
+
+_FRAME_PARSERS = {
+    "mp3": (parse_mp3_frame_header, 4),
+    "aac": (parse_adts_frame_header, 7),
+}
+
+
+def id3v2_size(header: bytes) -> int:
+    """Kích thước tag ID3v2 ở đầu file (0 nếu không có)"""
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+class FrameScanner:
+    """Đọc lần lượt header các frame MP3/ADTS từ luồng byte (có thể nạp từng phần),
+    trả về (offset, thời điểm bắt đầu, FrameInfo) của mỗi frame"""
+
+    def __init__(self, audio_format: str):
+        if audio_format not in _FRAME_PARSERS:
+            raise ValueError(f"Unsupported frame format: {audio_format}")
+        self._parse, self._header_size = _FRAME_PARSERS[audio_format]
+        self._buffer = bytearray()
+        self._buffer_offset = 0
+        self._skip = 0
+        self._started = False
+        self.time = 0.0
+        self.frame_count = 0
+        self.first_frame: Optional[FrameInfo] = None
+
+    def feed(self, data: bytes) -> Iterator[Tuple[int, float, FrameInfo]]:
+        self._buffer += data
+        pos = 0
+
+        if not self._started:
+            if len(self._buffer) < 10:
+                return
+            self._skip = id3v2_size(bytes(self._buffer[:10]))
+            self._started = True
+
+        if self._skip:
+            skipped = min(self._skip, len(self._buffer))
+            pos += skipped
+            self._skip -= skipped
+
+        while len(self._buffer) - pos >= self._header_size:
+            frame = self._parse(bytes(self._buffer[pos:pos + self._header_size]))
+            if frame is None:
+                # Mất đồng bộ: dò tiếp từng byte
+                pos += 1
+                continue
+            if len(self._buffer) - pos < frame.length:
+                break
+
+            if self.first_frame is None:
+                self.first_frame = frame
+            yield self._buffer_offset + pos, self.time, frame
+
+            self.time += frame.duration
+            self.frame_count += 1
+            pos += frame.length
+
+        del self._buffer[:pos]
+        self._buffer_offset += pos
+
+
+def find_frame_start(data: bytes, audio_format: str) -> Optional[int]:
+    """Vị trí frame hợp lệ đầu tiên trong data (kiểm tra thêm header của frame kế tiếp nếu có)"""
+    parse, header_size = _FRAME_PARSERS[audio_format]
+
+    for pos in range(0, max(0, len(data) - header_size + 1)):
+        frame = parse(data[pos:pos + header_size])
+        if frame is None:
+            continue
+        next_pos = pos + frame.length
+        if next_pos + header_size <= len(data) and parse(data[next_pos:next_pos + header_size]) is None:
+            continue
+        return pos
+
+    return None
+
+
+def parse_wav_header(data: bytes) -> Optional[WavInfo]:
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+
+        if chunk_id == b"fmt " and pos + 8 + 16 <= len(data):
+            format_tag, channels, sample_rate, _, block_align, bits = struct.unpack(
+                "<HHIIHH", data[pos + 8:pos + 24])
+            fmt = (channels, sample_rate, bits // 8, block_align, format_tag)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            return WavInfo(pos + 8, chunk_size, *fmt)
+
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+    return None
+
+
+def make_wav_header(data_size: int, channels: int, sample_rate: int, sample_width: int) -> bytes:
+    """Header PCM 44 byte; data_size = 0xFFFFFFFF khi chưa biết độ dài (stream)"""
+    block_align = channels * sample_width
+    riff_size = 0xFFFFFFFF if data_size >= 0xFFFFFFFF - 36 else 36 + data_size
+    return (
+        struct.pack("<4sI4s", b"RIFF", riff_size, b"WAVE")
+        + struct.pack("<4sIHHIIHH", b"fmt ", 16, 1, channels, sample_rate,
+                      sample_rate * block_align, block_align, sample_width * 8)
+        + struct.pack("<4sI", b"data", min(data_size, 0xFFFFFFFF))
+    )
+
+
+def read_wav_info(path: str) -> Optional[WavInfo]:
+    with open(path, "rb") as f:
+        info = parse_wav_header(f.read(PROBE_READ_SIZE))
+
+    if info is not None:
+        # Header ghi từ stream có thể để data size = 0xFFFFFFFF
+        info.data_size = min(info.data_size, os.path.getsize(path) - info.data_offset)
+    return info
+
+
+def build_seek_index(path: str, audio_format: str, boundaries: List[float]) -> List[int]:
+    """Offset byte tương ứng với từng mốc thời gian (giây) trong boundaries, theo thứ tự tăng dần"""
+    if audio_format == "wav":
+        info = read_wav_info(path)
+        if info is None:
+            return []
+        return [
+            info.data_offset + min(int(round(t * info.sample_rate)) * info.block_align, info.data_size)
+            for t in boundaries
+        ]
+
+    if audio_format not in _FRAME_PARSERS:
+        return []
+
+    builder = SeekIndexBuilder(audio_format, boundaries)
+    with open(path, "rb") as f:
+        while chunk := f.read(PROBE_READ_SIZE):
+            builder.feed(chunk)
+    return builder.finish(os.path.getsize(path))
+
+
+class SeekIndexBuilder:
+    """Ghi lại offset của frame chứa mỗi mốc thời gian khi quét luồng MP3/ADTS"""
+
+    def __init__(self, audio_format: str, boundaries: List[float]):
+        self._scanner = FrameScanner(audio_format)
+        self._boundaries = boundaries
+        self.index: List[int] = []
+
+    def feed(self, data: bytes) -> None:
+        for offset, start_time, frame in self._scanner.feed(data):
+            end_time = start_time + frame.duration
+            while len(self.index) < len(self._boundaries) and self._boundaries[len(self.index)] < end_time:
+                self.index.append(offset)
+
+    def finish(self, total_size: int) -> List[int]:
+        while len(self.index) < len(self._boundaries):
+            self.index.append(total_size)
+        return self.index
+
+
+def _xing_frame_count(frame_data: bytes, frame: FrameInfo) -> Optional[int]:
+    """Số frame ghi trong header Xing/Info (LAME) hoặc VBRI nằm trong frame đầu tiên"""
+    # Xing nằm sau side info: MPEG1 17/32 byte, MPEG2/2.5 9/17 byte (mono/stereo)
+    if frame.samples == 1152:
+        side_info = 17 if frame.channels == 1 else 32
+    else:
+        side_info = 9 if frame.channels == 1 else 17
+
+    xing = 4 + side_info
+    if frame_data[xing:xing + 4] in (b"Xing", b"Info") and len(frame_data) >= xing + 12:
+        flags = struct.unpack(">I", frame_data[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack(">I", frame_data[xing + 8:xing + 12])[0]
+
+    if frame_data[36:40] == b"VBRI" and len(frame_data) >= 54:
+        return struct.unpack(">I", frame_data[50:54])[0]
+
+    return None
+
+
+def _probe_frames(path: str, audio_format: str) -> Optional[AudioInfo]:
+    size = os.path.getsize(path)
+
+    with open(path, "rb") as f:
+        head = f.read(PROBE_READ_SIZE)
+        audio_start = id3v2_size(head)
+
+        if audio_format == "mp3":
+            f.seek(audio_start)
+            head = f.read(PROBE_READ_SIZE)
+            pos = find_frame_start(head, audio_format)
+            if pos is None:
+                return None
+            frame = parse_mp3_frame_header(head[pos:pos + 4])
+            frame_count = _xing_frame_count(head[pos:pos + frame.length], frame) if frame.samples != 384 else None
+            if frame_count:
+                duration = frame_count * frame.samples / frame.sample_rate
+                bitrate = int((size - audio_start - pos) * 8 / duration) if duration else frame.bitrate
+                return AudioInfo(audio_format, duration, frame.sample_rate, frame.channels, bitrate=bitrate)
+
+        # Không có bảng frame: quét header của từng frame (không giải mã)
+        f.seek(0)
+        scanner = FrameScanner(audio_format)
+        while chunk := f.read(PROBE_READ_SIZE):
+            for _ in scanner.feed(chunk):
+                pass
+
+    frame = scanner.first_frame
+    if frame is None:
+        return None
+
+    bitrate = int((size - audio_start) * 8 / scanner.time) if scanner.time else frame.bitrate
+    return AudioInfo(audio_format, scanner.time, frame.sample_rate, frame.channels, bitrate=bitrate)
+
+
+def probe_audio(path: str) -> Optional[AudioInfo]:
+    """Thông tin cơ bản của file WAV/MP3/AAC (ADTS) chỉ từ header, None với định dạng khác"""
+    with open(path, "rb") as f:
+        head = f.read(12)
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        info = read_wav_info(path)
+        if info is None:
+            return None
+        return AudioInfo("wav", info.duration, info.sample_rate, info.channels, info.sample_width,
+                         info.sample_rate * info.block_align * 8)
+
+    extension = os.path.splitext(path)[1].lower().replace(".", "")
+    if extension in _FRAME_PARSERS:
+        return _probe_frames(path, extension)
+
+    return None
@@ -1,31 +1,113 @@
 import os
-import wave
+import math
+import shutil
 import logging
 import subprocess
 import tempfile
-from typing import List, Optional
+from typing import BinaryIO, List, Optional
+import numpy as np
 from pydub import AudioSegment
 
+from utils.audio_probe import WAVE_FORMAT_PCM, AudioInfo, WavInfo, make_wav_header, read_wav_info, probe_audio
+
 logger = logging.getLogger(__name__)
 
 
 def get_audio_duration(audio_file: str) -> float:
 
     try:
-        if audio_file.lower().endswith('.wav'):
-            with wave.open(audio_file, 'r') as wav_file:
-                frames = wav_file.getnframes()
-                rate = wav_file.getframerate()
-                duration = frames / float(rate)
-                return duration
-        else:
-            audio = AudioSegment.from_file(audio_file)
-            return len(audio) / 1000.0
+        # WAV/MP3/AAC: đọc header và bảng frame, không giải mã
+        info = probe_audio(audio_file)
+        if info is not None:
+            return info.duration
+
+        audio = AudioSegment.from_file(audio_file)
+        return len(audio) / 1000.0
     except Exception as e:
         logger.error(f"Error getting audio duration: {str(e)}")
         return 0.0
 
 
+# Kích thước buffer khi chép dữ liệu PCM giữa các file
+WAV_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Codec và muxer ffmpeg theo định dạng đầu ra
+_ENCODER_ARGS = {
+    'mp3': ['-c:a', 'libmp3lame', '-f', 'mp3'],
+    'aac': ['-c:a', 'aac', '-f', 'adts'],
+    'm4a': ['-c:a', 'aac', '-f', 'ipod'],
+    'ogg': ['-c:a', 'libvorbis', '-f', 'ogg'],
+}
+
+
+def encoder_command(output_format: str, input_args: List[str], output_target: str) -> List[str]:
+    """Lệnh ffmpeg mã hóa PCM (input_args chỉ định nguồn vào) sang output_format"""
+    return (
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y']
+        + input_args
+        + _ENCODER_ARGS.get(output_format, ['-f', output_format])
+        + [output_target]
+    )
+
+
+def _read_pcm_wav_infos(input_files: List[str]) -> Optional[List[WavInfo]]:
+    """Header của các file nếu tất cả là WAV PCM cùng định dạng, ngược lại None"""
+    infos = []
+    for audio_file in input_files:
+        if not audio_file.lower().endswith('.wav'):
+            return None
+        info = read_wav_info(audio_file)
+        if info is None or info.format_tag != WAVE_FORMAT_PCM:
+            return None
+        if infos and info.pcm_format != infos[0].pcm_format:
+            return None
+        infos.append(info)
+    return infos
+
+
+def _write_concatenated_wav(input_files: List[str], infos: List[WavInfo], output: BinaryIO) -> None:
+    total_size = sum(info.data_size for info in infos)
+    output.write(make_wav_header(total_size, *infos[0].pcm_format))
+
+    for audio_file, info in zip(input_files, infos):
+        with open(audio_file, 'rb') as f:
+            f.seek(info.data_offset)
+            remaining = info.data_size
+            while remaining > 0:
+                buffer = f.read(min(WAV_COPY_BUFFER_SIZE, remaining))
+                if not buffer:
+                    break
+                output.write(buffer)
+                remaining -= len(buffer)
+
+
+def _concatenate_pcm_wav_files(input_files: List[str], infos: List[WavInfo], output_file: str,
+                               output_format: str) -> None:
+    """Ghi header một lần rồi chép dữ liệu mẫu từng file; MP3/AAC được mã hóa bằng một lượt ffmpeg
+    đọc WAV qua stdin"""
+    if output_format == 'wav':
+        with open(output_file, 'wb') as output:
+            _write_concatenated_wav(input_files, infos, output)
+        return
+
+    process = subprocess.Popen(
+        encoder_command(output_format, ['-f', 'wav', '-i', 'pipe:0'], output_file),
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        _write_concatenated_wav(input_files, infos, process.stdin)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    finally:
+        stderr = process.stderr.read()
+        process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {stderr.decode(errors='replace')}")
+
+
 def concatenate_audio_files(input_files: List[str], output_file: str) -> bool:
 
     try:
@@ -37,16 +119,22 @@ def concatenate_audio_files(input_files: List[str], output_file: str) -> bool:
         if not output_format:
             output_format = 'wav'
 
+        output_dir = os.path.dirname(output_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+        infos = _read_pcm_wav_infos(input_files)
+        if infos is not None:
+            _concatenate_pcm_wav_files(input_files, infos, output_file, output_format)
+            return True
+
+        # Định dạng khác nhau: giải mã và ghép bằng pydub
         combined = AudioSegment.from_file(input_files[0])
 
         for audio_file in input_files[1:]:
             audio_segment = AudioSegment.from_file(audio_file)
             combined += audio_segment
 
-        output_dir = os.path.dirname(output_file)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
-
         combined.export(output_file, format=output_format)
 
         return True
@@ -180,30 +268,139 @@ def optimize_audio_for_streaming(input_file: str, output_file: str) -> bool:
         return False
 
 
-def extract_audio_features(audio_file: str) -> dict:
+def package_hls_segment(input_files: List[str], output_file: str, id3_tag: bytes) -> bool:
+    """Ghép các câu thành một media segment HLS (AAC ADTS hoặc MP3) có tag ID3 timestamp ở đầu"""
     try:
-        audio = AudioSegment.from_file(audio_file)
+        output_format = os.path.splitext(output_file)[1].lower().replace('.', '')
+
+        combined = AudioSegment.empty()
+        for audio_file in input_files:
+            combined += AudioSegment.from_file(audio_file)
+
+        encoded_file = f"{output_file}.encoded"
+        if output_format == 'mp3':
+            combined.export(encoded_file, format='mp3', bitrate='128k')
+        else:
+            combined.export(encoded_file, format='adts', codec='aac', bitrate='96k')
 
-        duration_seconds = len(audio) / 1000.0
-        channels = audio.channels
-        frame_rate = audio.frame_rate
-        sample_width = audio.sample_width
+        with open(output_file, 'wb') as output, open(encoded_file, 'rb') as encoded:
+            output.write(id3_tag)
+            shutil.copyfileobj(encoded, output)
+        os.remove(encoded_file)
+
+        return True
+    except Exception as e:
+        logger.exception(f"Error packaging HLS segment: {str(e)}")
+        return False
 
-        max_amplitude = float(audio.max)
 
-        dBFS = audio.dBFS
+def _sample_window_starts(duration: float, windows: int, window_seconds: float) -> List[float]:
+    if duration <= windows * window_seconds:
+        return [0.0]
+    step = (duration - window_seconds) / (windows - 1) if windows > 1 else 0.0
+    return [i * step for i in range(windows)]
+
+
+def estimate_loudness(audio_file: str, info: AudioInfo, windows: int = 16,
+                      window_seconds: float = 0.5) -> Optional[dict]:
+    """Ước lượng max amplitude và dBFS từ các cửa sổ ngắn rải đều trong file thay vì giải mã cả file.
+    WAV đọc thẳng dữ liệu mẫu, định dạng khác chỉ giải mã từng cửa sổ."""
+    starts = _sample_window_starts(info.duration, windows, window_seconds)
+    max_amplitude = 0
+    sum_squares = 0.0
+    sample_count = 0
+
+    wav_info = read_wav_info(audio_file) if info.format == "wav" else None
+    if wav_info is not None and wav_info.format_tag == WAVE_FORMAT_PCM and wav_info.sample_width in (1, 2, 4):
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[wav_info.sample_width]
+        full_scale = float(1 << (8 * wav_info.sample_width - 1))
+        window_bytes = int(window_seconds * wav_info.sample_rate) * wav_info.block_align
+
+        with open(audio_file, 'rb') as f:
+            for start in starts:
+                offset = int(start * wav_info.sample_rate) * wav_info.block_align
+                f.seek(wav_info.data_offset + offset)
+                data = f.read(min(window_bytes, max(0, wav_info.data_size - offset)))
+                samples = np.frombuffer(data[:len(data) - len(data) % wav_info.sample_width], dtype=dtype)
+                samples = samples.astype(np.float64)
+                if wav_info.sample_width == 1:
+                    samples -= 128.0
+                if samples.size:
+                    max_amplitude = max(max_amplitude, int(np.abs(samples).max()))
+                    sum_squares += float(np.square(samples).sum())
+                    sample_count += samples.size
+    else:
+        full_scale = None
+        for start in starts:
+            segment = AudioSegment.from_file(audio_file, start_second=start, duration=window_seconds)
+            if full_scale is None:
+                full_scale = float(segment.max_possible_amplitude)
+            samples = np.array(segment.get_array_of_samples(), dtype=np.float64)
+            if samples.size:
+                max_amplitude = max(max_amplitude, int(np.abs(samples).max()))
+                sum_squares += float(np.square(samples).sum())
+                sample_count += samples.size
+
+    if not sample_count:
+        return None
+
+    rms = math.sqrt(sum_squares / sample_count)
+    return {
+        "max_amplitude": float(max_amplitude),
+        "dBFS": 20 * math.log10(rms / full_scale) if rms > 0 else -float("inf"),
+    }
+
+
+def extract_audio_features(audio_file: str, loudness: bool = True, sample_windows: int = 16,
+                           window_seconds: float = 0.5) -> dict:
+    """Đặc trưng cơ bản của file audio. WAV/MP3/AAC chỉ đọc header; loudness (max_amplitude, dBFS)
+    được ước lượng từ sample_windows cửa sổ, loudness=False để bỏ qua hoàn toàn phần đọc mẫu."""
+    try:
+        info = probe_audio(audio_file)
+        if info is None:
+            return _extract_audio_features_decoded(audio_file)
 
         features = {
-            "duration": duration_seconds,
-            "channels": channels,
-            "frame_rate": frame_rate,
-            "sample_width": sample_width,
-            "max_amplitude": max_amplitude,
-            "dBFS": dBFS,
+            "duration": info.duration,
+            "channels": info.channels,
+            "frame_rate": info.sample_rate,
+            "sample_width": info.sample_width,
+            "bitrate": info.bitrate,
             "format": os.path.splitext(audio_file)[1].lower().replace('.', '')
         }
 
+        if loudness:
+            estimate = estimate_loudness(audio_file, info, sample_windows, window_seconds)
+            if estimate:
+                features.update(estimate)
+                features["loudness_sampled"] = True
+
         return features
     except Exception as e:
         logger.exception(f"Error extracting audio features: {str(e)}")
-        return {}
\ No newline at end of file
+        return {}
+
+
+def _extract_audio_features_decoded(audio_file: str) -> dict:
+    audio = AudioSegment.from_file(audio_file)
+
+    duration_seconds = len(audio) / 1000.0
+    channels = audio.channels
+    frame_rate = audio.frame_rate
+    sample_width = audio.sample_width
+
+    max_amplitude = float(audio.max)
+
+    dBFS = audio.dBFS
+
+    features = {
+        "duration": duration_seconds,
+        "channels": channels,
+        "frame_rate": frame_rate,
+        "sample_width": sample_width,
+        "max_amplitude": max_amplitude,
+        "dBFS": dBFS,
+        "format": os.path.splitext(audio_file)[1].lower().replace('.', '')
+    }
+
+    return features
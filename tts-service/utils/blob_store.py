@@ -0,0 +1,424 @@
+import os
+import uuid
+import shutil
+import asyncio
+import logging
+import tempfile
+import mimetypes
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Any, Optional
+
+from core.config import settings
+from utils.firebase_firestore import (
+    upload_audio_to_firestore,
+    upload_audio_segment_to_firestore,
+    download_audio_from_firestore,
+    delete_audio_from_firestore,
+    get_audio_metadata_from_firestore,
+    iter_audio_chunks_from_firestore,
+)
+
+logger = logging.getLogger(__name__)
+
+# Kích thước mỗi lần đọc/ghi khi stream blob
+BLOB_CHUNK_SIZE = 1024 * 1024
+# Kích thước mỗi part khi upload multipart lên S3 (tối thiểu 5 MiB)
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def guess_content_type(path: str) -> str:
+    extension = os.path.splitext(path)[1][1:].lower()
+    if extension in ("mp3", "wav", "aac", "ogg", "m4a"):
+        return f"audio/{extension}"
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+class BlobStore(ABC):
+    """Nơi lưu file audio. Key có dạng "<collection>/<document_id>" cho audio hoàn chỉnh
+    và "<collection>/<document_id>/segments/<segment_id>" cho từng đoạn."""
+
+    scheme: str = ""
+
+    def handles(self, url: str) -> bool:
+        return url.startswith(f"{self.scheme}://")
+
+    @abstractmethod
+    async def upload_file(self, local_file_path: str, key: str) -> str:
+        """Upload file (đọc theo từng phần), trả về URL của blob"""
+        pass
+
+    async def upload_stream(self, chunks: AsyncIterator[bytes], key: str, extension: str) -> str:
+        """Upload dữ liệu chưa biết trước độ dài (vd. output của encoder). Mặc định ghi ra file tạm
+        rồi upload_file; nếu luồng lỗi thì blob cũ (nếu có) được giữ nguyên."""
+        fd, temp_path = tempfile.mkstemp(suffix=extension)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+            return await self.upload_file(temp_path, key)
+        finally:
+            os.remove(temp_path)
+
+    @abstractmethod
+    async def download_file(self, url: str, local_file_path: str) -> bool:
+        pass
+
+    @abstractmethod
+    def iter_chunks(self, url: str, chunk_size: int = BLOB_CHUNK_SIZE,
+                    start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream nội dung blob từ byte start tới byte end (tính cả end, None = hết file)"""
+        pass
+
+    @abstractmethod
+    async def delete(self, url: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        """Trả về size, content_type, uploaded_at, etag của blob"""
+        pass
+
+
+class LocalBlobStore(BlobStore):
+    scheme = "local"
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+
+    def handles(self, url: str) -> bool:
+        return url.startswith("local://") or url.startswith("file://")
+
+    @staticmethod
+    def path_from_url(url: str) -> str:
+        return url.replace("local://", "", 1).replace("file://", "", 1)
+
+    async def upload_file(self, local_file_path: str, key: str) -> str:
+        extension = os.path.splitext(local_file_path)[1] or ".audio"
+        path = os.path.join(self.root_dir, f"{key}{extension}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        await asyncio.to_thread(shutil.copyfile, local_file_path, path)
+
+        logger.info(f"File stored locally at: {path}")
+        return f"local://{path}"
+
+    async def upload_stream(self, chunks: AsyncIterator[bytes], key: str, extension: str) -> str:
+        path = os.path.join(self.root_dir, f"{key}{extension}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                async for chunk in chunks:
+                    await asyncio.to_thread(f.write, chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        logger.info(f"Stream stored locally at: {path}")
+        return f"local://{path}"
+
+    async def download_file(self, url: str, local_file_path: str) -> bool:
+        path = self.path_from_url(url)
+        if not os.path.exists(path):
+            logger.error(f"Source file does not exist: {path}")
+            return False
+
+        os.makedirs(os.path.dirname(os.path.abspath(local_file_path)), exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, path, local_file_path)
+        return True
+
+    async def iter_chunks(self, url: str, chunk_size: int = BLOB_CHUNK_SIZE,
+                          start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        with open(self.path_from_url(url), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, url: str) -> bool:
+        path = self.path_from_url(url)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info(f"Deleted local file: {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting local file {path}: {str(e)}")
+            return False
+
+    async def get_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self.path_from_url(url)
+        if not os.path.exists(path):
+            return None
+
+        stat = os.stat(path)
+        return {
+            "size": stat.st_size,
+            "content_type": guess_content_type(path),
+            "uploaded_at": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            "etag": f"{stat.st_size:x}-{stat.st_mtime_ns:x}",
+        }
+
+
+class S3BlobStore(BlobStore):
+    """Lưu blob trên S3 hoặc dịch vụ tương thích S3 (MinIO, ...)"""
+
+    scheme = "s3"
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key_id: Optional[str] = None, secret_access_key: Optional[str] = None):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError("boto3 is required for the s3 blob store backend")
+
+        self.bucket = bucket
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+        )
+        # Upload/download multipart theo từng phần, không đọc cả file vào bộ nhớ
+        self._transfer_config = TransferConfig(multipart_chunksize=S3_MULTIPART_CHUNK_SIZE)
+
+    def _parse_url(self, url: str):
+        bucket, _, key = url.replace("s3://", "", 1).partition("/")
+        return bucket, key
+
+    async def upload_file(self, local_file_path: str, key: str) -> str:
+        object_key = f"{key}{os.path.splitext(local_file_path)[1]}"
+
+        await asyncio.to_thread(
+            self._client.upload_file,
+            local_file_path,
+            self.bucket,
+            object_key,
+            ExtraArgs={"ContentType": guess_content_type(local_file_path)},
+            Config=self._transfer_config,
+        )
+
+        url = f"s3://{self.bucket}/{object_key}"
+        logger.info(f"File uploaded to S3: {url}")
+        return url
+
+    async def upload_stream(self, chunks: AsyncIterator[bytes], key: str, extension: str) -> str:
+        """Multipart upload theo từng part S3_MULTIPART_CHUNK_SIZE khi luồng tới, luồng nhỏ dùng put_object"""
+        object_key = f"{key}{extension}"
+        content_type = guess_content_type(object_key)
+        buffer = bytearray()
+        parts = []
+        upload_id = None
+
+        async def upload_part(data: bytes) -> None:
+            part_number = len(parts) + 1
+            response = await asyncio.to_thread(
+                self._client.upload_part,
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=part_number, Body=data
+            )
+            parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= S3_MULTIPART_CHUNK_SIZE:
+                    if upload_id is None:
+                        response = await asyncio.to_thread(
+                            self._client.create_multipart_upload,
+                            Bucket=self.bucket, Key=object_key, ContentType=content_type
+                        )
+                        upload_id = response["UploadId"]
+                    await upload_part(bytes(buffer))
+                    buffer.clear()
+
+            if upload_id is None:
+                await asyncio.to_thread(
+                    self._client.put_object,
+                    Bucket=self.bucket, Key=object_key, Body=bytes(buffer), ContentType=content_type
+                )
+            else:
+                if buffer:
+                    await upload_part(bytes(buffer))
+                await asyncio.to_thread(
+                    self._client.complete_multipart_upload,
+                    Bucket=self.bucket, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    self._client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+                except Exception as e:
+                    logger.warning(f"Error aborting multipart upload of {object_key}: {str(e)}")
+            raise
+
+        url = f"s3://{self.bucket}/{object_key}"
+        logger.info(f"Stream uploaded to S3: {url} ({len(parts)} parts)")
+        return url
+
+    async def download_file(self, url: str, local_file_path: str) -> bool:
+        bucket, key = self._parse_url(url)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(local_file_path)), exist_ok=True)
+            await asyncio.to_thread(
+                self._client.download_file, bucket, key, local_file_path, Config=self._transfer_config
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error downloading {url}: {str(e)}")
+            return False
+
+    async def iter_chunks(self, url: str, chunk_size: int = BLOB_CHUNK_SIZE,
+                          start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        bucket, key = self._parse_url(url)
+        params = {"Bucket": bucket, "Key": key}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+
+        response = await asyncio.to_thread(self._client.get_object, **params)
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, url: str) -> bool:
+        bucket, key = self._parse_url(url)
+        try:
+            await asyncio.to_thread(self._client.delete_object, Bucket=bucket, Key=key)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting {url}: {str(e)}")
+            return False
+
+    async def get_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        bucket, key = self._parse_url(url)
+        try:
+            head = await asyncio.to_thread(self._client.head_object, Bucket=bucket, Key=key)
+        except Exception as e:
+            logger.error(f"Error reading metadata of {url}: {str(e)}")
+            return None
+
+        return {
+            "size": head["ContentLength"],
+            "content_type": head.get("ContentType") or guess_content_type(key),
+            "uploaded_at": head.get("LastModified"),
+            "etag": head.get("ETag", "").strip('"') or None,
+        }
+
+
+class FirestoreBlobStore(BlobStore):
+    """Backend cũ: lưu nội dung audio trong document Firestore"""
+
+    scheme = "firestore"
+
+    async def upload_file(self, local_file_path: str, key: str) -> str:
+        parts = key.split("/")
+        if len(parts) == 4 and parts[2] == "segments":
+            return await upload_audio_segment_to_firestore(local_file_path, parts[0], parts[1], parts[3])
+        return await upload_audio_to_firestore(local_file_path, parts[0], parts[1])
+
+    async def download_file(self, url: str, local_file_path: str) -> bool:
+        return await download_audio_from_firestore(url, local_file_path)
+
+    async def iter_chunks(self, url: str, chunk_size: int = BLOB_CHUNK_SIZE,
+                          start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        # Kích thước chunk do manifest quyết định (FIRESTORE_CHUNK_SIZE lúc upload)
+        async for data in iter_audio_chunks_from_firestore(url, start, end):
+            yield data
+
+    async def delete(self, url: str) -> bool:
+        return await delete_audio_from_firestore(url)
+
+    async def get_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        metadata = await get_audio_metadata_from_firestore(url)
+        if metadata and "etag" not in metadata:
+            uploaded_at = metadata.get("uploaded_at")
+            metadata["etag"] = metadata.get("sha256") or (
+                f"{metadata.get('size', 0):x}-{int(uploaded_at.timestamp()) if uploaded_at else 0:x}")
+        return metadata
+
+
+_stores: Dict[str, BlobStore] = {}
+
+
+def _create_store(backend: str) -> BlobStore:
+    if backend == "local":
+        return LocalBlobStore(settings.BLOB_STORE_LOCAL_DIR)
+    if backend == "s3":
+        return S3BlobStore(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+        )
+    if backend == "firestore":
+        return FirestoreBlobStore()
+    raise ValueError(f"Unsupported blob store backend: {backend}")
+
+
+def _get_store(backend: str) -> BlobStore:
+    if backend not in _stores:
+        _stores[backend] = _create_store(backend)
+    return _stores[backend]
+
+
+def get_blob_store() -> BlobStore:
+    """Backend dùng cho các blob mới (BLOB_STORE_BACKEND)"""
+    return _get_store(settings.BLOB_STORE_BACKEND)
+
+
+def get_blob_store_for_url(url: str) -> BlobStore:
+    if url.startswith("local://") or url.startswith("file://"):
+        return _get_store("local")
+    if url.startswith("s3://"):
+        return _get_store("s3")
+    if url.startswith("firestore://"):
+        return _get_store("firestore")
+    raise ValueError(f"Unsupported audio URL format: {url}")
+
+
+async def upload_blob(local_file_path: str, key: str) -> str:
+    return await get_blob_store().upload_file(local_file_path, key)
+
+
+async def upload_blob_stream(chunks: AsyncIterator[bytes], key: str, extension: str) -> str:
+    return await get_blob_store().upload_stream(chunks, key, extension)
+
+
+async def download_blob(url: str, local_file_path: str) -> bool:
+    try:
+        return await get_blob_store_for_url(url).download_file(url, local_file_path)
+    except Exception as e:
+        logger.exception(f"Error downloading blob {url}: {str(e)}")
+        return False
+
+
+async def delete_blob(url: str) -> bool:
+    try:
+        return await get_blob_store_for_url(url).delete(url)
+    except Exception as e:
+        logger.exception(f"Error deleting blob {url}: {str(e)}")
+        return False
+
+
+def iter_blob(url: str, chunk_size: int = BLOB_CHUNK_SIZE,
+              start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+    return get_blob_store_for_url(url).iter_chunks(url, chunk_size, start, end)
+
+
+async def get_blob_metadata(url: str) -> Optional[Dict[str, Any]]:
+    return await get_blob_store_for_url(url).get_metadata(url)
@@ -1,8 +1,12 @@
 import os
 import json
+import uuid
+import asyncio
 import base64
+import shutil
+import hashlib
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 import firebase_admin
 from firebase_admin import credentials, firestore
 from datetime import datetime
@@ -27,6 +31,88 @@ def initialize_firebase_app():
             os.makedirs(os.path.join(os.path.dirname(__file__), '..', 'local_storage'), exist_ok=True)
 
 
+def _get_document_ref(db, firestore_url: str):
+    parts = firestore_url.replace('firestore://', '').split('/')
+
+    if len(parts) == 2:
+        collection_path, document_id = parts
+        return db.collection(collection_path).document(document_id)
+    if len(parts) == 4 and parts[2] == 'segments':
+        collection_path, document_id, _, segment_id = parts
+        return db.collection(collection_path).document(document_id).collection('segments').document(segment_id)
+
+    return None
+
+
+def _chunk_id(index: int, generation: Optional[str] = None) -> str:
+    # Manifest cũ (trước khi có generation) dùng id chỉ gồm số thứ tự
+    if generation:
+        return f"{generation}_{index:06d}"
+    return f"{index:06d}"
+
+
+def _delete_chunks(document_ref, generation: Optional[str], chunk_count: int) -> None:
+    chunks_ref = document_ref.collection('chunks')
+    for index in range(chunk_count):
+        chunks_ref.document(_chunk_id(index, generation)).delete()
+
+
+def _write_chunked(document_ref, local_file_path: str) -> Dict[str, Any]:
+    """Ghi file thành các chunk (subcollection 'chunks') của một generation mới rồi mới chuyển manifest
+    sang generation đó, cuối cùng xóa chunk của generation cũ. Người đang đọc theo manifest cũ không
+    bao giờ gặp chunk đã bị ghi đè. Chỉ giữ một chunk trong bộ nhớ tại mỗi thời điểm."""
+    chunk_size = settings.FIRESTORE_CHUNK_SIZE
+    chunks_ref = document_ref.collection('chunks')
+
+    previous = document_ref.get()
+    previous_manifest = previous.to_dict() if previous.exists else {}
+
+    generation = uuid.uuid4().hex
+    file_hash = hashlib.sha256()
+    chunks = []
+    total_size = 0
+
+    with open(local_file_path, 'rb') as file:
+        while data := file.read(chunk_size):
+            index = len(chunks)
+            checksum = hashlib.sha256(data).hexdigest()
+            chunks_ref.document(_chunk_id(index, generation)).set({
+                'index': index,
+                'data': data,
+                'size': len(data),
+                'sha256': checksum
+            })
+
+            file_hash.update(data)
+            chunks.append({'size': len(data), 'sha256': checksum})
+            total_size += len(data)
+
+    manifest = {
+        'chunked': True,
+        'generation': generation,
+        'chunk_size': chunk_size,
+        'chunk_count': len(chunks),
+        'chunks': chunks,
+        'sha256': file_hash.hexdigest(),
+        'filename': os.path.basename(local_file_path),
+        'content_type': f'audio/{os.path.splitext(local_file_path)[1][1:]}',
+        'size': total_size,
+        'uploaded_at': firestore.SERVER_TIMESTAMP
+    }
+    # Manifest ghi sau cùng để người đọc không thấy file ghi dở
+    document_ref.set(manifest)
+
+    if previous_manifest.get('chunked'):
+        _delete_chunks(document_ref, previous_manifest.get('generation'), previous_manifest.get('chunk_count', 0))
+
+    return manifest
+
+
+def _copy_to_local_storage(local_file_path: str, destination_path: str) -> None:
+    with open(local_file_path, 'rb') as src, open(destination_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, settings.FIRESTORE_CHUNK_SIZE)
+
+
 async def upload_audio_to_firestore(local_file_path: str, collection_path: str, document_id: str) -> str:
     try:
         try:
@@ -37,29 +123,15 @@ async def upload_audio_to_firestore(local_file_path: str, collection_path: str,
                 local_storage_dir = os.path.join(os.path.dirname(__file__), '..', 'local_storage')
                 document_path = os.path.join(local_storage_dir, f"{document_id}.audio")
 
-                with open(local_file_path, 'rb') as src, open(document_path, 'wb') as dst:
-                    dst.write(src.read())
+                _copy_to_local_storage(local_file_path, document_path)
 
                 logger.info(f"File stored locally at: {document_path}")
                 return f"local://{document_path}"
 
             db = firestore.client()
 
-            with open(local_file_path, 'rb') as file:
-                audio_bytes = file.read()
-
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-            audio_data = {
-                'content': audio_base64,
-                'filename': os.path.basename(local_file_path),
-                'content_type': f'audio/{os.path.splitext(local_file_path)[1][1:]}',
-                'size': len(audio_bytes),
-                'uploaded_at': firestore.SERVER_TIMESTAMP
-            }
-
             audio_ref = db.collection(collection_path).document(document_id)
-            audio_ref.set(audio_data)
+            await asyncio.to_thread(_write_chunked, audio_ref, local_file_path)
 
             firestore_url = f"firestore://{collection_path}/{document_id}"
 
@@ -74,8 +146,7 @@ async def upload_audio_to_firestore(local_file_path: str, collection_path: str,
             os.makedirs(local_storage_dir, exist_ok=True)
             document_path = os.path.join(local_storage_dir, f"{document_id}.audio")
 
-            with open(local_file_path, 'rb') as src, open(document_path, 'wb') as dst:
-                dst.write(src.read())
+            _copy_to_local_storage(local_file_path, document_path)
 
             logger.info(f"File stored locally at: {document_path}")
             return f"local://{document_path}"
@@ -97,30 +168,16 @@ async def upload_audio_segment_to_firestore(local_file_path: str, collection_pat
                 os.makedirs(local_storage_dir, exist_ok=True)
                 segment_path = os.path.join(local_storage_dir, f"{segment_id}.audio")
 
-                with open(local_file_path, 'rb') as src, open(segment_path, 'wb') as dst:
-                    dst.write(src.read())
+                _copy_to_local_storage(local_file_path, segment_path)
 
                 logger.info(f"Segment stored locally at: {segment_path}")
                 return f"local://{segment_path}"
 
             db = firestore.client()
 
-            with open(local_file_path, 'rb') as file:
-                audio_bytes = file.read()
-
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-            segment_data = {
-                'content': audio_base64,
-                'filename': os.path.basename(local_file_path),
-                'content_type': f'audio/{os.path.splitext(local_file_path)[1][1:]}',
-                'size': len(audio_bytes),
-                'uploaded_at': firestore.SERVER_TIMESTAMP
-            }
-
             segment_ref = db.collection(collection_path).document(document_id).collection('segments').document(
                 segment_id)
-            segment_ref.set(segment_data)
+            await asyncio.to_thread(_write_chunked, segment_ref, local_file_path)
 
             firestore_url = f"firestore://{collection_path}/{document_id}/segments/{segment_id}"
 
@@ -135,8 +192,7 @@ async def upload_audio_segment_to_firestore(local_file_path: str, collection_pat
             os.makedirs(local_storage_dir, exist_ok=True)
             segment_path = os.path.join(local_storage_dir, f"{segment_id}.audio")
 
-            with open(local_file_path, 'rb') as src, open(segment_path, 'wb') as dst:
-                dst.write(src.read())
+            _copy_to_local_storage(local_file_path, segment_path)
 
             logger.info(f"Segment stored locally at: {segment_path}")
             return f"local://{segment_path}"
@@ -166,23 +222,21 @@ async def delete_audio_from_firestore(firestore_url: str) -> bool:
             logger.warning("Firebase not configured. Cannot delete from Firestore.")
             return False
 
-        parts = firestore_url.replace('firestore://', '').split('/')
-
         db = firestore.client()
 
-        if len(parts) == 2:
-            collection_path, document_id = parts
-            document_ref = db.collection(collection_path).document(document_id)
-            document_ref.delete()
-        elif len(parts) == 4 and parts[2] == 'segments':
-            collection_path, document_id, _, segment_id = parts
-            segment_ref = db.collection(collection_path).document(document_id).collection('segments').document(
-                segment_id)
-            segment_ref.delete()
-        else:
+        document_ref = _get_document_ref(db, firestore_url)
+        if document_ref is None:
             logger.error(f"Invalid Firestore URL format: {firestore_url}")
             return False
 
+        document = await asyncio.to_thread(document_ref.get)
+        if document.exists:
+            manifest = document.to_dict()
+            await asyncio.to_thread(
+                _delete_chunks, document_ref, manifest.get('generation'), manifest.get('chunk_count', 0)
+            )
+        await asyncio.to_thread(document_ref.delete)
+
         logger.info(f"Audio deleted successfully from Firestore: {firestore_url}")
 
         return True
@@ -192,14 +246,61 @@ async def delete_audio_from_firestore(firestore_url: str) -> bool:
         return False
 
 
+async def iter_audio_chunks_from_firestore(firestore_url: str, start: int = 0,
+                                           end: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Đọc lần lượt từng chunk theo manifest, kiểm tra checksum của từng chunk.
+    Với khoảng byte [start, end] chỉ các chunk giao với khoảng đó được tải về.
+    Client Firestore là đồng bộ nên mọi lệnh đọc chạy qua asyncio.to_thread."""
+    initialize_firebase_app()
+
+    db = firestore.client()
+
+    document_ref = _get_document_ref(db, firestore_url)
+    if document_ref is None:
+        raise ValueError(f"Invalid Firestore URL format: {firestore_url}")
+
+    document = await asyncio.to_thread(document_ref.get)
+    if not document.exists:
+        raise FileNotFoundError(f"Audio data not found: {firestore_url}")
+
+    manifest = document.to_dict()
+
+    # Định dạng cũ: toàn bộ file base64 trong một field
+    if not manifest.get('chunked'):
+        if 'content' not in manifest:
+            raise FileNotFoundError(f"Audio data not found or invalid: {firestore_url}")
+        audio_bytes = base64.b64decode(manifest['content'])
+        yield audio_bytes[start:None if end is None else end + 1]
+        return
+
+    if end is None:
+        end = manifest['size'] - 1
+
+    chunk_size = manifest['chunk_size']
+    generation = manifest.get('generation')
+    chunks_ref = document_ref.collection('chunks')
+
+    for index in range(start // chunk_size, min(end // chunk_size + 1, manifest['chunk_count'])):
+        chunk_info = manifest['chunks'][index]
+        chunk = await asyncio.to_thread(chunks_ref.document(_chunk_id(index, generation)).get)
+        if not chunk.exists:
+            raise IOError(f"Missing chunk {index} of {firestore_url}")
+
+        data = chunk.to_dict()['data']
+        if len(data) != chunk_info['size'] or hashlib.sha256(data).hexdigest() != chunk_info['sha256']:
+            raise IOError(f"Checksum mismatch in chunk {index} of {firestore_url}")
+
+        chunk_start = index * chunk_size
+        yield data[max(start - chunk_start, 0):end - chunk_start + 1]
+
+
 async def download_audio_from_firestore(firestore_url: str, local_file_path: str) -> bool:
     if firestore_url.startswith("local://") or firestore_url.startswith("file://"):
         source_path = firestore_url.replace("local://", "").replace("file://", "")
         try:
             os.makedirs(os.path.dirname(os.path.abspath(local_file_path)), exist_ok=True)
             if os.path.exists(source_path):
-                with open(source_path, 'rb') as src, open(local_file_path, 'wb') as dst:
-                    dst.write(src.read())
+                _copy_to_local_storage(source_path, local_file_path)
                 logger.info(f"Copied local file from {source_path} to {local_file_path}")
                 return True
             else:
@@ -210,45 +311,16 @@ async def download_audio_from_firestore(firestore_url: str, local_file_path: str
             return False
 
     try:
-        initialize_firebase_app()
-
         service_account_path = os.path.join(os.path.dirname(__file__), '..', 'service-account.json')
         if not os.path.exists(service_account_path):
             logger.warning("Firebase not configured. Cannot download from Firestore.")
             return False
 
-        parts = firestore_url.replace('firestore://', '').split('/')
-
-        db = firestore.client()
-
-        audio_data = None
-
-        if len(parts) == 2:
-            collection_path, document_id = parts
-            document_ref = db.collection(collection_path).document(document_id)
-            document = document_ref.get()
-            if document.exists:
-                audio_data = document.to_dict()
-        elif len(parts) == 4 and parts[2] == 'segments':
-            collection_path, document_id, _, segment_id = parts
-            segment_ref = db.collection(collection_path).document(document_id).collection('segments').document(
-                segment_id)
-            segment = segment_ref.get()
-            if segment.exists:
-                audio_data = segment.to_dict()
-        else:
-            logger.error(f"Invalid Firestore URL format: {firestore_url}")
-            return False
-
-        if not audio_data or 'content' not in audio_data:
-            logger.error(f"Audio data not found or invalid: {firestore_url}")
-            return False
-
         os.makedirs(os.path.dirname(os.path.abspath(local_file_path)), exist_ok=True)
 
-        audio_bytes = base64.b64decode(audio_data['content'])
         with open(local_file_path, 'wb') as file:
-            file.write(audio_bytes)
+            async for data in iter_audio_chunks_from_firestore(firestore_url):
+                await asyncio.to_thread(file.write, data)
 
         logger.info(f"Audio downloaded successfully from Firestore to: {local_file_path}")
 
@@ -287,29 +359,16 @@ async def get_audio_metadata_from_firestore(firestore_url: str) -> Optional[Dict
             logger.warning("Firebase not configured. Cannot get metadata from Firestore.")
             return None
 
-        parts = firestore_url.replace('firestore://', '').split('/')
-
         db = firestore.client()
 
-        audio_data = None
-
-        if len(parts) == 2:
-            collection_path, document_id = parts
-            document_ref = db.collection(collection_path).document(document_id)
-            document = document_ref.get()
-            if document.exists:
-                audio_data = document.to_dict()
-        elif len(parts) == 4 and parts[2] == 'segments':
-            collection_path, document_id, _, segment_id = parts
-            segment_ref = db.collection(collection_path).document(document_id).collection('segments').document(
-                segment_id)
-            segment = segment_ref.get()
-            if segment.exists:
-                audio_data = segment.to_dict()
-        else:
+        document_ref = _get_document_ref(db, firestore_url)
+        if document_ref is None:
             logger.error(f"Invalid Firestore URL format: {firestore_url}")
             return None
 
+        document = await asyncio.to_thread(document_ref.get)
+        audio_data = document.to_dict() if document.exists else None
+
         if not audio_data:
             logger.error(f"Audio data not found: {firestore_url}")
             return None
@@ -320,4 +379,4 @@ async def get_audio_metadata_from_firestore(firestore_url: str) -> Optional[Dict
 
     except Exception as e:
         logger.exception(f"Error getting audio metadata from Firestore: {str(e)}")
-        return None
\ No newline at end of file
+        return None
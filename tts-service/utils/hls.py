@@ -0,0 +1,121 @@
+import math
+import hashlib
+import struct
+from typing import Callable, List, Optional
+
+from models.audio import AudioSegment
+
+# HLS (packed audio): nhóm các segment theo câu thành media segment khoảng HLS_TARGET_DURATION giây
+
+HLS_PLAYLIST_MEDIA_TYPE = "application/vnd.apple.mpegurl"
+HLS_SEGMENT_MEDIA_TYPES = {"aac": "audio/aac", "mp3": "audio/mpeg"}
+# Định dạng audio có thể cắt trực tiếp thành media segment (luồng frame MP3 / AAC ADTS)
+HLS_SLICEABLE_FORMATS = ("mp3", "aac")
+
+
+class HLSGroup:
+    __slots__ = ("index", "start_time", "duration", "segment_indices", "key", "extension")
+
+    def __init__(self, index: int, start_time: float, duration: float, segment_indices: List[int], key: str,
+                 extension: str):
+        self.index = index
+        self.start_time = start_time
+        self.duration = duration
+        self.segment_indices = segment_indices
+        self.key = key
+        self.extension = extension
+
+
+def hls_segment_extension(audio_format: str, continuous: bool = False) -> str:
+    """continuous: media segment được cắt từ file MP3/AAC đã mã hóa liên tục nên giữ định dạng gốc.
+    Ngược lại mỗi nhóm được mã hóa riêng và luôn dùng MP3: AAC mã hóa riêng có priming ở đầu mỗi
+    segment gây khoảng lặng nghe được, MP3 vẫn có encoder delay nhưng ngắn hơn."""
+    return audio_format if continuous else "mp3"
+
+
+def playlist_target_duration(target_duration: float) -> int:
+    """#EXT-X-TARGETDURATION không được đổi giữa các lần tải lại playlist nên là hằng số tính từ cấu hình;
+    group_segments không tạo nhóm nhiều câu dài hơn giá trị này"""
+    return math.ceil(target_duration * 1.5)
+
+
+def _group_key(segments: List[AudioSegment], indices: List[int], start_time: float, extension: str,
+               continuous: bool) -> str:
+    payload = "\0".join(
+        [extension, "continuous" if continuous else "encoded", f"{start_time:.3f}"]
+        + [segments[i].content_hash or segments[i].url for i in indices]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def group_segments(segments: List[AudioSegment], target_duration: float, audio_format: str,
+                   complete: bool = True, continuous: bool = False) -> List[HLSGroup]:
+    """Gộp các câu liên tiếp thành nhóm khoảng target_duration giây. Khi job chưa xong (complete=False),
+    nhóm cuối chưa đủ thời lượng bị bỏ qua vì còn có thể nhận thêm câu. Khóa nhóm phân biệt segment cắt
+    từ file liên tục với segment mã hóa riêng nên URL đã cache của hai loại không lẫn nhau."""
+    extension = hls_segment_extension(audio_format, continuous)
+    max_duration = playlist_target_duration(target_duration)
+    groups = []
+    current: List[int] = []
+    start_time = 0.0
+    duration = 0.0
+
+    def close_group():
+        groups.append(HLSGroup(len(groups), start_time, duration, current,
+                               _group_key(segments, current, start_time, extension, continuous), extension))
+
+    for i, segment in enumerate(segments):
+        segment_duration = segment.end_time - segment.start_time
+
+        # Đóng nhóm trước khi vượt quá target nếu nhóm đã đủ một nửa, và luôn đóng trước khi vượt TARGETDURATION
+        grown = duration + segment_duration
+        if current and (grown > max_duration or (grown > target_duration and duration >= target_duration / 2)):
+            close_group()
+            current = []
+
+        if not current:
+            start_time = segment.start_time
+            duration = 0.0
+        current.append(i)
+        duration += segment_duration
+
+    if current and (complete or duration >= target_duration):
+        close_group()
+
+    return groups
+
+
+def render_playlist(groups: List[HLSGroup], target_duration: float, complete: bool = True,
+                    segment_uri: Optional[Callable[[str], str]] = None) -> str:
+    """Media playlist với URI tương đối tới endpoint hls/{index}_{key}.{ext};
+    segment_uri nhận tên segment và trả về URI (ví dụ kèm chữ ký).
+    target_duration là giá trị đã truyền cho group_segments, giống nhau cho EVENT và VOD."""
+    target = playlist_target_duration(target_duration)
+
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        f"#EXT-X-PLAYLIST-TYPE:{'VOD' if complete else 'EVENT'}",
+    ]
+    for group in groups:
+        lines.append(f"#EXTINF:{group.duration:.3f},")
+        name = f"{group.index}_{group.key}.{group.extension}"
+        lines.append(segment_uri(name) if segment_uri else f"hls/{name}")
+    if complete:
+        lines.append("#EXT-X-ENDLIST")
+
+    return "\n".join(lines) + "\n"
+
+
+def _synchsafe(value: int) -> bytes:
+    return bytes([(value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F])
+
+
+def id3_timestamp_tag(start_time: float) -> bytes:
+    """Tag ID3 PRIV bắt buộc ở đầu mỗi packed audio segment, chứa PTS 90kHz của mẫu đầu tiên"""
+    pts = int(round(start_time * 90000)) & ((1 << 33) - 1)
+    data = b"com.apple.streaming.transportStreamTimestamp\x00" + struct.pack(">Q", pts)
+    frame = b"PRIV" + _synchsafe(len(data)) + b"\x00\x00" + data
+    return b"ID3\x04\x00\x00" + _synchsafe(len(frame)) + frame
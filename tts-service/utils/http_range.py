@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Tuple
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Phân tích header Range dạng bytes=start-end, bytes=start- hoặc bytes=-suffix.
+    Trả về (start, end) (end tính cả byte cuối), None nếu không có/không hỗ trợ (trả cả file)."""
+    if not range_header:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not ranges:
+        return None
+
+    # Nhiều khoảng (multipart/byteranges) không được hỗ trợ, trả cả file theo RFC 9110
+    if "," in ranges:
+        return None
+
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text == "":
+            suffix_length = int(end_text)
+            if suffix_length <= 0:
+                raise RangeNotSatisfiable()
+            start = max(0, size - suffix_length)
+            end = size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+
+    return start, min(end, size - 1)
+
+
+def quote_etag(etag: str) -> str:
+    return etag if etag.startswith('"') or etag.startswith('W/') else f'"{etag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # So sánh yếu: bỏ qua tiền tố W/
+    normalized = quote_etag(etag).removeprefix("W/")
+    return any(tag.removeprefix("W/") == normalized for tag in candidates)
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
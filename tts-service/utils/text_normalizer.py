@@ -0,0 +1,140 @@
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Match, Tuple, Union
+
+# Ký hiệu được đọc thành chữ
+SYMBOL_RULES: Dict[str, str] = {
+    "&": " và ",
+    "%": " phần trăm ",
+}
+
+# Viết tắt có dấu chấm không phải ranh giới câu, ánh xạ sang dạng chuẩn.
+# Dạng chuẩn cũng phải là một khóa của bảng (dùng để nhận ra viết tắt sau khi đã chuẩn hóa).
+ABBREVIATION_RULES: Dict[str, str] = {
+    "TS.": "TS.",
+    "ThS.": "ThS.",
+    "PGS.": "PGS.",
+    "GS.": "GS.",
+    "T.S.": "TS.",
+    "Th.S.": "ThS.",
+}
+
+# Quy tắc đọc số, áp dụng lần lượt trên từng cụm số (chữ số xen dấu chấm/phẩy)
+NUMBER_RULES: List[Tuple[str, Union[str, Callable[[Match], str]]]] = [
+    # Số thập phân
+    (r"(\d+)\.(\d+)", r"\1 phẩy \2"),
+    # Phân cách hàng nghìn
+    (r"(\d{1,3}(,\d{3})+)", lambda match: match.group(1).replace(",", " ")),
+]
+
+# Bỏ khoảng trắng trước dấu câu đóng và sau dấu ngoặc mở
+CLOSING_PUNCTUATION = ".,;:!?)"
+OPENING_BRACKETS = "({["
+# Văn bản kết thúc bằng ký tự khác các ký tự này được thêm dấu chấm
+TERMINAL_CHARACTERS = ".!?:;,)]}"
+# Khoảng trắng sau các dấu này là ranh giới câu
+SENTENCE_TERMINATORS = ".!?:"
+
+
+def _character_class(characters: str) -> str:
+    return "[" + "".join(re.escape(c) for c in characters) + "]"
+
+
+class TextNormalizer:
+    """Chuẩn hóa văn bản cho TTS bằng một lần quét với regex biên dịch sẵn từ các bảng quy tắc,
+    kết quả giống hệt chuỗi re.sub/str.replace của text_processor.preprocess_text.
+
+    Chỉ những vị trí cần thay đổi mới khớp regex (khoảng trắng thừa, khoảng trắng cạnh dấu câu,
+    cụm số, ký hiệu) nên đoạn văn bản thông thường được quét hoàn toàn trong C."""
+
+    def __init__(self, symbols: Dict[str, str] = SYMBOL_RULES,
+                 abbreviations: Dict[str, str] = ABBREVIATION_RULES,
+                 number_rules: List[Tuple[str, Union[str, Callable[[Match], str]]]] = NUMBER_RULES):
+        self.symbols = dict(symbols)
+        self.abbreviations = dict(abbreviations)
+        self.number_rules = [(re.compile(pattern), replacement) for pattern, replacement in number_rules]
+
+        closing = _character_class(CLOSING_PUNCTUATION)
+        opening = _character_class(OPENING_BRACKETS)
+        alternatives = [
+            # Ngoặc mở và khoảng trắng ngay sau nó (khoảng trắng bị bỏ)
+            rf"(?P<open>{opening})\s+",
+            # Khoảng trắng trước dấu câu đóng (bị bỏ)
+            rf"(?P<drop>\s+(?={closing}))",
+            # Khoảng trắng cần gộp thành một dấu cách (nhiều ký tự, hoặc tab/xuống dòng...)
+            r"(?P<space>\s{2,}|[^\S ])",
+            # Cụm số; khoảng trắng trước dấu chấm/phẩy bên trong sẽ bị bỏ nên thuộc cùng cụm
+            r"(?P<number>\d(?:[\d.,]|\s+(?=[.,]))*)",
+        ]
+        first_characters = r"\s\d" + "".join(re.escape(c) for c in OPENING_BRACKETS)
+        if self.symbols:
+            symbol_pattern = "|".join(re.escape(s) for s in sorted(self.symbols, key=len, reverse=True))
+            alternatives.append(rf"(?P<symbol>{symbol_pattern})")
+            first_characters += "".join(re.escape(s[0]) for s in self.symbols)
+        # Lookahead theo ký tự đầu giúp bỏ qua nhanh các vị trí không thể khớp
+        self._token_re = re.compile(rf"(?=[{first_characters}])(?:{'|'.join(alternatives)})")
+        self._whitespace_re = re.compile(r"\s+")
+        # Cache theo từng instance: cụm số lặp lại nhiều trong một văn bản dài
+        self._normalize_number = lru_cache(maxsize=4096)(self._apply_number_rules)
+
+        # Tách câu: chuẩn hóa viết tắt rồi tách tại khoảng trắng sau dấu kết thúc câu,
+        # trừ khi dấu chấm đó thuộc một viết tắt
+        abbreviation_pattern = "|".join(
+            re.escape(a) for a in sorted(self.abbreviations, key=len, reverse=True)
+        )
+        self._abbreviation_re = re.compile(abbreviation_pattern) if self.abbreviations else None
+        not_abbreviation = "".join(
+            rf"(?<!{re.escape(a)})" for a in set(self.abbreviations.values())
+        )
+        self._boundary_re = re.compile(
+            rf"(?<={_character_class(SENTENCE_TERMINATORS)}){not_abbreviation}\s+"
+        )
+
+    def _replace_token(self, match: Match) -> str:
+        kind = match.lastgroup
+        if kind == "drop":
+            return ""
+        if kind == "space":
+            return " "
+        if kind == "open":
+            return match.group("open")
+        if kind == "symbol":
+            return self.symbols[match.group()]
+
+        number = match.group()
+        if "." not in number and "," not in number:
+            return number
+        return self._normalize_number(number)
+
+    def _apply_number_rules(self, number: str) -> str:
+        number = self._whitespace_re.sub("", number)
+        for pattern, replacement in self.number_rules:
+            number = pattern.sub(replacement, number)
+        return number
+
+    def normalize(self, text: str) -> str:
+        # Khoảng trắng đầu/cuối luôn bị bỏ, ký tự cuối quyết định có thêm dấu chấm hay không
+        text = text.strip()
+        result = self._token_re.sub(self._replace_token, text)
+        if text and text[-1] not in TERMINAL_CHARACTERS:
+            result += "."
+        return result.strip()
+
+    def _replace_abbreviation(self, match: Match) -> str:
+        return self.abbreviations[match.group()]
+
+    def split_sentences(self, text: str) -> List[str]:
+        if self._abbreviation_re is not None:
+            text = self._abbreviation_re.sub(self._replace_abbreviation, text)
+        return self._boundary_re.split(text)
+
+
+default_normalizer = TextNormalizer()
+
+
+def normalize_text(text: str) -> str:
+    return default_normalizer.normalize(text)
+
+
+def split_sentences(text: str) -> List[str]:
+    return default_normalizer.split_sentences(text)
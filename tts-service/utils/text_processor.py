@@ -4,6 +4,8 @@ from typing import List, Dict, Any, Optional
 import nltk
 from nltk.tokenize import sent_tokenize
 
+from utils.text_normalizer import normalize_text, split_sentences
+
 # Tải các model cần thiết cho NLTK (nếu cần)
 try:
     nltk.data.find('tokenizers/punkt')
@@ -14,55 +16,8 @@ logger = logging.getLogger(__name__)
 
 
 def preprocess_text(text: str) -> str:
-    text = re.sub(r'\s+', ' ', text)
-
-    # Chuẩn hóa dấu câu
-    text = re.sub(r'\s+([.,;:!?)])', r'\1', text)  # Loại bỏ khoảng trắng trước dấu câu
-    text = re.sub(r'([({[])(\s+)', r'\1', text)  # Loại bỏ khoảng trắng sau dấu ngoặc mở
-
-    # Chuẩn hóa dòng mới
-    text = re.sub(r'\n+', '\n', text)
-
-    # Thêm dấu chấm vào các câu không có dấu kết thúc
-    text = add_missing_periods(text)
-
-    # Thay thế một số ký tự đặc biệt
-    text = text.replace('&', ' và ')
-    text = text.replace('%', ' phần trăm ')
-
-    # Chuẩn hóa số
-    text = normalize_numbers(text)
-
-    # Chuẩn hóa trích dẫn
-    text = re.sub(r'"([^"]*)"', r'"\1"', text)
-
-    return text.strip()
-
-
-def add_missing_periods(text: str) -> str:
-    lines = text.split('\n')
-    processed_lines = []
-
-    for line in lines:
-        line = line.strip()
-        if line and not line[-1] in ['.', '!', '?', ':', ';', ',', ')', ']', '}']:
-            line += '.'
-        processed_lines.append(line)
-
-    return '\n'.join(processed_lines)
-
-
-def normalize_numbers(text: str) -> str:
-    # Chuẩn hóa số thập phân
-    text = re.sub(r'(\d+)\.(\d+)', r'\1 phẩy \2', text)
-
-    # Chuẩn hóa phân cách hàng nghìn
-    def replace_thousands(match):
-        return match.group(1).replace(',', ' ')
-
-    text = re.sub(r'(\d{1,3}(,\d{3})+)', replace_thousands, text)
-
-    return text
+    """Chuẩn hóa khoảng trắng, dấu câu, ký hiệu và số (xem utils.text_normalizer để biết bảng quy tắc)"""
+    return normalize_text(text)
 
 
 def split_text_into_chunks(text: str, chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -195,25 +150,8 @@ def analyze_vietnamese_text(text: str) -> List[Dict[str, Any]]:
 
 
 def split_into_sentences_vi(text: str) -> List[str]:
-
-    text = text.replace('TS.', 'TS_PLACEHOLDER')
-    text = text.replace('ThS.', 'THS_PLACEHOLDER')
-    text = text.replace('PGS.', 'PGS_PLACEHOLDER')
-    text = text.replace('GS.', 'GS_PLACEHOLDER')
-    text = text.replace('T.S.', 'TS_PLACEHOLDER')
-    text = text.replace('Th.S.', 'THS_PLACEHOLDER')
-
-    sentences = re.split(r'(?<=[.!?:])\s+', text)
-
-    result = []
-    for sentence in sentences:
-        sentence = sentence.replace('TS_PLACEHOLDER', 'TS.')
-        sentence = sentence.replace('THS_PLACEHOLDER', 'ThS.')
-        sentence = sentence.replace('PGS_PLACEHOLDER', 'PGS.')
-        sentence = sentence.replace('GS_PLACEHOLDER', 'GS.')
-        result.append(sentence)
-
-    return result
+    # Không tách sau các viết tắt trong ABBREVIATION_RULES (TS., ThS., PGS., GS., ...)
+    return split_sentences(text)
 
 
 def split_long_sentence_vi(sentence: str) -> List[str]:
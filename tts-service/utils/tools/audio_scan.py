@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, '/app')
+
+from utils.audio_utils import extract_audio_features
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger("audio-scan")
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.aac', '.ogg', '.m4a')
+
+
+def scan(root_dir: str, loudness: bool):
+    started = time.monotonic()
+    total_files = 0
+    total_duration = 0.0
+
+    for root, _, files in os.walk(root_dir):
+        for filename in sorted(files):
+            if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+
+            path = os.path.join(root, filename)
+            features = extract_audio_features(path, loudness=loudness)
+            if not features:
+                logger.error(f"Could not read {path}")
+                continue
+
+            total_files += 1
+            total_duration += features["duration"]
+            loudness_info = f", {features['dBFS']:.1f} dBFS" if "dBFS" in features else ""
+            logger.info(f"{path}: {features['duration']:.2f}s, {features['frame_rate']}Hz, "
+                        f"{features['channels']}ch{loudness_info}")
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Scanned {total_files} files ({total_duration / 3600:.2f} hours of audio) in {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan audio files and print their metadata")
+    parser.add_argument("root_dir", nargs="?", default="/app/local_storage", help="Directory to scan")
+    parser.add_argument("--loudness", action="store_true", help="Estimate loudness from sampled windows")
+    args = parser.parse_args()
+
+    scan(args.root_dir, args.loudness)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import re
+import sys
+import time
+import random
+import argparse
+import logging
+
+sys.path.insert(0, '/app')
+
+from utils.text_normalizer import normalize_text, split_sentences
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger("text-normalizer-bench")
+
+SAMPLE_PARAGRAPHS = [
+    "Buổi sáng hôm ấy trời trong xanh, gió nhẹ thổi qua những hàng cây ven đường. Cô bé bước chậm rãi đến trường, "
+    "trong lòng vẫn còn nghĩ về câu chuyện mà bà đã kể tối hôm trước.",
+    "Ông lão ngồi bên hiên nhà, nhìn ra cánh đồng lúa đang vào mùa gặt. Những ký ức xa xưa lần lượt hiện về, "
+    "rõ ràng như mới hôm qua!",
+    "Năm 2023, doanh thu đạt 1,234,567 đồng , tăng 12.5% so với năm trước ( theo báo cáo ).",
+    "PGS. Nguyễn Văn A và TS. Trần Thị B đã trình bày tại hội thảo; Th.S. Lê C cũng tham dự",
+    "Xin chào!   Đây là bài kiểm tra hệ thống\tchuyển đổi văn bản thành giọng nói.",
+    "Công ty R&D có 3.14 triệu người dùng , GS. Phạm D nói: \"Chúng tôi sẽ mở rộng \"",
+    "Chương 1 .5 : Mở đầu [ phần A ] và { phụ lục }",
+]
+
+# Bảng chữ cái cho fuzz: tập trung vào các ký tự mà quy tắc chuẩn hóa xử lý
+FUZZ_ALPHABET = list("0123456789.,;:!?()[]{}&%\"'TShGPabcxyzđươ") + [" ", " ", "  ", "\n", "\t", " "]
+
+
+# Bản gốc của text_processor trước khi chuyển sang TextNormalizer, giữ lại để so sánh kết quả và tốc độ
+def legacy_preprocess_text(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s+([.,;:!?)])', r'\1', text)
+    text = re.sub(r'([({[])(\s+)', r'\1', text)
+    text = re.sub(r'\n+', '\n', text)
+
+    lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line and not line[-1] in ['.', '!', '?', ':', ';', ',', ')', ']', '}']:
+            line += '.'
+        lines.append(line)
+    text = '\n'.join(lines)
+
+    text = text.replace('&', ' và ')
+    text = text.replace('%', ' phần trăm ')
+
+    text = re.sub(r'(\d+)\.(\d+)', r'\1 phẩy \2', text)
+    text = re.sub(r'(\d{1,3}(,\d{3})+)', lambda m: m.group(1).replace(',', ' '), text)
+
+    text = re.sub(r'"([^"]*)"', r'"\1"', text)
+
+    return text.strip()
+
+
+def legacy_split_into_sentences_vi(text: str):
+    text = text.replace('TS.', 'TS_PLACEHOLDER')
+    text = text.replace('ThS.', 'THS_PLACEHOLDER')
+    text = text.replace('PGS.', 'PGS_PLACEHOLDER')
+    text = text.replace('GS.', 'GS_PLACEHOLDER')
+    text = text.replace('T.S.', 'TS_PLACEHOLDER')
+    text = text.replace('Th.S.', 'THS_PLACEHOLDER')
+
+    result = []
+    for sentence in re.split(r'(?<=[.!?:])\s+', text):
+        sentence = sentence.replace('TS_PLACEHOLDER', 'TS.')
+        sentence = sentence.replace('THS_PLACEHOLDER', 'ThS.')
+        sentence = sentence.replace('PGS_PLACEHOLDER', 'PGS.')
+        sentence = sentence.replace('GS_PLACEHOLDER', 'GS.')
+        result.append(sentence)
+    return result
+
+
+def fuzz(iterations: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+
+    for _ in range(iterations):
+        if rng.random() < 0.5:
+            text = "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 60)))
+        else:
+            text = " ".join(rng.choice(SAMPLE_PARAGRAPHS + FUZZ_ALPHABET) for _ in range(rng.randint(1, 8)))
+
+        expected = legacy_preprocess_text(text)
+        actual = normalize_text(text)
+        if actual != expected:
+            failures += 1
+            logger.error(f"preprocess mismatch for {text!r}: {actual!r} != {expected!r}")
+
+        expected_sentences = legacy_split_into_sentences_vi(text)
+        actual_sentences = split_sentences(text)
+        if actual_sentences != expected_sentences:
+            failures += 1
+            logger.error(f"split mismatch for {text!r}: {actual_sentences!r} != {expected_sentences!r}")
+
+    return failures
+
+
+def build_text(size_mb: float, seed: int) -> str:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    paragraphs = []
+    length = 0
+
+    while length < target:
+        paragraph = " ".join(rng.choice(SAMPLE_PARAGRAPHS) for _ in range(rng.randint(1, 6)))
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 1
+
+    return "\n".join(paragraphs)
+
+
+def measure(name: str, function, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - started)
+
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+    logger.info(f"{name}: {best * 1000:.1f} ms ({size_mb / best:.1f} MB/s)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare and benchmark the text normalizer against the legacy passes")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="Size of the generated text")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Number of random texts to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = fuzz(args.fuzz, args.seed)
+    logger.info(f"Fuzz: {args.fuzz} texts, {failures} mismatches")
+
+    text = build_text(args.size_mb, args.seed)
+    if normalize_text(text) != legacy_preprocess_text(text):
+        failures += 1
+        logger.error("Output differs from the legacy implementation on the benchmark text")
+
+    legacy = measure("legacy preprocess_text", legacy_preprocess_text, text, args.repeat)
+    current = measure("TextNormalizer.normalize", normalize_text, text, args.repeat)
+    logger.info(f"preprocess speedup: {legacy / current:.2f}x")
+
+    paragraphs = text.split("\n")
+    legacy = measure("legacy split_into_sentences_vi", lambda t: [legacy_split_into_sentences_vi(p) for p in paragraphs], text, args.repeat)
+    current = measure("TextNormalizer.split_sentences", lambda t: [split_sentences(p) for p in paragraphs], text, args.repeat)
+    logger.info(f"sentence split speedup: {legacy / current:.2f}x")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import asyncio
+import signal
+
+from core.config import settings
+from core.logging import setup_logging
+from db.mongodb import connect_to_mongo, close_mongo_connection, ensure_indexes, get_database
+from services.tts.http_session import open_http_session, close_http_session
+from services.tts.tts_factory import start_tts_health_checks, stop_tts_health_checks
+from services.job_worker import JobWorker
+
+# Thiết lập logging
+logger = setup_logging()
+
+
+async def main():
+    await connect_to_mongo()
+    await ensure_indexes()
+    await open_http_session()
+    await start_tts_health_checks()
+
+    worker = JobWorker(get_database(), settings.JOB_WORKER_CONCURRENCY)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await stop_tts_health_checks()
+        await close_http_session()
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    # Chạy nhiều tiến trình/container worker để mở rộng, hàng đợi MongoDB đảm bảo mỗi job chỉ một worker nhận
+    asyncio.run(main())
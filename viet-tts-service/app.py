@@ -1,9 +1,14 @@
 import os
+import asyncio
+import struct
 import tempfile
 import logging
 import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 import uuid
@@ -23,6 +28,119 @@ app.mount("/static", StaticFiles(directory="/tmp/viet_tts_output"), name="static
 
 os.makedirs("/tmp/viet_tts_output", exist_ok=True)
 
+# Số process giữ model trong bộ nhớ; 0 = chạy CLI viettts cho mỗi request như cũ
+VIETTTS_WORKERS = int(os.getenv("VIETTTS_WORKERS", "1"))
+VIETTTS_MODEL_DIR = os.getenv("VIETTTS_MODEL_DIR", "pretrained-models")
+VIETTTS_VOICE_DIR = os.getenv("VIETTTS_VOICE_DIR", "samples")
+VIETTTS_SPEED = float(os.getenv("VIETTTS_SPEED", "1.0"))
+VIETTTS_MAX_BATCH_SIZE = int(os.getenv("VIETTTS_MAX_BATCH_SIZE", "64"))
+
+# Mỗi frame của /synthesize/batch: index (uint32), status (uint8, 0 = ok, 1 = lỗi), độ dài (uint32), dữ liệu
+BATCH_FRAME_HEADER = struct.Struct(">IBI")
+BATCH_FRAME_OK = 0
+BATCH_FRAME_ERROR = 1
+BATCH_MEDIA_TYPE = "application/x-viettts-frames"
+
+_worker_pool: Optional[ProcessPoolExecutor] = None
+
+# Trạng thái bên trong mỗi worker process (model chỉ nạp một lần khi process khởi động)
+_worker_tts = None
+_worker_voices = {}
+_worker_prompts = {}
+
+
+def _init_worker(model_dir: str, voice_dir: str) -> None:
+    global _worker_tts, _worker_voices
+    from viettts.tts import TTS
+    from viettts.utils.file_utils import load_voices
+
+    _worker_tts = TTS(model_dir=model_dir)
+    _worker_voices = load_voices(voice_dir)
+    logging.getLogger("viet-tts-worker").info(f"Worker {os.getpid()} đã nạp model từ {model_dir}")
+
+
+def _resolve_voice_file(voice: str) -> str:
+    if os.path.exists(voice):
+        return voice
+    if voice.isdigit():
+        voice_files = list(_worker_voices.values())
+        return voice_files[int(voice) % len(voice_files)]
+    if voice in _worker_voices:
+        return _worker_voices[voice]
+    raise ValueError(f"Unknown voice: {voice}")
+
+
+def _synthesize_in_worker(text: str, voice: str, output_path: str) -> str:
+    from viettts.utils.file_utils import load_prompt_speech_from_file
+
+    voice_file = _resolve_voice_file(voice)
+    prompt_speech_16k = _worker_prompts.get(voice_file)
+    if prompt_speech_16k is None:
+        prompt_speech_16k = load_prompt_speech_from_file(filepath=voice_file, target_sr=16000)
+        _worker_prompts[voice_file] = prompt_speech_16k
+
+    _worker_tts.tts_to_file(text, prompt_speech_16k, VIETTTS_SPEED, output_path)
+    return output_path
+
+
+async def _synthesize_with_cli(text: str, voice: str, output_path: str) -> None:
+    process = await asyncio.create_subprocess_exec(
+        "viettts", "synthesis",
+        "--text", text,
+        "--voice", voice,
+        "--output", output_path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        raise Exception(f"Error in viettts CLI: {stderr.decode('utf-8', errors='replace')}")
+
+
+async def run_synthesis(text: str, voice: str, output_path: str) -> None:
+    """Gửi yêu cầu tới worker pool (model đã nạp sẵn); quay về CLI nếu pool không dùng được"""
+    global _worker_pool
+
+    if _worker_pool is not None:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(_worker_pool, _synthesize_in_worker, text, voice, output_path)
+            return
+        except BrokenProcessPool as e:
+            logger.error(f"Worker pool bị lỗi, chuyển sang chế độ CLI: {str(e)}")
+            _worker_pool.shutdown(wait=False, cancel_futures=True)
+            _worker_pool = None
+
+    await _synthesize_with_cli(text, voice, output_path)
+
+
+@app.on_event("startup")
+async def start_worker_pool():
+    global _worker_pool
+
+    if VIETTTS_WORKERS <= 0:
+        logger.info("VIETTTS_WORKERS=0, sử dụng viettts CLI cho mỗi request")
+        return
+
+    # spawn thay vì fork để mỗi worker tự khởi tạo torch/onnxruntime
+    _worker_pool = ProcessPoolExecutor(
+        max_workers=VIETTTS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(VIETTTS_MODEL_DIR, VIETTTS_VOICE_DIR)
+    )
+    logger.info(f"Đã khởi tạo {VIETTTS_WORKERS} VietTTS worker")
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    global _worker_pool
+
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=True, cancel_futures=True)
+        _worker_pool = None
+
 
 class TTSRequest(BaseModel):
     text: str
@@ -31,6 +149,12 @@ class TTSRequest(BaseModel):
     return_url: bool = False
 
 
+class BatchTTSRequest(BaseModel):
+    texts: List[str]
+    voice: str = "0"
+    output_format: str = "wav"
+
+
 class Voice(BaseModel):
     id: str
     name: str
@@ -52,7 +176,12 @@ async def health_check():
             text=True,
             check=True
         )
-        return {"status": "healthy", "message": "VietTTS CLI is available"}
+        return {
+            "status": "healthy",
+            "message": "VietTTS CLI is available",
+            "mode": "worker_pool" if _worker_pool is not None else "cli",
+            "workers": VIETTTS_WORKERS if _worker_pool is not None else 0
+        }
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Service unhealthy: {str(e)}")
@@ -117,21 +246,7 @@ async def synthesize_text(request: TTSRequest, background_tasks: BackgroundTasks
 
         logger.info(f"Đang tổng hợp văn bản: '{request.text[:50]}...' với giọng {request.voice}")
 
-        cmd = [
-            "viettts", "synthesis",
-            "--text", request.text,
-            "--voice", request.voice,
-            "--output", output_path
-        ]
-
-        process = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True
-        )
-
-        if process.returncode != 0:
-            raise Exception(f"Error in viettts CLI: {process.stderr}")
+        await run_synthesis(request.text, request.voice, output_path)
 
         logger.info(f"Đã tạo file âm thanh: {output_path}")
 
@@ -163,12 +278,66 @@ async def synthesize_text(request: TTSRequest, background_tasks: BackgroundTasks
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/synthesize/batch")
+async def synthesize_batch(request: BatchTTSRequest):
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="texts must not be empty")
+    if len(request.texts) > VIETTTS_MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many texts in one batch (max {VIETTTS_MAX_BATCH_SIZE})"
+        )
+
+    logger.info(f"Đang tổng hợp batch {len(request.texts)} câu với giọng {request.voice}")
+
+    batch_id = str(uuid.uuid4())
+    output_paths = [
+        f"/tmp/viet_tts_output/{batch_id}_{i}.{request.output_format}" for i in range(len(request.texts))
+    ]
+
+    # Tất cả câu được đưa vào hàng đợi của worker pool ngay, kết quả trả về theo đúng thứ tự
+    semaphore = asyncio.Semaphore(max(1, VIETTTS_WORKERS) * 2)
+
+    async def synthesize_one(i: int) -> None:
+        async with semaphore:
+            await run_synthesis(request.texts[i], request.voice, output_paths[i])
+
+    tasks = [asyncio.create_task(synthesize_one(i)) for i in range(len(request.texts))]
+
+    async def iter_frames():
+        try:
+            for i, task in enumerate(tasks):
+                try:
+                    await task
+                    with open(output_paths[i], "rb") as f:
+                        payload = f.read()
+                    status_code = BATCH_FRAME_OK
+                except Exception as e:
+                    logger.exception(f"Lỗi khi tổng hợp câu {i} trong batch: {str(e)}")
+                    payload = str(e).encode("utf-8")
+                    status_code = BATCH_FRAME_ERROR
+
+                yield BATCH_FRAME_HEADER.pack(i, status_code, len(payload)) + payload
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for path in output_paths:
+                try:
+                    if os.path.exists(path):
+                        os.unlink(path)
+                except OSError:
+                    pass
+
+    return StreamingResponse(iter_frames(), media_type=BATCH_MEDIA_TYPE)
+
+
 @app.post("/clone-voice")
 async def clone_voice(
         text: str,
         voice_file: str,
-        output_format: str = "wav",
         background_tasks: BackgroundTasks,
+        output_format: str = "wav",
         return_url: bool = False
 ):
     try:
@@ -180,21 +349,7 @@ async def clone_voice(
 
         logger.info(f"Đang tổng hợp văn bản với giọng đã clone: '{text[:50]}...'")
 
-        cmd = [
-            "viettts", "synthesis",
-            "--text", text,
-            "--voice", voice_file,
-            "--output", output_path
-        ]
-
-        process = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True
-        )
-
-        if process.returncode != 0:
-            raise Exception(f"Error in viettts CLI: {process.stderr}")
+        await run_synthesis(text, voice_file, output_path)
 
         logger.info(f"Đã tạo file âm thanh với giọng clone: {output_path}")
 